@@ -21,6 +21,12 @@ class ChatbotAPI {
         return $_SESSION['chatbot_session_id'];
     }
 
+    // Tells the backend which citizen a request is for (believed when this host is in TRUSTED_PROXIES)
+    private function forwardedForHeader() {
+        $client_ip = isset($_SERVER['REMOTE_ADDR']) ? $_SERVER['REMOTE_ADDR'] : '';
+        return 'X-Forwarded-For: ' . $client_ip;
+    }
+
     public function sendQuery($message, $language = 'en') {
         $url = $this->base_url . '/query/';
         $data = array(
@@ -42,7 +48,8 @@ class ChatbotAPI {
             CURLOPT_POSTFIELDS => json_encode($data),
             CURLOPT_HTTPHEADER => array(
                 'Content-Type: application/json',
-                'Accept: application/json'
+                'Accept: application/json',
+                $this->forwardedForHeader()
             ),
             CURLOPT_SSL_VERIFYPEER => false,
             CURLOPT_SSL_VERIFYHOST => false
@@ -104,7 +111,71 @@ class ChatbotAPI {
             CURLOPT_POSTFIELDS => json_encode($data),
             CURLOPT_HTTPHEADER => array(
                 'Content-Type: application/json',
-                'Accept: application/json'
+                'Accept: application/json',
+                $this->forwardedForHeader()
+            ),
+            CURLOPT_SSL_VERIFYPEER => false,
+            CURLOPT_SSL_VERIFYHOST => false
+        ));
+
+        $response = curl_exec($curl);
+        $http_code = curl_getinfo($curl, CURLINFO_HTTP_CODE);
+        $error = curl_error($curl);
+        curl_close($curl);
+
+        if ($error) {
+            return array(
+                'success' => false,
+                'error' => 'cURL Error: ' . $error
+            );
+        }
+
+        if ($http_code !== 200) {
+            return array(
+                'success' => false,
+                'error' => 'HTTP Error: ' . $http_code,
+                'response' => $response
+            );
+        }
+
+        $decoded_response = json_decode($response, true);
+        if (json_last_error() !== JSON_ERROR_NONE) {
+            return array(
+                'success' => false,
+                'error' => 'JSON Decode Error: ' . json_last_error_msg(),
+                'raw_response' => $response
+            );
+        }
+
+        return array(
+            'success' => true,
+            'data' => $decoded_response
+        );
+    }
+
+    // Get statuses for several grievance IDs / mobile numbers in one request
+    public function getGrievanceStatusBatch($identifiers, $language = 'en') {
+        $url = $this->base_url . '/grievance/status/batch';
+        $data = array(
+            'identifiers' => array_values($identifiers),
+            'language' => $language
+        );
+
+        $curl = curl_init();
+        curl_setopt_array($curl, array(
+            CURLOPT_URL => $url,
+            CURLOPT_RETURNTRANSFER => true,
+            CURLOPT_ENCODING => '',
+            CURLOPT_MAXREDIRS => 10,
+            CURLOPT_TIMEOUT => 30,
+            CURLOPT_FOLLOWLOCATION => true,
+            CURLOPT_HTTP_VERSION => CURL_HTTP_VERSION_1_1,
+            CURLOPT_CUSTOMREQUEST => 'POST',
+            CURLOPT_POSTFIELDS => json_encode($data),
+            CURLOPT_HTTPHEADER => array(
+                'Content-Type: application/json',
+                'Accept: application/json',
+                $this->forwardedForHeader()
             ),
             CURLOPT_SSL_VERIFYPEER => false,
             CURLOPT_SSL_VERIFYHOST => false
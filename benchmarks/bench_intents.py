@@ -0,0 +1,268 @@
+"""
+Micro-benchmark for the intent classifier.
+
+Compares the precompiled single-pass classifier in intents.py against verbatim
+copies of the per-call regex detectors that used to live in fastapp.py, after
+checking that both give the same answers on a bilingual corpus.
+
+Run from the repository root:
+    python benchmarks/bench_intents.py [--number 2000]
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import intents
+
+# === LEGACY DETECTORS (copied from fastapp.py before intents.py existed) ===
+def legacy_detect_greeting(text: str) -> tuple[bool, str]:
+    """Detect greeting intent and return a normalized key."""
+    try:
+        t = text.strip().lower()
+        t = re.sub(r"[!.,🙂🙏✨⭐️]+", "", t)
+        patterns = [
+            (r"\bgood\s*morning\b|\bशुभ\s*सकाळ\b", "good_morning"),
+            (r"\bgood\s*afternoon\b|\bशुभ\s*दुपार\b", "good_afternoon"),
+            (r"\bgood\s*evening\b|\bशुभ\s*संध्याकाळ\b", "good_evening"),
+            (r"\bhello\b|\bhey+\b|\bhii+\b|\bhi\b|\bनमस्ते\b|\bनमस्कार\b|\bहॅलो\b|\bहेलो\b|\bहाय\b", "hello"),
+            (r"\bgood\s*night\b|\bशुभ\s*रात्री\b", "good_night"),
+        ]
+        for regex, key in patterns:
+            if re.search(regex, t):
+                return True, key
+        return False, ""
+    except Exception:
+        return False, ""
+
+def legacy_detect_grievance_id(text: str) -> Optional[str]:
+    """Detect potential grievance ID in text."""
+    patterns = [
+        r'\b([GgRr]-[a-zA-Z0-9]+)\b',
+        r'\b([GgRr][0-9a-zA-Z]+)\b',
+        r'\b(MJS-[0-9a-zA-Z]+)\b',
+        r'\b([0-9]{6,})\b'
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, text)
+        if match:
+            return match.group(1)
+    return None
+
+def legacy_validate_grievance_id_format(grievance_id: str) -> bool:
+    """Validate if the grievance ID matches expected Maha-Jal Samadhan format."""
+    valid_patterns = [
+        r'^[GgRr]-[a-zA-Z0-9]{6,}$',
+        r'^[GgRr][0-9a-zA-Z]{6,}$',
+        r'^MJS-[0-9a-zA-Z]{6,}$',
+        r'^[0-9]{6,}$'
+    ]
+    for pattern in valid_patterns:
+        if re.match(pattern, grievance_id.strip()):
+            return True
+    return False
+
+def legacy_detect_mobile_number(text: str) -> Optional[str]:
+    """Detect Indian mobile number patterns in text."""
+    # Remove all non-digit characters except + and spaces
+    clean_text = re.sub(r'[^\d+\s]', '', text)
+    
+    # Indian mobile number patterns
+    patterns = [
+        r'\b(\+91[\s-]?)?([6-9]\d{9})\b',  # +91 followed by 10-digit number starting with 6-9
+        r'\b([6-9]\d{9})\b',                # 10-digit number starting with 6-9
+        r'\b(0\d{10})\b'                    # 11-digit number starting with 0
+    ]
+    
+    for pattern in patterns:
+        matches = re.finditer(pattern, clean_text)
+        for match in matches:
+            # Extract the mobile number (without country code for consistency)
+            if match.group(1) and match.group(2):  # +91 pattern
+                mobile = match.group(2)
+            elif match.group(1):  # 10-digit pattern
+                mobile = match.group(1)
+            else:  # 11-digit pattern
+                mobile = match.group(0)[1:]  # Remove leading 0
+            
+            # Validate it's exactly 10 digits starting with 6-9
+            if len(mobile) == 10 and mobile[0] in '6789':
+                return mobile
+    
+    return None
+
+def legacy_validate_mobile_number_format(mobile_number: str) -> bool:
+    """Validate if the mobile number matches Indian format."""
+    # Remove all non-digit characters
+    digits_only = re.sub(r'\D', '', mobile_number)
+    
+    # Should be exactly 10 digits starting with 6, 7, 8, or 9
+    if len(digits_only) == 10 and digits_only[0] in '6789':
+        return True
+    
+    # Handle +91 prefix case
+    if len(digits_only) == 12 and digits_only.startswith('91') and digits_only[2] in '6789':
+        return True
+    
+    # Handle 0 prefix case (11 digits)
+    if len(digits_only) == 11 and digits_only.startswith('0') and digits_only[1] in '6789':
+        return True
+        
+    return False
+
+def legacy_detect_grievance_id_or_mobile(text: str) -> tuple[Optional[str], str]:
+    """
+    Detect either grievance ID or mobile number and return the type
+    Returns: (identifier, type) where type is 'grievance_id', 'mobile_number', or None
+    """
+    # First try to detect grievance ID
+    grievance_id = legacy_detect_grievance_id(text)
+    if grievance_id and legacy_validate_grievance_id_format(grievance_id):
+        return grievance_id, 'grievance_id'
+    
+    # Then try to detect mobile number
+    mobile_number = legacy_detect_mobile_number(text)
+    if mobile_number and legacy_validate_mobile_number_format(mobile_number):
+        return mobile_number, 'mobile_number'
+    
+    return None, None
+
+def legacy_detect_exact_status_question(text: str, language: str) -> bool:
+    """Detect the exact status check question."""
+    text_lower = text.lower().strip()
+    if language == "en":
+        return "would you like to check the status of your grievance" in text_lower
+    else:
+        status_patterns = [
+            "आपण महा-जल समाधान सार्वजनिक तक्रार निवारण प्रणालीमध्ये नोंदवलेल्या तक्रारीची स्थिती तपासू इच्छिता का",
+            "तक्रारीची स्थिती तपासू इच्छिता का",
+            "स्थिती तपासू इच्छिता का",
+            "तक्रारीची स्थिती"
+        ]
+        return any(pattern in text for pattern in status_patterns)
+
+def legacy_detect_yes_no_response(text: str, language: str) -> str:
+    """Detect yes/no responses in both languages."""
+    text = text.strip().lower()
+    yes_patterns_en = [r'\byes\b', r'\by\b', r'\byeah\b', r'\byep\b']
+    no_patterns_en = [r'\bno\b', r'\bn\b', r'\bnope\b']
+    yes_patterns_mr = [r'\bहोय\b', r'\bहो\b']
+    no_patterns_mr = [r'\bनाही\b', r'\bना\b']
+    for pattern in yes_patterns_en + yes_patterns_mr:
+        if re.search(pattern, text):
+            return "yes"
+    for pattern in no_patterns_en + no_patterns_mr:
+        if re.search(pattern, text):
+            return "no"
+    return "unknown"
+
+def legacy_pipeline(text: str, language: str):
+    """Detection work done per message by the old process_query/process_maha_jal_query"""
+    is_greet, greet_key = legacy_detect_greeting(text)
+    if is_greet:
+        return greet_key
+    try:
+        identifier = legacy_detect_grievance_id_or_mobile(text)
+    except IndexError:
+        identifier = (None, None)
+    return (
+        identifier,
+        legacy_detect_yes_no_response(text, language),
+        legacy_detect_exact_status_question(text, language),
+        "feedback" in text.lower() or "अभिप्राय" in text.lower(),
+        any(kw in text.lower() for kw in ["register", "grievance", "complaint", "तक्रार", "नोंदवू", "शिकायत"]),
+    )
+
+def new_pipeline(text: str, language: str):
+    return intents.classify(text, language)
+
+# === CORPUS ===
+CORPUS = [
+    ("hello", "en"),
+    ("Hi!", "en"),
+    ("heyyy there", "en"),
+    ("Good Morning 🙏", "en"),
+    ("hello, good evening", "en"),
+    ("good night hello", "en"),
+    ("नमस्कार", "mr"),
+    ("शुभ सकाळ!", "mr"),
+    ("yes", "en"),
+    ("Yeah sure", "en"),
+    ("no thanks", "en"),
+    ("nope", "en"),
+    ("होय", "mr"),
+    ("नाही", "mr"),
+    ("no, yes", "en"),
+    ("G-12safeg7678", "en"),
+    ("my id is G-12safeg7678 please check", "en"),
+    ("r1234567", "en"),
+    ("MJS-ABC12345", "en"),
+    ("123456", "en"),
+    ("9876543210", "en"),
+    ("+91 9876543210", "en"),
+    ("+91-9123456780", "en"),
+    ("09876543210", "en"),
+    ("call me on 98765 43210", "en"),
+    ("mobile9876543210", "en"),
+    ("माझा मोबाईल +919876543210 आहे", "mr"),
+    ("Would you like to check the status of your grievance?", "en"),
+    ("तक्रारीची स्थिती तपासू इच्छिता का?", "mr"),
+    ("I want to give feedback", "en"),
+    ("मला अभिप्राय द्यायचा आहे", "mr"),
+    ("I want to register a complaint", "en"),
+    ("तक्रार नोंदवू इच्छितो", "mr"),
+    ("What is the water supply timing in my village?", "en"),
+    ("पाणी पुरवठा कधी होईल?", "mr"),
+    ("", "en"),
+]
+
+# === EQUIVALENCE ===
+def check_equivalence() -> int:
+    mismatches = 0
+    legacy_crashes = 0
+    for text, language in CORPUS:
+        intent = intents.classify(text, language)
+        legacy_greeting = legacy_detect_greeting(text)
+        checks = [
+            ("greeting", legacy_greeting, intents.detect_greeting(text)),
+            ("greeting key", legacy_greeting[1], intent.greeting),
+            ("yes_no", legacy_detect_yes_no_response(text, language), intent.yes_no),
+            ("status_question", legacy_detect_exact_status_question(text, language), intent.status_question),
+            ("feedback", "feedback" in text.lower() or "अभिप्राय" in text.lower(), intent.feedback),
+        ]
+        try:
+            legacy_identifier = legacy_detect_grievance_id_or_mobile(text)
+        except IndexError:
+            # The legacy mobile detector crashed on bare 10-digit and 0-prefixed numbers
+            legacy_crashes += 1
+        else:
+            checks.append(("identifier", legacy_identifier, (intent.identifier, intent.identifier_type)))
+        for name, expected, actual in checks:
+            if expected != actual:
+                mismatches += 1
+                print(f"MISMATCH {name!r} for {text!r}: legacy={expected!r} new={actual!r}")
+    print(f"Corpus: {len(CORPUS)} messages, {mismatches} mismatches, {legacy_crashes} legacy crashes skipped")
+    return mismatches
+
+# === TIMING ===
+def bench(number: int):
+    for label, func in (("legacy", legacy_pipeline), ("classify", new_pipeline)):
+        seconds = min(timeit.repeat(
+            lambda: [func(text, language) for text, language in CORPUS],
+            number=number,
+            repeat=3,
+        ))
+        per_message = seconds / (number * len(CORPUS)) * 1e6
+        print(f"{label:>10}: {seconds:.3f}s for {number} passes ({per_message:.2f} µs/message)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark intent classification")
+    parser.add_argument("--number", type=int, default=2000, help="passes over the corpus per repeat")
+    args = parser.parse_args()
+    if check_equivalence():
+        sys.exit(1)
+    bench(args.number)
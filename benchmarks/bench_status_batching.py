@@ -0,0 +1,106 @@
+"""
+Throughput of concurrent grievance status lookups with and without micro-batching.
+
+Runs the same stream of lookups through DatabaseManager.fetch_grievance_status
+(bypassing the status cache) at a fixed pool size, first one query per lookup,
+then with STATUS_BATCH_ENABLED, after checking both return the same grievances.
+Point DATABASE_URL at a scratch database, e.g. one loaded with
+benchmarks/synthetic_grievances.py (its mobile numbers start at 7000000000):
+
+    DATABASE_URL=postgresql://.../chatbot_synthetic python benchmarks/bench_status_batching.py \
+        --lookups 20000 --concurrency 400 --pool-size 10
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import asyncpg
+
+from database import DatabaseManager
+
+async def sample_identifiers(dsn: str, count: int, seed: int) -> list:
+    """A mix of grievance IDs and mobile numbers taken from the database"""
+    conn = await asyncpg.connect(dsn)
+    try:
+        rows = await conn.fetch(
+            "SELECT grievance_unique_number, mobile_number FROM public.grievances ORDER BY random() LIMIT 5000"
+        )
+    finally:
+        await conn.close()
+    if not rows:
+        raise SystemExit("No grievances found; load some with benchmarks/synthetic_grievances.py first")
+    rng = random.Random(seed)
+    pool = [row['grievance_unique_number'] for row in rows] + [row['mobile_number'] for row in rows if row['mobile_number']]
+    return [rng.choice(pool) for _ in range(count)]
+
+def make_manager(pool_size: int, batching: bool, window_ms: float, max_batch: int) -> DatabaseManager:
+    os.environ['POSTGRES_POOL_MIN_SIZE'] = str(pool_size)
+    os.environ['POSTGRES_POOL_MAX_SIZE'] = str(pool_size)
+    os.environ['POSTGRES_QUERY_TIMEOUT'] = '30'
+    os.environ['STATUS_BATCH_ENABLED'] = 'true' if batching else 'false'
+    os.environ['STATUS_BATCH_WINDOW_MS'] = str(window_ms)
+    os.environ['STATUS_BATCH_MAX_SIZE'] = str(max_batch)
+    return DatabaseManager()
+
+async def run(manager: DatabaseManager, identifiers: list, concurrency: int) -> tuple:
+    queue = iter(identifiers)
+    results = {}
+    latencies = []
+
+    async def worker():
+        for identifier in queue:
+            started = time.perf_counter()
+            grievance = await manager.fetch_grievance_status(identifier)
+            latencies.append(time.perf_counter() - started)
+            results[identifier] = grievance.grievance_unique_number if grievance else None
+
+    await manager.init_pool()
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    finally:
+        await manager.close_pool()
+    latencies.sort()
+    return results, elapsed, latencies
+
+def report(label: str, lookups: int, elapsed: float, latencies: list):
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000
+    print(f"{label:<12} {lookups / elapsed:>10.0f} lookups/s   p50 {p50:7.2f} ms   p99 {p99:7.2f} ms")
+
+async def main(args):
+    logging.basicConfig(level=logging.WARNING)
+    dsn = DatabaseManager().database_url
+    identifiers = await sample_identifiers(dsn, args.lookups, args.seed)
+    print(f"{args.lookups} lookups, {args.concurrency} concurrent, pool size {args.pool_size}, "
+          f"window {args.window_ms} ms, max batch {args.max_batch}")
+
+    single, single_elapsed, single_latencies = await run(
+        make_manager(args.pool_size, False, args.window_ms, args.max_batch), identifiers, args.concurrency
+    )
+    batcher = make_manager(args.pool_size, True, args.window_ms, args.max_batch)
+    batched, batched_elapsed, batched_latencies = await run(batcher, identifiers, args.concurrency)
+    if single != batched:
+        differing = [key for key in single if single[key] != batched.get(key)]
+        raise SystemExit(f"Batched lookups disagree for {len(differing)} identifiers, e.g. {differing[:5]}")
+
+    report("per-lookup", args.lookups, single_elapsed, single_latencies)
+    report("batched", args.lookups, batched_elapsed, batched_latencies)
+    print(f"speedup      {single_elapsed / batched_elapsed:.2f}x   {batcher.status_batcher.get_stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark micro-batched grievance status lookups")
+    parser.add_argument("--lookups", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--pool-size", type=int, default=10)
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,135 @@
+"""
+Load synthetic grievances into a local PostgreSQL database.
+
+Creates minimal grievances / grievance_detail2 / ratings tables (only the
+columns the chatbot uses) when they are missing, then bulk-loads random
+grievances with COPY.
+Meant for a scratch database, to check query plans at a realistic size:
+
+    createdb chatbot_synthetic
+    DATABASE_URL=postgresql://.../chatbot_synthetic python benchmarks/synthetic_grievances.py --rows 200000
+    DATABASE_URL=postgresql://.../chatbot_synthetic python database.py      # flags sequential scans
+    psql postgresql://.../chatbot_synthetic -f recommended_indexes.sql
+    DATABASE_URL=postgresql://.../chatbot_synthetic python database.py      # exits 0 once indexed
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+import asyncpg
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import db_manager
+
+SCHEMA_SQL = '''
+CREATE TABLE IF NOT EXISTS public.grievances (
+    id bigint PRIMARY KEY,
+    grievance_unique_number varchar(50),
+    mobile_number varchar(20),
+    email varchar(255),
+    citizen_name varchar(255),
+    grievance_status varchar(50),
+    resolved_date timestamp,
+    created_at timestamp
+);
+CREATE TABLE IF NOT EXISTS public.grievance_detail2 (
+    grievance_id bigint,
+    grievance_status varchar(50),
+    district_name varchar(100),
+    block_name varchar(100),
+    grampanchayat_name varchar(100),
+    sub_grievance_name varchar(255),
+    citizen_name varchar(255),
+    mobile_number varchar(20),
+    grievance_logged_date timestamp,
+    resolved_date timestamp,
+    resolved_user_name varchar(255),
+    organization_name varchar(255),
+    district_id integer,
+    block_id integer
+);
+CREATE TABLE IF NOT EXISTS public.ratings (
+    id bigserial PRIMARY KEY,
+    timestamp timestamp,
+    session_id varchar(255),
+    rating integer,
+    rating_label varchar(50),
+    language varchar(10),
+    grievance_id varchar(50),
+    feedback_text text,
+    ip_address varchar(45),
+    created_at timestamp
+);
+'''
+
+STATUSES = ("Pending", "In Progress", "Resolved", "Closed", "Rejected")
+DISTRICTS = ("Pune", "Nashik", "Nagpur", "Thane", "Satara", "Kolhapur", "Solapur", "Jalgaon")
+CATEGORIES = ("Water supply", "Leakage", "Quality", "Billing", "New connection", "Pipeline damage")
+FIRST_NAMES = ("Asha", "Ravi", "Sunita", "Vijay", "Meera", "Amit", "Kavita", "Sanjay", "Pooja", "Rahul")
+LAST_NAMES = ("Patil", "Joshi", "Kulkarni", "Deshmukh", "Pawar", "Shinde", "Jadhav", "More")
+
+def synthetic_rows(start_id: int, count: int, citizens: int, rng: random.Random):
+    """Grievance and detail rows; each citizen (mobile number) files several grievances"""
+    grievances, details = [], []
+    epoch = datetime(2022, 1, 1)
+    for grievance_id in range(start_id, start_id + count):
+        citizen = rng.randrange(citizens)
+        mobile = str(7000000000 + citizen)
+        name = f"{FIRST_NAMES[citizen % len(FIRST_NAMES)]} {LAST_NAMES[citizen % len(LAST_NAMES)]} {citizen}"
+        email = f"citizen{citizen}@example.com" if citizen % 3 == 0 else None
+        logged = epoch + timedelta(minutes=rng.randrange(3 * 365 * 24 * 60))
+        status = rng.choice(STATUSES)
+        resolved = logged + timedelta(days=rng.randrange(1, 60)) if status in ("Resolved", "Closed") else None
+        district = rng.randrange(len(DISTRICTS))
+        grievances.append((
+            grievance_id, f"G-{grievance_id:010x}", mobile, email, name, status, resolved, logged
+        ))
+        details.append((
+            grievance_id, status, DISTRICTS[district], f"Block {district}-{rng.randrange(10)}",
+            f"GP {rng.randrange(500)}", rng.choice(CATEGORIES), name, mobile, logged, resolved,
+            "Officer" if resolved else None, "MJP", district, rng.randrange(100)
+        ))
+    return grievances, details
+
+async def load(rows: int, citizens: int, batch_size: int, seed: int):
+    conn = await asyncpg.connect(db_manager.database_url)
+    try:
+        await conn.execute(SCHEMA_SQL)
+        start_id = (await conn.fetchval("SELECT COALESCE(max(id), 0) FROM public.grievances")) + 1
+        rng = random.Random(seed)
+        loaded = 0
+        while loaded < rows:
+            count = min(batch_size, rows - loaded)
+            grievances, details = synthetic_rows(start_id + loaded, count, citizens, rng)
+            async with conn.transaction():
+                await conn.copy_records_to_table(
+                    'grievances', schema_name='public', records=grievances,
+                    columns=('id', 'grievance_unique_number', 'mobile_number', 'email', 'citizen_name',
+                             'grievance_status', 'resolved_date', 'created_at')
+                )
+                await conn.copy_records_to_table(
+                    'grievance_detail2', schema_name='public', records=details,
+                    columns=('grievance_id', 'grievance_status', 'district_name', 'block_name',
+                             'grampanchayat_name', 'sub_grievance_name', 'citizen_name', 'mobile_number',
+                             'grievance_logged_date', 'resolved_date', 'resolved_user_name',
+                             'organization_name', 'district_id', 'block_id')
+                )
+            loaded += count
+            print(f"Loaded {loaded}/{rows} grievances")
+        await conn.execute("ANALYZE public.grievances")
+        await conn.execute("ANALYZE public.grievance_detail2")
+    finally:
+        await conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load synthetic grievances into a scratch database")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--citizens", type=int, default=20000, help="distinct mobile numbers")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(load(args.rows, args.citizens, args.batch_size, args.seed))
@@ -0,0 +1,90 @@
+import logging
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpenError(Exception):
+    """Raised instead of running a call while the breaker is open."""
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed    -> calls run; `failure_threshold` failures in a row open it
+    open      -> calls fail immediately until `reset_timeout` has passed
+    half_open -> one trial call runs; success closes it, failure re-opens it
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
+        self.opens = 0
+        self.rejected = 0
+        self.successes = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def _refresh_state(self):
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = "half_open"
+            self._trial_running = False
+
+    def available(self) -> bool:
+        """Whether a call would be let through right now (does not reserve the trial)"""
+        self._refresh_state()
+        return self.state == "closed" or (self.state == "half_open" and not self._trial_running)
+
+    def before_call(self):
+        """Reserve a call slot or raise CircuitOpenError"""
+        self._refresh_state()
+        if self.state == "closed":
+            return
+        if self.state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return
+        self.rejected += 1
+        raise CircuitOpenError(f"Circuit '{self.name}' is open")
+
+    def record_success(self):
+        self.successes += 1
+        self.consecutive_failures = 0
+        if self.state != "closed":
+            logger.info(f"Circuit '{self.name}' closed")
+        self.state = "closed"
+        self._trial_running = False
+
+    def record_failure(self, error: Optional[BaseException] = None):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = (str(error) or repr(error)) if error is not None else None
+        if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opens += 1
+                logger.warning(f"Circuit '{self.name}' opened after {self.consecutive_failures} failures: {self.last_error}")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self._trial_running = False
+
+    def release(self):
+        """Give back a half-open trial slot when the call ended without a verdict"""
+        self._trial_running = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        self._refresh_state()
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout_seconds": self.reset_timeout,
+            "opens": self.opens,
+            "rejected": self.rejected,
+            "successes": self.successes,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,374 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+class ResultCache:
+    """
+    Bounded in-process cache with LRU eviction and separate TTLs for hits and
+    for "not found" (None) results. Concurrent misses for the same key share a
+    single load, which runs in its own task so that a caller being cancelled
+    (client disconnect, timeout) never cancels the others. Loader exceptions
+    are passed to every waiter and never cached.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl: float = 30.0, negative_ttl: float = 10.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # A task per single-key load; batch loads register a future per key
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # Strong references: the event loop only keeps weak ones to running tasks
+        self._loads: Set[asyncio.Task] = set()
+        # Bumped on invalidation so loads already in flight don't store stale values
+        self._generation = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and (self.ttl > 0 or self.negative_ttl > 0)
+
+    def _lookup(self, key: Hashable):
+        """Return (found, value) for a live entry, dropping it if expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def _store(self, key: Hashable, value: Any):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: Hashable) -> tuple:
+        """Non-loading lookup returning (found, value)"""
+        found, value = self._lookup(key)
+        if found:
+            self.hits += 1
+            if value is None:
+                self.negative_hits += 1
+        return found, value
+
+    def set(self, key: Hashable, value: Any):
+        if self.enabled:
+            self._store(key, value)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for key, or run loader once for all concurrent callers"""
+        if not self.enabled:
+            return await loader()
+
+        found, value = self.get(key)
+        if found:
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        load = asyncio.ensure_future(self._load(key, loader, self._generation))
+        self._inflight[key] = load
+        self._loads.add(load)
+        load.add_done_callback(lambda task: self._load_done(key, task))
+        return await asyncio.shield(load)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], generation: int) -> Any:
+        value = await loader()
+        if generation == self._generation:
+            self._store(key, value)
+        return value
+
+    def _load_done(self, key: Hashable, task: asyncio.Task):
+        self._loads.discard(task)
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark retrieved so a load whose callers all went away does not log a warning
+            task.exception()
+
+    async def get_or_load_many(
+        self,
+        keys: Iterable[Hashable],
+        load_many: Callable[[list], Awaitable[Dict[Hashable, Any]]]
+    ) -> Dict[Hashable, Any]:
+        """
+        Values for several keys: cached ones directly, keys already being loaded
+        from that load, and the rest with one load_many(missing) call returning a
+        dict. Single-key callers for those keys share the batch load meanwhile.
+        """
+        keys = list(dict.fromkeys(keys))
+        if not self.enabled:
+            return await load_many(keys)
+
+        results: Dict[Hashable, Any] = {}
+        waiting: Dict[Hashable, asyncio.Future] = {}
+        missing = []
+        for key in keys:
+            found, value = self.get(key)
+            if found:
+                results[key] = value
+            elif key in self._inflight:
+                self.coalesced += 1
+                waiting[key] = self._inflight[key]
+            else:
+                missing.append(key)
+
+        if missing:
+            self.misses += len(missing)
+            loop = asyncio.get_running_loop()
+            futures = {key: loop.create_future() for key in missing}
+            self._inflight.update(futures)
+            waiting.update(futures)
+            load = asyncio.ensure_future(self._load_many(missing, load_many, self._generation))
+            self._loads.add(load)
+            load.add_done_callback(lambda task: self._load_many_done(futures, task))
+
+        for key, future in waiting.items():
+            results[key] = await asyncio.shield(future)
+        return results
+
+    async def _load_many(self, keys: list, load_many, generation: int) -> Dict[Hashable, Any]:
+        values = await load_many(keys)
+        if generation == self._generation:
+            for key in keys:
+                self._store(key, values.get(key))
+        return values
+
+    def _load_many_done(self, futures: Dict[Hashable, asyncio.Future], task: asyncio.Task):
+        self._loads.discard(task)
+        error = None if task.cancelled() else task.exception()
+        for key, future in futures.items():
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if future.done():
+                continue
+            if task.cancelled():
+                future.cancel()
+            elif error is not None:
+                future.set_exception(error)
+                # Mark retrieved so a batch whose callers went away does not log a warning
+                future.exception()
+            else:
+                future.set_result(task.result().get(key))
+
+    def invalidate(self, key: Optional[Hashable] = None) -> int:
+        """Drop one key, or everything when key is None; returns the number removed"""
+        self._generation += 1
+        if key is None:
+            self._inflight.clear()
+            removed = len(self._entries)
+            self._entries.clear()
+        else:
+            self._inflight.pop(key, None)
+            removed = 1 if self._entries.pop(key, None) is not None else 0
+        self.invalidations += removed
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "enabled": self.enabled,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "negative_ttl_seconds": self.negative_ttl,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "inflight": len(self._inflight),
+        }
+
+class SnapshotRefresher:
+    """
+    A value recomputed by a background task every `interval` seconds and served
+    from memory. Readers never wait on a refresh while an older snapshot exists;
+    only the very first read waits, sharing a single load with other callers.
+    A failed refresh keeps the previous snapshot.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Awaitable[Any]], interval: float = 300.0):
+        self.name = name
+        self.loader = loader
+        self.interval = interval
+        self.value: Any = None
+        self.generated_at: Optional[float] = None
+        self._refresh: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self.last_duration = 0.0
+
+    async def _load(self):
+        started = time.perf_counter()
+        try:
+            value = await self.loader()
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            logger.warning(f"Refreshing the {self.name} snapshot failed: {e}")
+            raise
+        self.last_duration = time.perf_counter() - started
+        self.value = value
+        self.generated_at = time.time()
+        self.refreshes += 1
+        return value
+
+    def refresh(self) -> asyncio.Task:
+        """Start a refresh, or return the one already in flight"""
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.create_task(self._load())
+            # Failures are recorded in _load; readers that await the task still see them
+            self._refresh.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return self._refresh
+
+    @property
+    def refreshing(self) -> bool:
+        return self._refresh is not None and not self._refresh.done()
+
+    async def get(self) -> Any:
+        """Current snapshot; waits only when none has been generated yet"""
+        if self.generated_at is None:
+            return await asyncio.shield(self.refresh())
+        return self.value
+
+    def age(self) -> Optional[float]:
+        return time.time() - self.generated_at if self.generated_at is not None else None
+
+    async def _refresh_forever(self):
+        while True:
+            try:
+                await asyncio.shield(self.refresh())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                pass
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._refresh_forever())
+
+    async def stop(self):
+        for task in (self._task, self._refresh):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        self._task = None
+        self._refresh = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        age = self.age()
+        return {
+            "generated_at": self.generated_at,
+            "age_seconds": round(age, 3) if age is not None else None,
+            "refresh_interval_seconds": self.interval,
+            "refreshing": self.refreshing,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_refresh_ms": round(self.last_duration * 1000, 3),
+        }
+
+class MicroBatcher:
+    """
+    Coalesces single-key loads that arrive within `window` seconds (or until
+    `max_batch` distinct keys are waiting) into one `load_many(keys)` call,
+    which returns a dict of key -> value. Each caller gets its own key's value;
+    an exception from load_many is raised in every caller of that batch.
+    """
+
+    def __init__(self, load_many: Callable[[list], Awaitable[Dict[Hashable, Any]]], window: float = 0.002, max_batch: int = 64):
+        self.load_many = load_many
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: Dict[Hashable, asyncio.Future] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The loop only holds weak references to tasks; keep running batches alive
+        self._running: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.keys = 0
+        self.largest_batch = 0
+
+    async def load(self, key: Hashable) -> Any:
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._dispatch)
+        return await asyncio.shield(future)
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run(self, batch: Dict[Hashable, asyncio.Future]):
+        self.batches += 1
+        self.keys += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            results = await self.load_many(list(batch))
+        except BaseException as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+                    # Mark retrieved so a batch whose callers went away does not log a warning
+                    future.exception()
+            if not isinstance(e, Exception):
+                raise
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "window_ms": round(self.window * 1000, 3),
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "keys": self.keys,
+            "avg_batch": round(self.keys / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "pending": len(self._pending),
+            "running": len(self._running),
+        }
@@ -1,16 +1,771 @@
+import asyncio
 import asyncpg
+import base64
+import csv
+import json
 import os
+import random
+import re
+import time
 import logging
+from datetime import date, datetime, timedelta
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
-from typing import Optional, Dict, Any, List
+from typing import AsyncIterator, Optional, Dict, Any, List
+from breaker import CircuitBreaker, CircuitOpenError
+from cache import MicroBatcher, ResultCache, SnapshotRefresher
+from intents import validate_mobile_number_format
+from metrics import REGISTRY, Counter, Gauge
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "chatbot_db_query_duration_seconds", "Database query latency by statement name", ("statement",)
+)
+DB_POOL_ACQUIRE_SECONDS = REGISTRY.histogram(
+    "chatbot_db_pool_acquire_seconds", "Time spent waiting for a pooled connection", ("target",)
+)
+
+# Only the columns the status reply shows, in GrievanceStatus slot order
+GRIEVANCE_STATUS_COLUMNS = '''g.grievance_unique_number, gd.grievance_status, gd.grievance_logged_date,
+       gd.resolved_date, gd.sub_grievance_name, gd.district_name, gd.block_name,
+       gd.grampanchayat_name, gd.resolved_user_name'''
+
+# Lookup by grievance_unique_number
+GRIEVANCE_BY_UNIQUE_NUMBER_SQL = f'''
+SELECT {GRIEVANCE_STATUS_COLUMNS}
+FROM public.grievance_detail2 gd
+INNER JOIN public.grievances g ON gd.grievance_id = g.id
+WHERE g.grievance_unique_number = $1
+'''
+
+# Latest grievance for a mobile number. Each branch of the UNION ALL can use its
+# own index, unlike "gd.mobile_number = $1 OR g.mobile_number = $1" across a join.
+GRIEVANCE_BY_MOBILE_SQL = f'''
+SELECT {GRIEVANCE_STATUS_COLUMNS}
+FROM (
+    SELECT gd.grievance_id FROM public.grievance_detail2 gd WHERE gd.mobile_number = $1
+    UNION ALL
+    SELECT g.id FROM public.grievances g WHERE g.mobile_number = $1
+) m
+INNER JOIN public.grievance_detail2 gd ON gd.grievance_id = m.grievance_id
+INNER JOIN public.grievances g ON g.id = m.grievance_id
+ORDER BY gd.grievance_logged_date DESC
+LIMIT 1
+'''
+
+# Identifiers that are valid mobile numbers may also be numeric grievance IDs, so
+# an exact grievance_unique_number match is ranked ahead of the mobile matches.
+# This keeps the old "unique number first, then mobile" order in one round trip.
+GRIEVANCE_BY_MOBILE_OR_UNIQUE_NUMBER_SQL = f'''
+SELECT {GRIEVANCE_STATUS_COLUMNS}
+FROM (
+    SELECT g.id AS grievance_id, 0 AS match_rank FROM public.grievances g WHERE g.grievance_unique_number = $1
+    UNION ALL
+    SELECT gd.grievance_id, 1 FROM public.grievance_detail2 gd WHERE gd.mobile_number = $1
+    UNION ALL
+    SELECT g.id, 1 FROM public.grievances g WHERE g.mobile_number = $1
+) m
+INNER JOIN public.grievance_detail2 gd ON gd.grievance_id = m.grievance_id
+INNER JOIN public.grievances g ON g.id = m.grievance_id
+ORDER BY m.match_rank, gd.grievance_logged_date DESC
+LIMIT 1
+'''
+
+# Batch lookups: each query resolves a whole group of identifiers with = ANY($1)
+# and returns the matched identifier first, then the GRIEVANCE_STATUS_COLUMNS.
+GRIEVANCES_BY_UNIQUE_NUMBERS_SQL = f'''
+SELECT DISTINCT ON (g.grievance_unique_number) g.grievance_unique_number AS identifier, {GRIEVANCE_STATUS_COLUMNS}
+FROM public.grievance_detail2 gd
+INNER JOIN public.grievances g ON gd.grievance_id = g.id
+WHERE g.grievance_unique_number = ANY($1::text[])
+ORDER BY g.grievance_unique_number, gd.grievance_logged_date DESC
+'''
+
+# Batch form of GRIEVANCE_BY_MOBILE_OR_UNIQUE_NUMBER_SQL: DISTINCT ON keeps the
+# best row per identifier (exact unique number first, then the latest by mobile)
+GRIEVANCES_BY_MOBILES_OR_UNIQUE_NUMBERS_SQL = f'''
+SELECT DISTINCT ON (m.identifier) m.identifier, {GRIEVANCE_STATUS_COLUMNS}
+FROM (
+    SELECT g.grievance_unique_number AS identifier, g.id AS grievance_id, 0 AS match_rank
+    FROM public.grievances g WHERE g.grievance_unique_number = ANY($1::text[])
+    UNION ALL
+    SELECT gd.mobile_number, gd.grievance_id, 1 FROM public.grievance_detail2 gd WHERE gd.mobile_number = ANY($1::text[])
+    UNION ALL
+    SELECT g.mobile_number, g.id, 1 FROM public.grievances g WHERE g.mobile_number = ANY($1::text[])
+) m
+INNER JOIN public.grievance_detail2 gd ON gd.grievance_id = m.grievance_id
+INNER JOIN public.grievances g ON g.id = m.grievance_id
+ORDER BY m.identifier, m.match_rank, gd.grievance_logged_date DESC
+'''
+
+class GrievanceStatus:
+    """One grievance as shown in a status reply, built from GRIEVANCE_STATUS_COLUMNS."""
+
+    __slots__ = (
+        "grievance_unique_number",
+        "grievance_status",
+        "grievance_logged_date",
+        "resolved_date",
+        "sub_grievance_name",
+        "district_name",
+        "block_name",
+        "grampanchayat_name",
+        "resolved_user_name",
+    )
+
+    def __init__(
+        self,
+        grievance_unique_number: str,
+        grievance_status: Optional[str],
+        grievance_logged_date: Optional[datetime] = None,
+        resolved_date: Optional[datetime] = None,
+        sub_grievance_name: Optional[str] = None,
+        district_name: Optional[str] = None,
+        block_name: Optional[str] = None,
+        grampanchayat_name: Optional[str] = None,
+        resolved_user_name: Optional[str] = None,
+    ):
+        self.grievance_unique_number = grievance_unique_number
+        self.grievance_status = grievance_status
+        self.grievance_logged_date = grievance_logged_date
+        self.resolved_date = resolved_date
+        self.sub_grievance_name = sub_grievance_name
+        self.district_name = district_name
+        self.block_name = block_name
+        self.grampanchayat_name = grampanchayat_name
+        self.resolved_user_name = resolved_user_name
+
+    @classmethod
+    def from_record(cls, record) -> "GrievanceStatus":
+        """Build from a row selected with GRIEVANCE_STATUS_COLUMNS (positional, no dict)"""
+        return cls(*record)
+
+    @staticmethod
+    def format_date(value: Optional[datetime]) -> Optional[str]:
+        return value.strftime("%d-%b-%Y") if value else None
+
+    @property
+    def submitted_date(self) -> Optional[str]:
+        return self.format_date(self.grievance_logged_date)
+
+    @property
+    def resolved_on(self) -> Optional[str]:
+        return self.format_date(self.resolved_date)
+
+    def summary(self) -> Dict[str, Any]:
+        """The fields status endpoints return next to the formatted message"""
+        return {
+            "grievance_id": self.grievance_unique_number,
+            "status": self.grievance_status,
+            "submitted_date": self.submitted_date,
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"GrievanceStatus({self.grievance_unique_number!r}, {self.grievance_status!r})"
+
+# Paginated user search. Only the columns the search results show are selected.
+# Pages are keyed on (logged date, id), newest first, so each page is an index
+# range scan past the previous page's last row instead of an OFFSET re-scan.
+# $1 identifier, $2/$3 cursor (logged date as text, id), $4 row limit.
+USER_SEARCH_SQL = '''
+SELECT g.id, g.grievance_unique_number, gd.grievance_status, gd.sub_grievance_name,
+       gd.district_name, gd.block_name, gd.grampanchayat_name, g.citizen_name,
+       gd.grievance_logged_date, gd.resolved_date,
+       COALESCE(gd.grievance_logged_date, '-infinity')::text AS sort_key
+FROM ({matches}) m
+INNER JOIN public.grievance_detail2 gd ON gd.grievance_id = m.grievance_id
+INNER JOIN public.grievances g ON g.id = m.grievance_id
+WHERE $2::text IS NULL
+   OR (COALESCE(gd.grievance_logged_date, '-infinity'), g.id) < ($2::text::timestamp, $3::bigint)
+ORDER BY COALESCE(gd.grievance_logged_date, '-infinity') DESC, g.id DESC
+LIMIT $4
+'''
+
+USER_SEARCH_MATCHES = {
+    'mobile_number': (
+        "SELECT gd.grievance_id FROM public.grievance_detail2 gd WHERE gd.mobile_number = $1 "
+        "UNION SELECT g.id FROM public.grievances g WHERE g.mobile_number = $1"
+    ),
+    'email': "SELECT g.id AS grievance_id FROM public.grievances g WHERE lower(g.email) = lower($1)",
+    'name': (
+        "SELECT gd.grievance_id FROM public.grievance_detail2 gd WHERE gd.citizen_name ILIKE $1 "
+        "UNION SELECT g.id FROM public.grievances g WHERE g.citizen_name ILIKE $1"
+    ),
+}
+
+MIN_NAME_SEARCH_LENGTH = 3
+
+def classify_user_identifier(user_identifier: str) -> tuple:
+    """
+    Classify a user search identifier as mobile_number, email or name.
+    Returns (search_type, query parameter); names match as a case-insensitive prefix.
+    """
+    if validate_mobile_number_format(user_identifier):
+        return 'mobile_number', re.sub(r'\D', '', user_identifier)[-10:]
+    if '@' in user_identifier:
+        return 'email', user_identifier
+    if len(user_identifier) < MIN_NAME_SEARCH_LENGTH:
+        raise ValueError(f"Name searches need at least {MIN_NAME_SEARCH_LENGTH} characters")
+    escaped = re.sub(r'([\\%_])', r'\\\1', user_identifier)
+    return 'name', escaped + '%'
+
+def encode_search_cursor(sort_key: str, row_id: int) -> str:
+    """Opaque cursor for the page after the row with this sort key and id"""
+    return base64.urlsafe_b64encode(f"{sort_key}|{row_id}".encode()).decode().rstrip('=')
+
+def decode_search_cursor(cursor: str) -> tuple:
+    """Inverse of encode_search_cursor; raises ValueError for malformed cursors"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        sort_key, row_id = raw.rsplit('|', 1)
+        if sort_key != '-infinity':
+            datetime.fromisoformat(sort_key)
+        return sort_key, int(row_id)
+    except Exception:
+        raise ValueError("Invalid search cursor")
+
+# Dashboard counts in one scan: GROUPING() tells which grouping set a row belongs
+# to (bits: status 4, district 2, category 1; a set bit means "not grouped by").
+# Not a declared statement, so new connections don't run this scan during warmup.
+GRIEVANCE_STATISTICS_SQL = '''
+SELECT GROUPING(grievance_status, district_name, sub_grievance_name) AS grouping_set,
+       grievance_status, district_name, sub_grievance_name, count(*) AS total
+FROM public.grievance_detail2
+GROUP BY GROUPING SETS ((grievance_status), (district_name), (sub_grievance_name), ())
+'''
+
+STATISTICS_GROUPS = {
+    3: ('by_status', 'grievance_status'),
+    5: ('by_district', 'district_name'),
+    6: ('by_category', 'sub_grievance_name'),
+}
+
+# Indexes behind the declared lookups, written out by write_index_ddl for the DBA.
+# Each entry is (index name, ON clause).
+RECOMMENDED_INDEXES = (
+    ('grievances_unique_number_idx', 'public.grievances (grievance_unique_number)'),
+    ('grievances_mobile_number_idx', 'public.grievances (mobile_number)'),
+    ('grievances_email_lower_idx', 'public.grievances (lower(email))'),
+    ('grievance_detail2_grievance_id_idx', 'public.grievance_detail2 (grievance_id)'),
+    ('grievance_detail2_mobile_logged_idx', 'public.grievance_detail2 (mobile_number, grievance_logged_date DESC)'),
+    ('ratings_timestamp_idx', 'public.ratings (timestamp)'),
+)
+# Name search is an ILIKE prefix match, which only a trigram index can serve
+TRIGRAM_INDEXES = (
+    ('grievances_citizen_name_trgm_idx', 'public.grievances USING gin (citizen_name gin_trgm_ops)'),
+    ('grievance_detail2_citizen_name_trgm_idx', 'public.grievance_detail2 USING gin (citizen_name gin_trgm_ops)'),
+)
+
+def plan_nodes(plan: Dict[str, Any]):
+    """Every node of an EXPLAIN (FORMAT JSON) plan tree"""
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from plan_nodes(child)
+
+def write_index_ddl(path: str) -> str:
+    """Write the recommended indexes as an idempotent SQL script; returns the path"""
+    lines = [
+        "-- Indexes for the chatbot's grievance lookups, generated by `python database.py --write-ddl`.",
+        "-- Safe to re-run. CONCURRENTLY avoids blocking writes, so run with psql outside a transaction:",
+        "--   psql \"$DATABASE_URL\" -f " + os.path.basename(path),
+        "",
+    ]
+    for name, target in RECOMMENDED_INDEXES:
+        lines.append(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {target};")
+    lines += ["", "-- Name search (/user/search/) needs the pg_trgm extension", "CREATE EXTENSION IF NOT EXISTS pg_trgm;"]
+    for name, target in TRIGRAM_INDEXES:
+        lines.append(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {target};")
+    lines += ["", "ANALYZE public.grievances;", "ANALYZE public.grievance_detail2;", ""]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines))
+    return path
+
+def classify_identifier(identifier: str) -> str:
+    """
+    Classify a lookup identifier as 'grievance_id' or 'mobile_number'.
+    Anything that is not a valid mobile number is looked up as a grievance ID.
+    """
+    if validate_mobile_number_format(identifier):
+        return 'mobile_number'
+    return 'grievance_id'
+
+def env_bool(name: str, default: bool) -> bool:
+    """Read a boolean flag from the environment"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+class StatementRegistry:
+    """
+    Hot queries declared once by name and prepared on every pooled connection.
+    Statements live in asyncpg's per-connection statement cache, which survives
+    pool release/acquire cycles, so executions after warmup only bind and run
+    the named server-side statement instead of sending the query text again.
+    """
+
+    def __init__(self):
+        self.statements: Dict[str, str] = {}
+        self._param_counts: Dict[str, int] = {}
+        self._warm: Dict[int, set] = {}
+        self.hits = 0
+        self.misses = 0
+        self.prepare_count = 0
+        self.prepare_time = 0.0
+
+    def declare(self, name: str, sql: str) -> str:
+        """Register a named statement and return its name"""
+        self.statements[name] = sql
+        self._param_counts[name] = max((int(n) for n in re.findall(r'\$(\d+)', sql)), default=0)
+        return name
+
+    async def prepare_connection(self, conn):
+        """Prepare every declared statement on a new connection (pool init hook)"""
+        pid = conn.get_server_pid()
+        warm = self._warm[pid] = set()
+        conn.add_termination_listener(lambda _conn: self._warm.pop(pid, None))
+        for name, sql in self.statements.items():
+            started = time.perf_counter()
+            try:
+                # Running with NULL parameters prepares and caches the statement
+                # without matching any rows
+                await conn.fetch(sql, *([None] * self._param_counts[name]))
+            except Exception as e:
+                # Leave it to be prepared on first use rather than failing the connection
+                logger.warning(f"Could not prepare statement '{name}': {e}")
+                continue
+            self.prepare_time += time.perf_counter() - started
+            self.prepare_count += 1
+            warm.add(name)
+
+    def _track(self, conn, name: str):
+        warm = self._warm.setdefault(conn.get_server_pid(), set())
+        if name in warm:
+            self.hits += 1
+        else:
+            # asyncpg prepares and caches it as part of this execution
+            self.misses += 1
+            warm.add(name)
+
+    async def fetchrow(self, conn, name: str, *args, timeout: Optional[float] = None):
+        self._track(conn, name)
+        started = time.perf_counter()
+        try:
+            return await conn.fetchrow(self.statements[name], *args, timeout=timeout)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, name)
+
+    async def fetch(self, conn, name: str, *args, timeout: Optional[float] = None):
+        self._track(conn, name)
+        started = time.perf_counter()
+        try:
+            return await conn.fetch(self.statements[name], *args, timeout=timeout)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, name)
+
+    def clear(self):
+        self._warm.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "statements": len(self.statements),
+            "prepared_connections": len(self._warm),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "prepare_count": self.prepare_count,
+            "prepare_time_ms": round(self.prepare_time * 1000, 3),
+        }
+
+statements = StatementRegistry()
+STATUS_BY_UNIQUE_NUMBER = statements.declare('grievance_by_unique_number', GRIEVANCE_BY_UNIQUE_NUMBER_SQL)
+STATUS_BY_MOBILE = statements.declare('grievance_by_mobile', GRIEVANCE_BY_MOBILE_SQL)
+STATUS_BY_MOBILE_OR_UNIQUE_NUMBER = statements.declare(
+    'grievance_by_mobile_or_unique_number', GRIEVANCE_BY_MOBILE_OR_UNIQUE_NUMBER_SQL
+)
+
+BATCH_IDENTIFIER_QUERIES = {
+    'grievance_id': statements.declare('grievances_by_unique_numbers', GRIEVANCES_BY_UNIQUE_NUMBERS_SQL),
+    'mobile_number': statements.declare(
+        'grievances_by_mobiles_or_unique_numbers', GRIEVANCES_BY_MOBILES_OR_UNIQUE_NUMBERS_SQL
+    ),
+}
+
+USER_SEARCH_QUERIES = {
+    search_type: statements.declare(f'user_search_by_{search_type}', USER_SEARCH_SQL.format(matches=matches))
+    for search_type, matches in USER_SEARCH_MATCHES.items()
+}
+
+IDENTIFIER_QUERIES = {
+    'grievance_id': STATUS_BY_UNIQUE_NUMBER,
+    'mobile_number': STATUS_BY_MOBILE_OR_UNIQUE_NUMBER,
+}
+
+# Columns filled by the chatbot; id is generated by the database
+RATINGS_TABLE = 'ratings'
+RATINGS_COLUMNS = (
+    'timestamp', 'session_id', 'rating', 'rating_label', 'language',
+    'grievance_id', 'feedback_text', 'ip_address', 'created_at'
+)
+RATINGS_DATETIME_COLUMNS = {'timestamp', 'created_at'}
+
+def rating_record(
+    timestamp: datetime,
+    session_id: str,
+    rating: int,
+    rating_label: str,
+    language: str,
+    grievance_id: Optional[str] = None,
+    feedback_text: Optional[str] = None,
+    ip_address: Optional[str] = None
+) -> tuple:
+    """Build a row for the ratings table in RATINGS_COLUMNS order"""
+    return (timestamp, session_id, rating, rating_label, language, grievance_id, feedback_text, ip_address, datetime.now())
+
+# The database refused the rows themselves (bad value, constraint): retrying cannot help
+RATING_ROW_ERRORS = (asyncpg.DataError, asyncpg.IntegrityConstraintViolationError, ValueError, TypeError)
+
+class RatingsBuffer:
+    """
+    Collects rating rows and writes them to the ratings table in batches with
+    COPY. While the database is unreachable, batches are appended to a local
+    CSV spool, which is replayed on a later successful flush.
+
+    Each worker process spools to its own file (<spool>.<pid>.csv), so several
+    uvicorn workers never append to or replay the same file. Spools left by
+    workers that are no longer running are claimed by renaming them, so only
+    one worker replays each of them. Rows the database rejects on replay are
+    moved to <spool>.quarantine.<pid>.csv instead of blocking the spool.
+    """
+
+    def __init__(self, insert, spool_path: str, batch_size: int = 200, flush_interval: float = 2.0, enabled: bool = True):
+        self._insert = insert
+        self.spool_path = spool_path
+        self._spool_stem, self._spool_ext = os.path.splitext(spool_path)
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        self._pending: List[tuple] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.inserted = 0
+        self.batches = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.quarantined = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+
+    def submit(self, record: tuple):
+        if not self.enabled:
+            return
+        self._pending.append(record)
+        if len(self._pending) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    # === SPOOL FILES (run in a worker thread) ===
+    @property
+    def own_spool_path(self) -> str:
+        return f"{self._spool_stem}.{os.getpid()}{self._spool_ext}"
+
+    @property
+    def quarantine_path(self) -> str:
+        return f"{self._spool_stem}.quarantine.{os.getpid()}{self._spool_ext}"
+
+    @staticmethod
+    def _process_alive(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _replayable_spools(self) -> List[tuple]:
+        """(path, owner pid) of spools this worker should replay: its own and those of stopped workers"""
+        directory = os.path.dirname(self.spool_path) or '.'
+        if not os.path.isdir(directory):
+            return []
+        prefix = os.path.basename(self._spool_stem)
+        pid = os.getpid()
+        # <stem>.csv (older single-file spool), <stem>.<pid>.csv, <stem>.<pid>-from-<pid>-<ns>.csv
+        pattern = re.compile(rf'^{re.escape(prefix)}(?:\.(\d+)(?:-from-\d+-\d+)?)?{re.escape(self._spool_ext)}$')
+        spools = []
+        for name in sorted(os.listdir(directory)):
+            match = pattern.match(name)
+            if not match:
+                continue
+            owner = int(match.group(1)) if match.group(1) else None
+            if owner == pid or owner is None or not self._process_alive(owner):
+                spools.append((os.path.join(directory, name), owner))
+        return spools
+
+    def _spool_files(self) -> List[str]:
+        """This worker's spool files, after claiming those of workers that are gone"""
+        pid = os.getpid()
+        own = []
+        for path, owner in self._replayable_spools():
+            if owner == pid:
+                own.append(path)
+                continue
+            claimed = f"{self._spool_stem}.{pid}-from-{owner or 0}-{time.time_ns()}{self._spool_ext}"
+            try:
+                # Atomic: if another worker claimed it first, the rename fails
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+            logger.info(f"Claimed ratings spool {os.path.basename(path)} left by a stopped worker")
+            own.append(claimed)
+        return own
+
+    def _spool_rows(self, records: List[tuple], path: Optional[str] = None):
+        path = path or self.own_spool_path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'a', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            for record in records:
+                writer.writerow(
+                    value.isoformat() if isinstance(value, datetime) else ('' if value is None else value)
+                    for value in record
+                )
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _rewrite_spool(self, path: str, records: List[tuple]):
+        """Replace a spool file with the rows that still have to be replayed"""
+        if not records:
+            os.remove(path)
+            return
+        self._spool_rows(records, path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def _parse_spool_row(row: List[str]) -> tuple:
+        if len(row) != len(RATINGS_COLUMNS):
+            raise ValueError(f"expected {len(RATINGS_COLUMNS)} columns, got {len(row)}")
+        values = []
+        for column, value in zip(RATINGS_COLUMNS, row):
+            if value == '':
+                values.append(None)
+            elif column in RATINGS_DATETIME_COLUMNS:
+                values.append(datetime.fromisoformat(value))
+            elif column == 'rating':
+                values.append(int(value))
+            else:
+                values.append(value)
+        return tuple(values)
+
+    def _read_spool(self, path: str):
+        """Parsed rows, plus the raw rows that could not be parsed"""
+        records, malformed = [], []
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                try:
+                    records.append(self._parse_spool_row(row))
+                except ValueError as e:
+                    logger.warning(f"Quarantining malformed ratings spool row: {e}")
+                    malformed.append(row)
+        return records, malformed
+
+    def _quarantine_raw(self, rows: List[List[str]]):
+        with open(self.quarantine_path, 'a', newline='', encoding='utf-8') as f:
+            csv.writer(f).writerows(rows)
+
+    def has_spool(self) -> bool:
+        return bool(self._replayable_spools())
+
+    # === FLUSHING ===
+    async def _quarantine(self, records: List[tuple]):
+        await asyncio.to_thread(self._spool_rows, records, self.quarantine_path)
+        self.quarantined += len(records)
+
+    async def _replay_file(self, path: str):
+        """
+        Insert one spool file. If the database rejects the batch, rows are retried
+        one at a time and the rejected ones quarantined; if it becomes unreachable,
+        the rows not yet inserted stay in the file for the next flush.
+        """
+        records, malformed = await asyncio.to_thread(self._read_spool, path)
+        if malformed:
+            await asyncio.to_thread(self._quarantine_raw, malformed)
+            self.quarantined += len(malformed)
+        try:
+            if records:
+                await self._insert(records)
+            inserted = len(records)
+        except RATING_ROW_ERRORS as e:
+            logger.warning(f"Spooled ratings rejected as a batch ({e}); replaying them one by one")
+            inserted = 0
+            for index, record in enumerate(records):
+                try:
+                    await self._insert([record])
+                    inserted += 1
+                except RATING_ROW_ERRORS as row_error:
+                    logger.warning(f"Quarantining spooled rating rejected by the database: {row_error}")
+                    await self._quarantine([record])
+                except Exception:
+                    await asyncio.to_thread(self._rewrite_spool, path, records[index:])
+                    self.replayed += inserted
+                    raise
+        await asyncio.to_thread(self._rewrite_spool, path, [])
+        self.replayed += inserted
+        logger.info(f"Replayed {inserted} spooled ratings into the database")
+
+    async def _replay_spool(self):
+        for path in await asyncio.to_thread(self._spool_files):
+            await self._replay_file(path)
+
+    async def flush(self):
+        """Write pending rows to the database, or to this worker's spool if that fails"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            batch, self._pending = self._pending, []
+            try:
+                await self._replay_spool()
+            except Exception as e:
+                # The new batch is still tried on its own; a stuck spool must not hold it back
+                self.failures += 1
+                self.last_error = str(e)
+                logger.warning(f"Ratings spool replay failed: {e}")
+            if not batch:
+                return
+            try:
+                await self._insert(batch)
+                self.inserted += len(batch)
+                self.batches += 1
+            except asyncio.CancelledError:
+                # The batch is already out of _pending; keep it on disk rather than drop it
+                await asyncio.to_thread(self._spool_rows, batch)
+                self.spooled += len(batch)
+                raise
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.warning(f"Ratings database write failed, spooling {len(batch)} ratings: {e}")
+                await asyncio.to_thread(self._spool_rows, batch)
+                self.spooled += len(batch)
+
+    async def _flush_forever(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                break
+            if self._pending or self.has_spool():
+                await self.flush()
+
+    def start(self):
+        if self.enabled and self._flusher is None:
+            self._stopping = False
+            self._wakeup = asyncio.Event()
+            self._lock = asyncio.Lock()
+            self._flusher = asyncio.create_task(self._flush_forever())
+
+    async def stop(self):
+        """Stop the background flusher and write out whatever is still pending"""
+        if self._flusher is not None:
+            # Let a flush in progress finish instead of cancelling it mid-insert
+            self._stopping = True
+            self._wakeup.set()
+            await self._flusher
+            self._flusher = None
+        if self._pending:
+            await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            "inserted": self.inserted,
+            "batches": self.batches,
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "quarantined": self.quarantined,
+            "spool_pending": self.has_spool(),
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+class DatabaseUnavailableError(Exception):
+    """A lookup failed fast: every breaker is open, or the database timed out or dropped the connection."""
+
+# Errors that say the server is slow or unreachable (as opposed to a bad query);
+# these count against a target's circuit breaker
+AVAILABILITY_ERRORS = (
+    asyncio.TimeoutError,
+    OSError,
+    CircuitOpenError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.InterfaceError,
+    asyncpg.QueryCanceledError,
+    asyncpg.CannotConnectNowError,
+    asyncpg.TooManyConnectionsError,
+)
+
+def dsn_label(dsn: str) -> str:
+    """host:port/database of a DSN, without credentials"""
+    parts = urlsplit(dsn)
+    host = parts.hostname or 'localhost'
+    return f"{host}:{parts.port or 5432}{parts.path or ''}"
+
+class ReadTarget:
+    """A database that serves lookups: its pool, circuit breaker and latency estimate."""
+
+    def __init__(self, name: str, dsn: str, breaker: CircuitBreaker):
+        self.name = name
+        self.dsn = dsn
+        self.breaker = breaker
+        self.pool = None
+        self.latency: Optional[float] = None
+        self.queries = 0
+
+    def observe(self, seconds: float):
+        """Fold one successful query time into the moving average"""
+        self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+        self.queries += 1
+
+    @property
+    def weight(self) -> float:
+        # Faster targets get proportionally more traffic; unmeasured ones start at 10ms
+        return 1.0 / max(self.latency if self.latency is not None else 0.01, 0.001)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "target": dsn_label(self.dsn),
+            "latency_ms": round(self.latency * 1000, 3) if self.latency is not None else None,
+            "queries": self.queries,
+            "pool_size": self.pool.get_size() if self.pool else 0,
+            "breaker": self.breaker.get_stats(),
+        }
+
 class DatabaseManager:
 
     def __init__(self):
         self.pool = None
+        self.statements = statements
+        self.pool_min_size = int(os.getenv('POSTGRES_POOL_MIN_SIZE', '1'))
+        self.pool_max_size = int(os.getenv('POSTGRES_POOL_MAX_SIZE', '10'))
+        self.command_timeout = float(os.getenv('POSTGRES_COMMAND_TIMEOUT', '60'))
+        self.statement_cache_size = int(os.getenv('POSTGRES_STATEMENT_CACHE_SIZE', '100'))
+        # Warmup relies on the statement cache, so it is skipped when the cache is off
+        # (e.g. behind pgbouncer in transaction mode)
+        self.prepare_on_connect = (
+            env_bool('POSTGRES_PREPARE_STATEMENTS', True) and self.statement_cache_size > 0
+        )
         self.database_url = os.getenv('DATABASE_URL')
         if not self.database_url:
             user = os.getenv('POSTGRES_USER', 'postgres')
@@ -19,17 +774,65 @@ class DatabaseManager:
             port = os.getenv('POSTGRES_PORT', '5432')
             database = os.getenv('POSTGRES_DB', 'postgres')
             self.database_url = f"postgresql://{user}:{password}@{host}:{port}/{database}"
+        # Lookups get a much shorter budget than command_timeout, for pool checkout
+        # and for the query itself, so a slow server can't pin a request for a minute
+        self.query_timeout = float(os.getenv('POSTGRES_QUERY_TIMEOUT', '5'))
+        breaker_threshold = int(os.getenv('DB_BREAKER_FAILURE_THRESHOLD', '5'))
+        breaker_reset = float(os.getenv('DB_BREAKER_RESET_SECONDS', '30'))
+        self.primary = ReadTarget(
+            'primary', self.database_url, CircuitBreaker('primary', breaker_threshold, breaker_reset)
+        )
+        # Read replicas for grievance lookups; the primary is only used when all of them are down
+        read_urls = [url.strip() for url in os.getenv('POSTGRES_READ_URLS', '').split(',') if url.strip()]
+        self.replicas = [
+            ReadTarget(f'replica{i}', url, CircuitBreaker(f'replica{i}', breaker_threshold, breaker_reset))
+            for i, url in enumerate(read_urls, start=1)
+        ]
+        # Opt-in: concurrent status lookups within a few milliseconds share one query
+        self.status_batcher = None
+        if env_bool('STATUS_BATCH_ENABLED', False):
+            self.status_batcher = MicroBatcher(
+                self.fetch_grievance_statuses,
+                window=float(os.getenv('STATUS_BATCH_WINDOW_MS', '2')) / 1000,
+                max_batch=int(os.getenv('STATUS_BATCH_MAX_SIZE', '64'))
+            )
+        self.user_search_page_size = int(os.getenv('USER_SEARCH_PAGE_SIZE', '20'))
+        self.user_search_max_page_size = int(os.getenv('USER_SEARCH_MAX_PAGE_SIZE', '100'))
+        self.user_search_max_stream_rows = int(os.getenv('USER_SEARCH_MAX_STREAM_ROWS', '5000'))
+        self.statistics = SnapshotRefresher(
+            'grievance statistics',
+            self.compute_grievance_statistics,
+            interval=float(os.getenv('GRIEVANCE_STATS_REFRESH_SECONDS', '300'))
+        )
+        # COPY budget; larger than query_timeout because a spool replay can be big
+        self.ratings_insert_timeout = float(os.getenv('RATINGS_DB_INSERT_TIMEOUT_SECONDS', '10'))
+        self.ratings = RatingsBuffer(
+            self.insert_ratings,
+            spool_path=os.getenv(
+                'RATINGS_SPOOL_PATH',
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ratings_data', 'ratings_spool.csv')
+            ),
+            batch_size=int(os.getenv('RATINGS_DB_BATCH_SIZE', '200')),
+            flush_interval=float(os.getenv('RATINGS_DB_FLUSH_INTERVAL_SECONDS', '2')),
+            enabled=env_bool('RATINGS_DB_ENABLED', True)
+        )
+
+    async def _create_pool(self, dsn: str, min_size: int):
+        return await asyncpg.create_pool(
+            dsn,
+            min_size=min_size,
+            max_size=self.pool_max_size,
+            command_timeout=self.command_timeout,
+            statement_cache_size=self.statement_cache_size,
+            init=self._init_connection,
+            server_settings={'application_name': 'maha_jal_chatbot'}
+        )
 
     async def init_pool(self):
         """Initialize asyncpg connection pool"""
         try:
-            self.pool = await asyncpg.create_pool(
-                self.database_url,
-                min_size=1,
-                max_size=10,
-                command_timeout=60,
-                server_settings={'application_name': 'maha_jal_chatbot'}
-            )
+            self.pool = await self._create_pool(self.database_url, self.pool_min_size)
+            self.primary.pool = self.pool
             # Test connection immediately
             async with self.pool.acquire() as conn:
                 version = await conn.fetchval("SELECT version()")
@@ -37,69 +840,155 @@ class DatabaseManager:
         except Exception as e:
             logger.error(f"❌ Failed to initialize database pool: {e}")
             raise Exception("Database pool initialization failed")
+        for replica in self.replicas:
+            # min_size=0 connects lazily, so a replica that is down at startup only
+            # trips its breaker instead of failing startup
+            replica.pool = await self._create_pool(replica.dsn, 0)
+            logger.info(f"Read replica {replica.name} configured: {dsn_label(replica.dsn)}")
+
+    async def _init_connection(self, conn):
+        """Per-connection warmup, run by the pool for every new connection"""
+        if self.prepare_on_connect:
+            await self.statements.prepare_connection(conn)
 
     async def close_pool(self):
         """Close the connection pool gracefully"""
+        for replica in self.replicas:
+            if replica.pool:
+                await replica.pool.close()
+                replica.pool = None
         if self.pool:
             await self.pool.close()
+            self.primary.pool = None
+            self.statements.clear()
             logger.info("🔒 Database connection pool closed")
+
+    # === READ ROUTING ===
+    def _choose_read_target(self, exclude=()) -> Optional[ReadTarget]:
+        """A healthy replica picked by weight, else the primary, else None"""
+        replicas = [r for r in self.replicas if r.pool and r not in exclude and r.breaker.available()]
+        if replicas:
+            return random.choices(replicas, weights=[r.weight for r in replicas])[0]
+        if self.primary not in exclude and self.primary.breaker.available():
+            return self.primary
+        return None
+
+    async def _run_on(self, target: ReadTarget, operation):
+        started = time.perf_counter()
+        target.breaker.before_call()
+        try:
+            async with target.pool.acquire(timeout=self.query_timeout) as connection:
+                DB_POOL_ACQUIRE_SECONDS.observe(time.perf_counter() - started, target.name)
+                result = await operation(connection)
+        except AVAILABILITY_ERRORS as e:
+            target.breaker.record_failure(e)
+            raise
+        except BaseException:
+            target.breaker.release()
+            raise
+        target.observe(time.perf_counter() - started)
+        target.breaker.record_success()
+        return result
+
+    async def run_read(self, operation):
+        """
+        Run `operation(connection)` on a read target within query_timeout.
+        A slow or unreachable target counts against its breaker and the call
+        is retried once on another healthy target. DatabaseUnavailableError
+        is raised when none is left, immediately if every breaker is open.
+        Query errors are raised as-is.
+        """
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+        tried = []
+        last_error = None
+        while len(tried) < 2:
+            target = self._choose_read_target(exclude=tried)
+            if target is None:
+                break
+            tried.append(target)
+            try:
+                return await self._run_on(target, operation)
+            except AVAILABILITY_ERRORS as e:
+                last_error = e
+                logger.warning(f"Read on {target.name} failed: {e!r}")
+        if last_error is None:
+            raise DatabaseUnavailableError("Database unavailable: every circuit breaker is open")
+        raise DatabaseUnavailableError(f"Database unavailable: {last_error!r}") from last_error
+
+    def get_routing_stats(self) -> Dict[str, Any]:
+        return {
+            "query_timeout_seconds": self.query_timeout,
+            "status_batching": self.status_batcher.get_stats() if self.status_batcher else {"enabled": False},
+            "primary": self.primary.get_stats(),
+            "replicas": [replica.get_stats() for replica in self.replicas],
+        }
     
-    async def get_grievance_status(self, identifier: str) -> Optional[Dict[str, Any]]:
+    async def fetch_grievance_status(self, identifier: str) -> Optional[GrievanceStatus]:
         """
-        Get grievance status by either grievance_unique_number OR mobile_number
-        This method now handles both identifier types automatically
+        Look up a grievance by grievance_unique_number or mobile_number.
+        Returns None when nothing matches and raises on database errors, so
+        callers can tell "not found" apart from "unavailable".
+        With STATUS_BATCH_ENABLED, concurrent calls share one fetch_grievance_statuses query.
         """
         if not self.pool:
-            logger.error("Database pool not initialized")
-            return None
-        
+            raise RuntimeError("Database pool not initialized")
+        if self.status_batcher is not None:
+            return await self.status_batcher.load(identifier)
+
+        identifier_type = classify_identifier(identifier)
+        result = await self.run_read(lambda connection: self.statements.fetchrow(
+            connection, IDENTIFIER_QUERIES[identifier_type], identifier, timeout=self.query_timeout
+        ))
+
+        if result:
+            logger.debug(f"Grievance found by {identifier_type}: {identifier}")
+            return GrievanceStatus.from_record(result)
+        logger.debug(f"No grievance found for identifier: {identifier}")
+        return None
+
+    async def fetch_grievance_statuses(self, identifiers: List[str]) -> Dict[str, Optional[GrievanceStatus]]:
+        """
+        Look up many identifiers with one query per identifier type, on one
+        connection. Returns a result (None when not found) for every identifier.
+        """
+        groups: Dict[str, List[str]] = {}
+        for identifier in dict.fromkeys(identifiers):
+            groups.setdefault(classify_identifier(identifier), []).append(identifier)
+
+        async def lookup(connection):
+            rows = []
+            for identifier_type, group in groups.items():
+                rows += await self.statements.fetch(
+                    connection, BATCH_IDENTIFIER_QUERIES[identifier_type], group, timeout=self.query_timeout
+                )
+            return rows
+
+        results: Dict[str, Optional[GrievanceStatus]] = dict.fromkeys(identifiers)
+        for row in await self.run_read(lookup):
+            results[row['identifier']] = GrievanceStatus.from_record(row[1:])
+        logger.debug(f"Batch lookup matched {sum(r is not None for r in results.values())}/{len(results)} identifiers")
+        return results
+
+    async def get_grievance_status(self, identifier: str) -> Optional[GrievanceStatus]:
+        """
+        Get grievance status by either grievance_unique_number OR mobile_number
+        The identifier is classified up front so each lookup is a single query
+        """
         try:
-            async with self.pool.acquire() as connection:
-                # First try by grievance_unique_number
-                query_by_unique_number = '''
-                SELECT gd.*, g.grievance_unique_number
-                FROM public.grievance_detail2 gd
-                INNER JOIN public.grievances g ON gd.grievance_id = g.id
-                WHERE g.grievance_unique_number = $1
-                '''
-                
-                result = await connection.fetchrow(query_by_unique_number, identifier)
-                
-                # If not found by unique number, try by mobile number
-                if not result:
-                    logger.info(f"Grievance not found by unique number, trying mobile number: {identifier}")
-                    query_by_mobile = '''
-                    SELECT gd.*, g.grievance_unique_number
-                    FROM public.grievance_detail2 gd
-                    INNER JOIN public.grievances g ON gd.grievance_id = g.id
-                    WHERE gd.mobile_number = $1 OR g.mobile_number = $1
-                    ORDER BY gd.grievance_logged_date DESC
-                    LIMIT 1
-                    '''
-                    
-                    result = await connection.fetchrow(query_by_mobile, identifier)
-                    
-                    if result:
-                        logger.info(f"Grievance found by mobile number: {identifier}")
-                
-                if result:
-                    return dict(result)
-                else:
-                    logger.info(f"No grievance found for identifier: {identifier}")
-                    return None
-                    
+            return await self.fetch_grievance_status(identifier)
         except Exception as e:
             logger.error(f"DB error fetching grievance status: {e}")
             return None
 
-    async def get_grievance_status_by_unique_number(self, grievance_unique_number: str) -> Optional[Dict[str, Any]]:
+    async def get_grievance_status_by_unique_number(self, grievance_unique_number: str) -> Optional[GrievanceStatus]:
         """
         Deprecated: Use get_grievance_status instead
         Kept for backward compatibility
         """
         return await self.get_grievance_status(grievance_unique_number)
 
-    async def get_grievance_status_by_mobile_number(self, mobile_number: str) -> Optional[Dict[str, Any]]:
+    async def get_grievance_status_by_mobile_number(self, mobile_number: str) -> Optional[GrievanceStatus]:
         """
         Get grievance status by mobile number (latest grievance for the mobile number)
         """
@@ -108,36 +997,267 @@ class DatabaseManager:
             return None
         
         try:
-            async with self.pool.acquire() as connection:
-                query = '''
-                SELECT gd.*, g.grievance_unique_number
-                FROM public.grievance_detail2 gd
-                INNER JOIN public.grievances g ON gd.grievance_id = g.id
-                WHERE gd.mobile_number = $1 OR g.mobile_number = $1
-                ORDER BY gd.grievance_logged_date DESC
-                LIMIT 1
-                '''
-                
-                result = await connection.fetchrow(query, mobile_number)
-                
-                if result:
-                    logger.info(f"Grievance found by mobile number: {mobile_number}")
-                    return dict(result)
-                else:
-                    logger.info(f"No grievance found for mobile number: {mobile_number}")
-                    return None
-                    
+            result = await self.run_read(lambda connection: self.statements.fetchrow(
+                connection, STATUS_BY_MOBILE, mobile_number, timeout=self.query_timeout
+            ))
+
+            if result:
+                logger.debug(f"Grievance found by mobile number: {mobile_number}")
+                return GrievanceStatus.from_record(result)
+            else:
+                logger.debug(f"No grievance found for mobile number: {mobile_number}")
+                return None
+
         except Exception as e:
             logger.error(f"DB error fetching by mobile number: {e}")
             return None
 
+    async def search_grievances_by_user(
+        self,
+        user_identifier: str,
+        page_size: Optional[int] = None,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        One page of a user's grievances, newest first, matched by mobile number,
+        email or name. Pass the returned next_cursor to get the following page;
+        it is None on the last page. Raises ValueError for bad input.
+        """
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+        search_type, value = classify_user_identifier(user_identifier.strip())
+        page_size = max(1, min(page_size or self.user_search_page_size, self.user_search_max_page_size))
+        sort_key, row_id = decode_search_cursor(cursor) if cursor else (None, None)
+
+        # One extra row tells whether another page exists
+        rows = await self.run_read(lambda connection: self.statements.fetch(
+            connection, USER_SEARCH_QUERIES[search_type], value, sort_key, row_id, page_size + 1,
+            timeout=self.query_timeout
+        ))
+
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_search_cursor(rows[-1]['sort_key'], rows[-1]['id'])
+        grievances = []
+        for row in rows:
+            grievance = dict(row)
+            del grievance['id'], grievance['sort_key']
+            grievances.append(grievance)
+        return {"search_type": search_type, "grievances": grievances, "next_cursor": next_cursor}
+
+    async def iter_grievances_by_user(
+        self,
+        user_identifier: str,
+        page_size: Optional[int] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream all of a user's grievances page by page, up to USER_SEARCH_MAX_STREAM_ROWS.
+        The connection is released between pages, so a slow reader never holds it.
+        """
+        page_size = page_size or self.user_search_max_page_size
+        cursor, sent = None, 0
+        while sent < self.user_search_max_stream_rows:
+            page = await self.search_grievances_by_user(
+                user_identifier, min(page_size, self.user_search_max_stream_rows - sent), cursor
+            )
+            for grievance in page["grievances"]:
+                yield grievance
+            sent += len(page["grievances"])
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return
+        logger.warning(f"User search stream stopped at {sent} rows for identifier: {user_identifier}")
+
+    async def compute_grievance_statistics(self) -> Dict[str, Any]:
+        """Grievance counts by status, district and category, largest first (one query)"""
+        # A background aggregate, so it runs under command_timeout rather than query_timeout
+        async def fetch_statistics(connection):
+            with DB_QUERY_SECONDS.time("grievance_statistics"):
+                return await connection.fetch(GRIEVANCE_STATISTICS_SQL)
+
+        rows = await self.run_read(fetch_statistics)
+
+        stats = {"total_grievances": 0, "by_status": {}, "by_district": {}, "by_category": {}}
+        for row in sorted(rows, key=lambda r: -r['total']):
+            if row['grouping_set'] == 7:
+                stats["total_grievances"] = row['total']
+            elif row['grouping_set'] in STATISTICS_GROUPS:
+                key, column = STATISTICS_GROUPS[row['grouping_set']]
+                stats[key][row[column] or "Unknown"] = row['total']
+        return stats
+
+    async def get_grievance_statistics(self) -> Dict[str, Any]:
+        """
+        The latest statistics snapshot, refreshed in the background every
+        GRIEVANCE_STATS_REFRESH_SECONDS. Never waits on a refresh once a
+        snapshot exists; raises if no snapshot could be generated yet.
+        """
+        stats = dict(await self.statistics.get())
+        stats["snapshot"] = self.statistics.get_stats()
+        return stats
+
+    async def insert_ratings(self, records: List[tuple]) -> int:
+        """Bulk-insert rating rows (RATINGS_COLUMNS order) with COPY; raises on errors"""
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+
+        # Through the primary's breaker with a bounded checkout and COPY, so an outage
+        # sends the batch to the spool promptly instead of waiting on the connect timeout
+        async def copy_ratings(connection):
+            with DB_QUERY_SECONDS.time("insert_ratings"):
+                await connection.copy_records_to_table(
+                    RATINGS_TABLE, records=records, columns=RATINGS_COLUMNS, timeout=self.ratings_insert_timeout
+                )
+
+        await self._run_on(self.primary, copy_ratings)
+        return len(records)
+
+    @staticmethod
+    def _rating_entry(row) -> Dict[str, Any]:
+        """Shape a ratings table row like a ratings CSV row"""
+        identifier = row['grievance_id']
+        is_phone = bool(identifier) and validate_mobile_number_format(identifier)
+        return {
+            "timestamp": row['timestamp'].strftime("%Y-%m-%d %H:%M:%S") if row['timestamp'] else "",
+            "session_id": row['session_id'],
+            "rating": row['rating'],
+            "Feedback": row['rating_label'],
+            "language": row['language'],
+            "grievance_id": "N/A" if is_phone or not identifier else identifier,
+            "phone_number": identifier if is_phone else "N/A",
+        }
+
+    async def _fetch_ratings_page(self, sql: str, *args) -> list:
+        async def fetch_page(connection):
+            with DB_QUERY_SECONDS.time("export_ratings"):
+                return await connection.fetch(sql, *args, timeout=self.query_timeout)
+
+        return await self.run_read(fetch_page)
+
+    async def iter_ratings(
+        self,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        language: Optional[str] = None,
+        min_rating: Optional[int] = None,
+        max_rating: Optional[int] = None,
+        page_size: int = 500
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream stored ratings, oldest first, in keyset pages on (timestamp, id).
+        The connection is released between pages, so a slow reader never holds it.
+        grievance_id holds a phone number for ratings linked by mobile number.
+        """
+        if not self.pool:
+            raise RuntimeError("Database pool not initialized")
+        conditions, args = [], []
+        if start_date:
+            args.append(datetime.combine(start_date, datetime.min.time()))
+            conditions.append(f"timestamp >= ${len(args)}")
+        if end_date:
+            args.append(datetime.combine(end_date + timedelta(days=1), datetime.min.time()))
+            conditions.append(f"timestamp < ${len(args)}")
+        if language:
+            args.append(language)
+            conditions.append(f"language = ${len(args)}")
+        if min_rating is not None:
+            args.append(min_rating)
+            conditions.append(f"rating >= ${len(args)}")
+        if max_rating is not None:
+            args.append(max_rating)
+            conditions.append(f"rating <= ${len(args)}")
+        filters = "".join(f"{condition} AND " for condition in conditions)
+        columns = "id, timestamp, session_id, rating, rating_label, language, grievance_id"
+        n = len(args)
+
+        after_timestamp, after_id = datetime.min, 0
+        while True:
+            rows = await self._fetch_ratings_page(
+                f"SELECT {columns} FROM ratings WHERE {filters}(timestamp, id) > (${n + 1}, ${n + 2}) "
+                f"ORDER BY timestamp, id LIMIT ${n + 3}",
+                *args, after_timestamp, after_id, page_size
+            )
+            for row in rows:
+                yield self._rating_entry(row)
+            if len(rows) < page_size:
+                break
+            after_timestamp, after_id = rows[-1]['timestamp'], rows[-1]['id']
+
+        # Rows without a timestamp sort last, as they did under ORDER BY timestamp
+        if start_date or end_date:
+            return
+        after_id = 0
+        while True:
+            rows = await self._fetch_ratings_page(
+                f"SELECT {columns} FROM ratings WHERE {filters}timestamp IS NULL AND id > ${n + 1} "
+                f"ORDER BY id LIMIT ${n + 2}",
+                *args, after_id, page_size
+            )
+            for row in rows:
+                yield self._rating_entry(row)
+            if len(rows) < page_size:
+                return
+            after_id = rows[-1]['id']
+
+    async def fetch_ratings(self) -> List[Dict[str, Any]]:
+        """All stored ratings, oldest first, shaped like the ratings CSV rows"""
+        return [entry async for entry in self.iter_ratings()]
+
+    async def explain_statements(self) -> Dict[str, Dict[str, Any]]:
+        """
+        EXPLAIN the generic plan of every declared statement with sequential
+        scans disabled. Any Seq Scan that is still chosen has no usable index,
+        whatever the table size. Runs on its own connection, not the pool.
+        """
+        report = {}
+        conn = await asyncpg.connect(self.database_url)
+        try:
+            for i, (name, sql) in enumerate(self.statements.statements.items()):
+                param_count = self.statements._param_counts[name]
+                args = f"({', '.join(['NULL'] * param_count)})" if param_count else ""
+                try:
+                    async with conn.transaction():
+                        await conn.execute("SET LOCAL enable_seqscan = off")
+                        await conn.execute("SET LOCAL plan_cache_mode = force_generic_plan")
+                        await conn.execute(f"PREPARE index_advisor_{i} AS {sql}")
+                        plan = json.loads(await conn.fetchval(f"EXPLAIN (FORMAT JSON) EXECUTE index_advisor_{i}{args}"))
+                except Exception as e:
+                    report[name] = {"error": str(e)}
+                    continue
+                nodes = list(plan_nodes(plan[0]['Plan']))
+                report[name] = {
+                    "seq_scans": sorted({n['Relation Name'] for n in nodes if n['Node Type'] == 'Seq Scan'}),
+                    "indexes_used": sorted({n['Index Name'] for n in nodes if 'Index Name' in n}),
+                    "total_cost": plan[0]['Plan']['Total Cost'],
+                }
+        finally:
+            await conn.close()
+        return report
+
+    async def check_indexes(self) -> List[str]:
+        """Log a warning for each declared statement that needs a sequential scan; returns their names"""
+        flagged = []
+        for name, result in (await self.explain_statements()).items():
+            if result.get("error"):
+                logger.warning(f"Index check could not explain '{name}': {result['error']}")
+            elif result["seq_scans"]:
+                flagged.append(name)
+                logger.warning(
+                    f"Statement '{name}' scans {', '.join(result['seq_scans'])} sequentially; "
+                    "apply recommended_indexes.sql"
+                )
+        if not flagged:
+            logger.info("Index check: every declared statement is served by an index")
+        return flagged
+
     async def test_connection(self) -> bool:
         """Test database connectivity"""
         if not self.pool:
             return False
         try:
-            async with self.pool.acquire() as conn:
-                await conn.fetchval("SELECT 1")
+            async with self.pool.acquire(timeout=self.query_timeout) as conn:
+                await conn.fetchval("SELECT 1", timeout=self.query_timeout)
                 return True
         except Exception as e:
             logger.error("Database connection test failed:", exc_info=True)
@@ -173,7 +1293,8 @@ class DatabaseManager:
                     "user": user,
                     "version": version,
                     "active_connections": conn_count,
-                    **pool_info
+                    **pool_info,
+                    "prepared_statements": self.statements.get_stats()
                 }
         except Exception as e:
             logger.error("Error getting database info:", exc_info=True)
@@ -217,6 +1338,40 @@ class DatabaseManager:
 # --- Global Singleton Manager ---
 db_manager = DatabaseManager()
 
+# Grievance status results, shared by /query/ and /grievance/status/
+status_cache = ResultCache(
+    max_entries=int(os.getenv('STATUS_CACHE_MAX_ENTRIES', '10000')),
+    ttl=float(os.getenv('STATUS_CACHE_TTL_SECONDS', '30')),
+    negative_ttl=float(os.getenv('STATUS_CACHE_NEGATIVE_TTL_SECONDS', '10'))
+)
+
+def collect_database_metrics():
+    """Scrape-time view of the cache, prepared statement and pool counters kept above"""
+    lookups = Counter("chatbot_cache_lookups_total", "Cache lookups by result", ("cache", "result"))
+    hit_ratio = Gauge("chatbot_cache_hit_ratio", "Share of cache lookups served without a query", ("cache",))
+    entries = Gauge("chatbot_cache_entries", "Entries currently cached", ("cache",))
+    cache = status_cache.get_stats()
+    for result in ("hits", "misses", "coalesced"):
+        lookups.inc("grievance_status", result, amount=cache[result])
+    hit_ratio.set(cache["hit_ratio"], "grievance_status")
+    entries.set(cache["size"], "grievance_status")
+    lookups.inc("prepared_statements", "hits", amount=statements.hits)
+    lookups.inc("prepared_statements", "misses", amount=statements.misses)
+    prepared = statements.hits + statements.misses
+    hit_ratio.set(statements.hits / prepared if prepared else 0.0, "prepared_statements")
+
+    pool_size = Gauge("chatbot_db_pool_connections", "Pooled connections by state", ("target", "state"))
+    breaker_open = Gauge("chatbot_db_breaker_open", "1 while the target's circuit breaker is not closed", ("target",))
+    for target in [db_manager.primary] + db_manager.replicas:
+        if target.pool:
+            idle = target.pool.get_idle_size()
+            pool_size.set(idle, target.name, "idle")
+            pool_size.set(target.pool.get_size() - idle, target.name, "in_use")
+        breaker_open.set(0 if target.breaker.get_stats()["state"] == "closed" else 1, target.name)
+    return [lookups, hit_ratio, entries, pool_size, breaker_open]
+
+REGISTRY.add_collector(collect_database_metrics)
+
 async def init_database():
     """Initialize the database connection pool"""
     await db_manager.init_pool()
@@ -225,18 +1380,96 @@ async def close_database():
     """Close the database connection pool"""
     await db_manager.close_pool()
 
-async def get_grievance_status(identifier: str) -> Optional[Dict[str, Any]]:
-    """Get grievance status by either grievance_unique_number or mobile_number"""
-    return await db_manager.get_grievance_status(identifier)
+async def get_grievance_status(identifier: str) -> Optional[GrievanceStatus]:
+    """
+    Get grievance status by either grievance_unique_number or mobile_number (cached).
+    Raises DatabaseUnavailableError when the lookup failed fast; other errors give None.
+    """
+    identifier = identifier.strip()
+    try:
+        return await status_cache.get_or_load(
+            identifier, lambda: db_manager.fetch_grievance_status(identifier)
+        )
+    except DatabaseUnavailableError:
+        raise
+    except Exception as e:
+        logger.error(f"DB error fetching grievance status: {e}")
+        return None
+
+async def get_grievance_statuses(identifiers: List[str]) -> Dict[str, Optional[GrievanceStatus]]:
+    """
+    Grievance status for many identifiers: cached ones are answered from the
+    status cache and the rest are looked up together, then cached.
+    Raises DatabaseUnavailableError when the lookup failed fast.
+    """
+    return await status_cache.get_or_load_many(
+        (identifier.strip() for identifier in identifiers), db_manager.fetch_grievance_statuses
+    )
+
+def queue_rating(record: tuple):
+    """Buffer a rating row for the next batched COPY into the ratings table"""
+    db_manager.ratings.submit(record)
+
+async def start_ratings_writer():
+    """Start flushing buffered ratings (replays any spool left from a previous run)"""
+    db_manager.ratings.start()
+
+async def stop_ratings_writer():
+    """Flush buffered ratings to the database or spool"""
+    await db_manager.ratings.stop()
+
+async def load_stored_ratings() -> List[Dict[str, Any]]:
+    """Get every stored rating as CSV-shaped rows (wrapper)"""
+    return await db_manager.fetch_ratings()
 
-async def search_user_grievances(user_identifier: str) -> List[Dict[str, Any]]:
-    """Search grievances by user (wrapper)"""
-    return await db_manager.search_grievances_by_user(user_identifier)
+def stream_stored_ratings(**filters) -> AsyncIterator[Dict[str, Any]]:
+    """Stream stored ratings matching the export filters (wrapper)"""
+    return db_manager.iter_ratings(**filters)
+
+def get_ratings_writer_stats() -> Dict[str, Any]:
+    """Get ratings buffer counters (wrapper)"""
+    return db_manager.ratings.get_stats()
+
+def invalidate_grievance_status(identifier: Optional[str] = None) -> int:
+    """Drop a cached grievance status, or the whole cache when no identifier is given"""
+    return status_cache.invalidate(identifier.strip() if identifier else None)
+
+def get_status_cache_stats() -> Dict[str, Any]:
+    """Get grievance status cache counters (wrapper)"""
+    return status_cache.get_stats()
+
+async def search_user_grievances(
+    user_identifier: str,
+    page_size: Optional[int] = None,
+    cursor: Optional[str] = None
+) -> Dict[str, Any]:
+    """Get one page of grievances for a mobile number, email or name (wrapper)"""
+    return await db_manager.search_grievances_by_user(user_identifier, page_size, cursor)
+
+def stream_user_grievances(user_identifier: str, page_size: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Stream every page of a user search (wrapper)"""
+    return db_manager.iter_grievances_by_user(user_identifier, page_size)
 
 async def get_db_statistics() -> Dict[str, Any]:
     """Get grievance statistics (wrapper)"""
     return await db_manager.get_grievance_statistics()
 
+def start_statistics_refresher():
+    """Start refreshing the grievance statistics snapshot in the background"""
+    db_manager.statistics.start()
+
+async def stop_statistics_refresher():
+    """Stop the grievance statistics refresher"""
+    await db_manager.statistics.stop()
+
+async def check_db_indexes() -> List[str]:
+    """EXPLAIN the declared statements and warn about sequential scans (wrapper)"""
+    return await db_manager.check_indexes()
+
+def get_db_routing_stats() -> Dict[str, Any]:
+    """Get read routing and circuit breaker state (wrapper)"""
+    return db_manager.get_routing_stats()
+
 async def test_db_connection() -> bool:
     """Test database connection (wrapper)"""
     return await db_manager.test_connection()
@@ -251,4 +1484,30 @@ async def get_db_tables() -> List[str]:
 
 async def check_table_columns(table_name: str) -> List[str]:
     """Get table columns (wrapper)"""
-    return await db_manager.check_table_structure(table_name)
\ No newline at end of file
+    return await db_manager.check_table_structure(table_name)
+
+async def _index_report(write_ddl: Optional[str]) -> int:
+    report = await db_manager.explain_statements()
+    flagged = 0
+    for name, result in report.items():
+        if result.get("error"):
+            print(f"ERROR      {name}: {result['error']}")
+        elif result["seq_scans"]:
+            flagged += 1
+            print(f"SEQ SCAN   {name}: {', '.join(result['seq_scans'])} (cost {result['total_cost']})")
+        else:
+            print(f"ok         {name}: {', '.join(result['indexes_used'])} (cost {result['total_cost']})")
+    if write_ddl:
+        print(f"Recommended indexes written to {write_index_ddl(write_ddl)}")
+    return 1 if flagged else 0
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Check that the chatbot's declared queries are served by indexes")
+    parser.add_argument(
+        "--write-ddl", metavar="PATH", nargs="?",
+        const=os.path.join(os.path.dirname(os.path.abspath(__file__)), "recommended_indexes.sql"),
+        help="also write the recommended indexes as an idempotent SQL script (default: recommended_indexes.sql)"
+    )
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(_index_report(args.write_ddl)))
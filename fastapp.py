@@ -1,35 +1,73 @@
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, field_validator, ValidationError
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Awaitable, Callable
+import asyncio
+import hmac
 import time
 import os
 import logging
-import re
-import csv
-import io
-from datetime import datetime
+import json
+from datetime import date, datetime
 from contextlib import asynccontextmanager
+from structured_logging import configure_logging, log_payload
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS
+from sessions import SessionRecord, create_session_backend
+from ratelimit import RateLimiter, RouteBudget, client_address, is_trusted_proxy, parse_trusted_proxies
+from responses import create_response_catalog
+from ratings import (
+    RatingColumns,
+    RatingFilter,
+    RatingStats,
+    create_ratings_sink,
+    export_csv_chunks,
+    export_csv_chunks_async,
+    iter_rating_csv_files,
+    rating_csv_paths,
+    read_rating_csv_files
+)
+from intents import (
+    Intent,
+    classify as classify_intent,
+    validate_grievance_id_format,
+    validate_mobile_number_format
+)
 from database import (
     db_manager,
+    DatabaseUnavailableError,
+    GrievanceStatus,
     init_database,
     close_database,
     get_grievance_status,
+    get_grievance_statuses,
+    invalidate_grievance_status,
+    get_status_cache_stats,
+    rating_record,
+    queue_rating,
+    start_ratings_writer,
+    stop_ratings_writer,
+    get_ratings_writer_stats,
+    load_stored_ratings,
+    stream_stored_ratings,
     search_user_grievances,
+    stream_user_grievances,
     get_db_statistics,
+    check_db_indexes,
+    get_db_routing_stats,
+    start_statistics_refresher,
+    stop_statistics_refresher,
     test_db_connection,
     get_db_info
 )
 
 # === CONFIGURATION ===
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
-RATE_LIMIT_SECONDS = 2
+RATE_LIMIT_SECONDS = float(os.getenv("RATE_LIMIT_SECONDS", "2"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))
 SUPPORTED_LANGUAGES = ["en", "mr"]
 
 SYSTEM_STATUS = {
@@ -43,10 +81,75 @@ SYSTEM_STATUS = {
 }
 
 # Global in-memory stores (in production, use Redis or similar)
-CHAT_HISTORY = {}
-USER_SESSION_STATE = {}
-RATINGS_DATA = []
-RATE_LIMIT_TRACKER = {}
+# Sessions go through a pluggable backend (SESSION_BACKEND=memory|sqlite) so that
+# several uvicorn workers can share conversation state
+SESSIONS = create_session_backend()
+# Compact columnar copy of every rating (labels are resolved when rows are read back)
+RATINGS_DATA = RatingColumns()
+RATINGS_SINK = create_ratings_sink()
+# Running aggregates behind /ratings/stats, rebuilt at startup from RATINGS_STATS_SOURCE (csv or db)
+RATING_STATS = RatingStats(latest_size=10)
+RATINGS_STATS_SOURCE = os.getenv("RATINGS_STATS_SOURCE", "csv").strip().lower()
+
+# Request metrics, exposed with everything else at /metrics. With METRICS_MULTIPROC_DIR
+# set, each worker publishes its snapshot there every METRICS_FLUSH_SECONDS
+HTTP_REQUESTS = METRICS.counter(
+    "chatbot_http_requests_total", "HTTP requests by route, method and status code", ("route", "method", "status")
+)
+HTTP_REQUEST_SECONDS = METRICS.histogram(
+    "chatbot_http_request_duration_seconds", "HTTP request latency by route, method and status code",
+    ("route", "method", "status")
+)
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+
+# EXPLAIN the prepared lookups at startup and warn about missing indexes (see database.py)
+CHECK_INDEXES_ON_STARTUP = os.getenv("POSTGRES_CHECK_INDEXES", "false").strip().lower() in ("1", "true", "yes", "on")
+
+# Proxies (e.g. the PHP frontend host) whose X-Forwarded-For header is believed.
+# Loopback by default, for a frontend on the same host
+TRUSTED_PROXIES = parse_trusted_proxies(os.getenv("TRUSTED_PROXIES", "127.0.0.1,::1"))
+# Peers seen sending X-Forwarded-For without being trusted; each is reported once
+UNTRUSTED_FORWARDERS: set = set()
+MAX_UNTRUSTED_FORWARDERS = 100
+
+# Operator endpoints (cache invalidation, knowledge base reload) need this value in an
+# X-Admin-Token header; while it is unset they are not exposed at all
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+def admin_rejection(request: Request) -> Optional[JSONResponse]:
+    """None when the request carries ADMIN_TOKEN, otherwise the response to send instead."""
+    if not ADMIN_TOKEN:
+        return JSONResponse(status_code=404, content={"detail": "Not Found"})
+    supplied = request.headers.get("x-admin-token", "")
+    if not hmac.compare_digest(supplied.encode("utf-8"), ADMIN_TOKEN.encode("utf-8")):
+        return JSONResponse(status_code=403, content={"success": False, "message": "Invalid admin token"})
+    return None
+
+def request_client_ip(request: Request) -> Optional[str]:
+    """Client IP for rate limiting and rating records, looking through trusted proxies."""
+    peer = request.client.host if request.client else None
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if (forwarded_for and peer and not is_trusted_proxy(peer, TRUSTED_PROXIES)
+            and peer not in UNTRUSTED_FORWARDERS and len(UNTRUSTED_FORWARDERS) < MAX_UNTRUSTED_FORWARDERS):
+        UNTRUSTED_FORWARDERS.add(peer)
+        logger.warning(
+            f"{peer} sends X-Forwarded-For but is not in TRUSTED_PROXIES; every client behind it "
+            f"shares one rate-limit IP budget"
+        )
+    return client_address(peer, forwarded_for, TRUSTED_PROXIES)
+
+# Sustained rate of one request per RATE_LIMIT_SECONDS per session, with bursts
+RATE_LIMITER = RateLimiter(
+    SESSIONS,
+    budgets={
+        "/query/": RouteBudget(rate=1 / RATE_LIMIT_SECONDS, burst=RATE_LIMIT_BURST),
+        "/grievance/status/": RouteBudget(rate=1 / RATE_LIMIT_SECONDS, burst=RATE_LIMIT_BURST),
+        "/grievance/status/batch": RouteBudget(rate=1 / RATE_LIMIT_SECONDS, burst=RATE_LIMIT_BURST),
+        "/rating/": RouteBudget(rate=1 / RATE_LIMIT_SECONDS, burst=min(5.0, RATE_LIMIT_BURST)),
+    },
+    ip_multiplier=float(os.getenv("RATE_LIMIT_IP_MULTIPLIER", "20")),
+    enabled=os.getenv("RATE_LIMIT_ENABLED", "true").strip().lower() in ("1", "true", "yes", "on")
+)
 
 # === MODELS & VALIDATION ===
 class QueryRequest(BaseModel):
@@ -96,9 +199,30 @@ class GrievanceStatusRequest(BaseModel):
             raise ValueError('Grievance ID cannot be empty')
         return v.strip()
 
+GRIEVANCE_BATCH_MAX_ITEMS = int(os.getenv("GRIEVANCE_BATCH_MAX_ITEMS", "50"))
+
+class GrievanceStatusBatchRequest(BaseModel):
+    identifiers: List[str]
+    language: str = "en"
+
+    @field_validator('identifiers')
+    @classmethod
+    def validate_identifiers(cls, v):
+        if not v:
+            raise ValueError('At least one grievance ID or mobile number is required')
+        if len(v) > GRIEVANCE_BATCH_MAX_ITEMS:
+            raise ValueError(f'At most {GRIEVANCE_BATCH_MAX_ITEMS} identifiers per request')
+        return [identifier.strip() for identifier in v]
+
+class CacheInvalidationRequest(BaseModel):
+    identifier: Optional[str] = None
+
 class UserSearchRequest(BaseModel):
     user_identifier: str
     language: str = "en"
+    page_size: Optional[int] = None
+    cursor: Optional[str] = None
+    stream: bool = False
 
     @field_validator('user_identifier')
     @classmethod
@@ -108,77 +232,8 @@ class UserSearchRequest(BaseModel):
         return v.strip()
 
 # === LANGUAGE RESOURCES ===
-RATING_LABELS = {
-    "en": {1: "Poor", 2: "Fair", 3: "Good", 4: "Very Good", 5: "Excellent"},
-    "mr": {1: "खराब", 2: "सामान्य", 3: "चांगले", 4: "खूप चांगले", 5: "उत्कृष्ट"}
-}
-
-MAHA_JAL_KNOWLEDGE_BASE = {
-    "en": {
-        "welcome_message": "Welcome to Public Grievance Redressal System portal AI-ChatBot.",
-        "initial_question": "Would you like to register a Grievance on the Maha-Jal Samadhan Public Grievance Redressal System?",
-        "check_existing_question": "Has a Grievance already been registered on the Maha-Jal Samadhan Public Grievance Redressal System?",
-        "status_check_question": "Would you like to check the status of the grievance which you have registered on the Maha-Jal Samadhan Public Grievance Redressal System?",
-        "grievance_id_prompt": "Please enter your Grievance ID (For example: \"G-12safeg7678\")",
-        "feedback_question": "Would you like to provide feedback regarding the resolution of your grievance addressed through the Maha-Jal Samadhan Public Grievance Redressal System?",
-        "rating_question": "Please rate your experience with the Maha-Jal Samadhan Public Grievance Redressal System:",
-        "rating_request": "Rate from 1 (Poor) to 5 (Excellent)",
-        "invalid_rating": "The information you have entered is invalid. Please try again.",
-        "rating_thank_you": "Thank you for your feedback. Your rating has been recorded.",
-        "grievance_not_found": "Sorry, no grievance found with the provided ID. Please check your Grievance ID and try again.",
-        "database_error": "Unable to fetch grievance information at the moment. Please try again later.",
-        "invalid_grievance_id": "Please provide a valid Grievance ID in the correct format (For example: \"G-12safeg7678\")",
-        "options": {"yes": "YES", "no": "NO"},
-        "yes_response": {
-            "intro": "You can register your Grievance on the Maha-Jal Samadhan Public Grievance Redressal System through two methods:",
-            "method1": {
-                "title": "1. Registering a Grievance via the Maha-Jal Samadhan Website",
-                "description": "You can register your Grievance by clicking the link below and visiting the official website:",
-                "link": "https://mahajalsamadhan.in/log-grievance"
-            },
-            "method2": {
-                "title": "2. Registering a Grievance via the Maha-Jal Samadhan Mobile App",
-                "description": "You can download the mobile application using the link below and submit your Grievance through the app:",
-                "link": "https://play.google.com/store/apps/details?id=in.mahajalsamadhan.user&pli=1"
-            }
-        },
-        "no_response": "Thank you for using the Maha-Jal Samadhan Public Grievance Redressal System.",
-        "help_text": "Please type 'YES' or 'NO' to proceed with your query.",
-        "track_grievance_help": "You can also track your grievance status at: https://mahajalsamadhan.in/view-grievance"
-    },
-    "mr": {
-        "welcome_message": "नमस्कार, सार्वजनिक तक्रार निवारण प्रणाली पोर्टल एआय-चॅटबॉटमध्ये आपले स्वागत आहे.",
-        "initial_question": "महा-जल समाधान सार्वजनिक तक्रार निवारण प्रणालीमध्ये आपण तक्रार नोंदवू इच्छिता का?",
-        "check_existing_question": "महा-जल समाधान सार्वजनिक तक्रार निवारण प्रणालीमध्ये नोंदविण्यात आलेली तक्रार आहे का?",
-        "status_check_question": "आपण महा-जल समाधान सार्वजनिक तक्रार निवारण प्रणालीमध्ये नोंदवलेल्या तक्रारीची स्थिती तपासू इच्छिता का?",
-        "grievance_id_prompt": "कृपया आपला तक्रार क्रमांक प्रविष्ट करा (उदाहरणार्थ: \"G-12safeg7678\")",
-        "feedback_question": "महा-जल समाधान सार्वजनिक तक्रार निवारण प्रणालीद्वारे सोडविण्यात आलेल्या आपल्या तक्रारीच्या निराकरणाबाबत अभिप्राय द्यायला इच्छिता का?",
-        "rating_question": "कृपया महा-जल समाधान सार्वजनिक तक्रार निवारण प्रणालीच्या अनुभवाला रेटिंग द्या:",
-        "rating_request": "१ (खराब) ते ५ (उत्कृष्ट) पर्यंत रेटिंग द्या",
-        "invalid_rating": "आपण दिलेली माहिती अवैध आहे. कृपया पुन्हा प्रयत्न करा.",
-        "rating_thank_you": "आपल्या अभिप्रायाबद्दल धन्यवाद. आपले रेटिंग नोंदवले गेले आहे.",
-        "grievance_not_found": "माफ करा, दिलेल्या क्रमांकासह कोणतीही तक्रार आढळली नाही. कृपया आपला तक्रार क्रमांक तपासा आणि पुन्हा प्रयत्न करा.",
-        "database_error": "सध्या तक्रार माहिती मिळवता येत नाही. कृपया नंतर प्रयत्न करा.",
-        "invalid_grievance_id": "कृपया योग्य तक्रार क्रमांक प्रदान करा (उदाहरणार्थ: \"G-12safeg7678\")",
-        "options": {"yes": "होय", "no": "नाही"},
-        "yes_response": {
-            "intro": "आपण 'महा-जल समाधान' सार्वजनिक तक्रार निवारण प्रणालीमध्ये आपली तक्रार दोन पद्धतींनी नोंदवू शकता:",
-            "method1": {
-                "title": "१. महा-जल समाधान सार्वजनिक तक्रार निवारण प्रणालीमध्ये वेबसाईटद्वारे तक्रार नोंदणीसाठी आपण खालील लिंकवर क्लिक करून वेबसाईटवर तक्रार नोंदवू शकता:",
-                "description": "लिंक -",
-                "link": "https://mahajalsamadhan.in/log-grievance"
-            },
-            "method2": {
-                "title": "२. महا-जल समाधान सार्वजनिक तक्रार निवारण प्रणालीमध्ये मोबाईल अॅपद्वारे तक्रार नोंदणी",
-                "description": "आपण खालील लिंकद्वारे मोबाइल अॅप डाउनलोड करून तक्रार नोंदवू शकता:",
-                "link": "https://play.google.com/store/apps/details?id=in.mahajalsamadhan.user&pli=1"
-            }
-        },
-        "no_response": "महा-जल समाधान सार्वजनिक तक्रार निवारण प्रणालीचा वापर केल्याबद्दल आपले धन्यवाद.",
-        "help_text": "कृपया 'होय' किंवा 'नाही' टाइप करून आपल्या प्रश्नासह पुढे जा.",
-        "track_grievance_help": "आपण आपल्या तक्रारीची स्थिती येथे देखील तपासू शकता: https://mahajalsamadhan.in/view-grievance"
-    }
-}
+# Knowledge base and rating labels live in knowledge_base.json (see responses.py)
+RESPONSES = create_response_catalog()
 
 def generate_session_id() -> str:
     """Generate a unique session ID (for demonstration; in production, use a secure method)."""
@@ -187,559 +242,285 @@ def generate_session_id() -> str:
     animals = ["lion", "swan", "tiger", "elephant", "zebra", "giraffe", "panda", "koala"]
     return f"{random.choice(adjectives)}_{random.choice(animals)}_{os.urandom(2).hex()}_{int(time.time())}"
 
-def add_to_chat_history(session_id: str, user_msg: str, bot_msg: str, language: str = "en"):
+def add_to_chat_history(session: SessionRecord, user_msg: str, bot_msg: str, language: str = "en"):
     """Add message to chat history with language support."""
     try:
-        if session_id not in CHAT_HISTORY:
-            CHAT_HISTORY[session_id] = []
-        CHAT_HISTORY[session_id].insert(0, {
-            "user": user_msg,
-            "assistant": bot_msg,
-            "language": language,
-            "timestamp": time.strftime("%H:%M:%S"),
-            "session_id": session_id,
-            "created_at": time.time()
-        })
-        CHAT_HISTORY[session_id] = CHAT_HISTORY[session_id][:50]
+        session.history.append(user_msg, bot_msg, language)
     except Exception as e:
         logger.error(f"Failed to add to chat history: {e}")
 
-def save_rating_data(rating: int, session_id: str, language: str, grievance_id: str = None, feedback_text: str = None, phone_number: str = None) -> bool:
-    """Save rating data for CSV export with proper UTF-8 handling."""
+def save_rating_data(rating: int, session_id: str, language: str, grievance_id: str = None, feedback_text: str = None, phone_number: str = None, ip_address: str = None) -> bool:
+    """Record a rating in memory and queue it for the daily CSV file and the ratings table."""
+    now = datetime.now()
+    # Store phone number as-is (Excel may convert to scientific notation)
+    rating_entry = {
+        "timestamp": now.strftime("%Y-%m-%d %H:%M:%S"),
+        "session_id": session_id,
+        "rating": rating,
+        "Feedback": RESPONSES.table.rating_label(language, rating),
+        "language": language,
+        "grievance_id": grievance_id or "N/A",
+        "phone_number": phone_number or "N/A"
+    }
+    RATINGS_DATA.append(now.timestamp(), rating, language, session_id, grievance_id, phone_number)
+    RATING_STATS.add(rating_entry)
+    # The ratings table has no phone column; the identifier the rating is linked to goes in grievance_id
+    queue_rating(rating_record(
+        timestamp=now.replace(microsecond=0),
+        session_id=session_id,
+        rating=rating,
+        rating_label=rating_entry["Feedback"],
+        language=language,
+        grievance_id=grievance_id or phone_number,
+        feedback_text=feedback_text,
+        ip_address=ip_address
+    ))
     try:
-        # Prepare CSV directory
-        ratings_dir = os.path.join(os.path.dirname(__file__), 'ratings_data')
-        try:
-            os.makedirs(ratings_dir, mode=0o755, exist_ok=True)
-        except PermissionError:
-            ratings_dir = os.path.dirname(__file__)
-            logger.warning("Could not create ratings_data directory, using current directory")
-
-        # Prepare CSV file path
-        timestamp_str = datetime.now().strftime("%Y%m%d")
-        csv_filename = f'ratings_log_{timestamp_str}.csv'
-        csv_path = os.path.join(ratings_dir, csv_filename)
-        # If file exists but header is missing new columns, write to a v2 file to avoid mixed headers
-        if os.path.exists(csv_path):
-            try:
-                with open(csv_path, 'r', encoding='utf-8-sig') as rf:
-                    header_line = rf.readline()
-                    if header_line and 'phone_number' not in header_line:
-                        csv_filename = f'ratings_log_{timestamp_str}_v2.csv'
-                        csv_path = os.path.join(ratings_dir, csv_filename)
-            except Exception:
-                pass
-
-        # Prepare rating entry
-        # Store phone number as-is (Excel may convert to scientific notation)
-        phone_text = phone_number if phone_number else None
-
-        rating_entry = {
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "session_id": session_id,
-            "rating": rating,
-            "Feedback": RATING_LABELS[language][rating],
-            "language": language,
-            "grievance_id": grievance_id or "N/A",
-            "phone_number": phone_text or "N/A"
-              # Can be added later
-        }
-
-        # Try to save to CSV
-        file_exists = os.path.exists(csv_path)
-        try:
-            with open(csv_path, mode='a', newline='', encoding='utf-8-sig') as f:
-                writer = csv.DictWriter(f, fieldnames=rating_entry.keys())
-                if not file_exists or os.path.getsize(csv_path) == 0:
-                    writer.writeheader()
-                writer.writerow(rating_entry)
-        except (PermissionError, OSError) as file_error:
-            # Fallback: try system temp dir
-            import tempfile
-            temp_dir = tempfile.gettempdir()
-            alternative_path = os.path.join(temp_dir, f'maha_jal_ratings_{timestamp_str}.csv')
-            alt_file_exists = os.path.exists(alternative_path)
-            with open(alternative_path, mode='a', newline='', encoding='utf-8-sig') as f:
-                writer = csv.DictWriter(f, fieldnames=rating_entry.keys())
-                if not alt_file_exists or os.path.getsize(alternative_path) == 0:
-                    writer.writeheader()
-                writer.writerow(rating_entry)
-            logger.info(f"Rating saved to alternative location: {alternative_path}")
-
-        # Store in memory
-        RATINGS_DATA.append(rating_entry)
-        logger.info(f"Rating saved successfully: {rating}/5 ({RATING_LABELS[language][rating]}) for session {session_id}")
-        return True
+        RATINGS_SINK.submit(rating_entry)
     except Exception as e:
         logger.error(f"Error saving rating data: {e}")
-        # Fallback: store in memory even if file save fails
-        try:
-            rating_entry = {
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "session_id": session_id,
-                "rating": rating,
-                "Feedback": RATING_LABELS[language][rating],
-                "language": language,
-                "grievance_id": grievance_id or "N/A",
-                "phone_number": phone_text or "N/A"
-            }
-            RATINGS_DATA.append(rating_entry)
-            logger.info(f"Rating saved to memory only: {rating}/5 for session {session_id}")
-            return True
-        except Exception as memory_error:
-            logger.error(f"Failed to save rating even to memory: {memory_error}")
-            return False
-
-def detect_greeting(text: str) -> tuple[bool, str]:
-    """Detect greeting intent and return a normalized key."""
-    try:
-        t = text.strip().lower()
-        t = re.sub(r"[!.,🙂🙏✨⭐️]+", "", t)
-        patterns = [
-            (r"\bgood\s*morning\b|\bशुभ\s*सकाळ\b", "good_morning"),
-            (r"\bgood\s*afternoon\b|\bशुभ\s*दुपार\b", "good_afternoon"),
-            (r"\bgood\s*evening\b|\bशुभ\s*संध्याकाळ\b", "good_evening"),
-            (r"\bhello\b|\bhey+\b|\bhii+\b|\bhi\b|\bनमस्ते\b|\bनमस्कार\b|\bहॅलो\b|\bहेलो\b|\bहाय\b", "hello"),
-            (r"\bgood\s*night\b|\bशुभ\s*रात्री\b", "good_night"),
-        ]
-        for regex, key in patterns:
-            if re.search(regex, t):
-                return True, key
-        return False, ""
-    except Exception:
-        return False, ""
-
-def detect_grievance_id(text: str) -> Optional[str]:
-    """Detect potential grievance ID in text."""
-    patterns = [
-        r'\b([GgRr]-[a-zA-Z0-9]+)\b',
-        r'\b([GgRr][0-9a-zA-Z]+)\b',
-        r'\b(MJS-[0-9a-zA-Z]+)\b',
-        r'\b([0-9]{6,})\b'
-    ]
-    for pattern in patterns:
-        match = re.search(pattern, text)
-        if match:
-            return match.group(1)
-    return None
-
-def validate_grievance_id_format(grievance_id: str) -> bool:
-    """Validate if the grievance ID matches expected Maha-Jal Samadhan format."""
-    valid_patterns = [
-        r'^[GgRr]-[a-zA-Z0-9]{6,}$',
-        r'^[GgRr][0-9a-zA-Z]{6,}$',
-        r'^MJS-[0-9a-zA-Z]{6,}$',
-        r'^[0-9]{6,}$'
-    ]
-    for pattern in valid_patterns:
-        if re.match(pattern, grievance_id.strip()):
-            return True
-    return False
-
-def detect_mobile_number(text: str) -> Optional[str]:
-    """Detect Indian mobile number patterns in text."""
-    # Remove all non-digit characters except + and spaces
-    clean_text = re.sub(r'[^\d+\s]', '', text)
-    
-    # Indian mobile number patterns
-    patterns = [
-        r'\b(\+91[\s-]?)?([6-9]\d{9})\b',  # +91 followed by 10-digit number starting with 6-9
-        r'\b([6-9]\d{9})\b',                # 10-digit number starting with 6-9
-        r'\b(0\d{10})\b'                    # 11-digit number starting with 0
-    ]
-    
-    for pattern in patterns:
-        matches = re.finditer(pattern, clean_text)
-        for match in matches:
-            # Extract the mobile number (without country code for consistency)
-            if match.group(1) and match.group(2):  # +91 pattern
-                mobile = match.group(2)
-            elif match.group(1):  # 10-digit pattern
-                mobile = match.group(1)
-            else:  # 11-digit pattern
-                mobile = match.group(0)[1:]  # Remove leading 0
-            
-            # Validate it's exactly 10 digits starting with 6-9
-            if len(mobile) == 10 and mobile[0] in '6789':
-                return mobile
-    
-    return None
-
-def validate_mobile_number_format(mobile_number: str) -> bool:
-    """Validate if the mobile number matches Indian format."""
-    # Remove all non-digit characters
-    digits_only = re.sub(r'\D', '', mobile_number)
-    
-    # Should be exactly 10 digits starting with 6, 7, 8, or 9
-    if len(digits_only) == 10 and digits_only[0] in '6789':
+        logger.info(f"Rating saved to memory only: {rating}/5 for session {session_id}")
         return True
-    
-    # Handle +91 prefix case
-    if len(digits_only) == 12 and digits_only.startswith('91') and digits_only[2] in '6789':
-        return True
-    
-    # Handle 0 prefix case (11 digits)
-    if len(digits_only) == 11 and digits_only.startswith('0') and digits_only[1] in '6789':
-        return True
-        
-    return False
-
-def detect_grievance_id_or_mobile(text: str) -> tuple[Optional[str], str]:
-    """
-    Detect either grievance ID or mobile number and return the type
-    Returns: (identifier, type) where type is 'grievance_id', 'mobile_number', or None
-    """
-    # First try to detect grievance ID
-    grievance_id = detect_grievance_id(text)
-    if grievance_id and validate_grievance_id_format(grievance_id):
-        return grievance_id, 'grievance_id'
-    
-    # Then try to detect mobile number
-    mobile_number = detect_mobile_number(text)
-    if mobile_number and validate_mobile_number_format(mobile_number):
-        return mobile_number, 'mobile_number'
-    
-    return None, None
-
-def detect_exact_status_question(text: str, language: str) -> bool:
-    """Detect the exact status check question."""
-    text_lower = text.lower().strip()
-    if language == "en":
-        return "would you like to check the status of your grievance" in text_lower
-    else:
-        status_patterns = [
-            "आपण महा-जल समाधान सार्वजनिक तक्रार निवारण प्रणालीमध्ये नोंदवलेल्या तक्रारीची स्थिती तपासू इच्छिता का",
-            "तक्रारीची स्थिती तपासू इच्छिता का",
-            "स्थिती तपासू इच्छिता का",
-            "तक्रारीची स्थिती"
-        ]
-        return any(pattern in text for pattern in status_patterns)
+    logger.info(f"Rating saved successfully: {rating}/5 ({rating_entry['Feedback']}) for session {session_id}")
+    return True
 
 def greeting_reply(language: str, key: str) -> str:
     """Return a specific greeting reply per detected key and language."""
-    KB = MAHA_JAL_KNOWLEDGE_BASE[language]
-    replies = {
-        "en": {
-            "good_morning": f"Good Morning! {KB['welcome_message']}",
-            "good_afternoon": f"Good Afternoon! {KB['welcome_message']}",
-            "good_evening": f"Good Evening! {KB['welcome_message']}",
-            "good_night": f"Good Night! {KB['welcome_message']}",
-            "hello": f"Hello! {KB['welcome_message']}",
-        },
-        "mr": {
-            "good_morning": f"शुभ सकाळ! {KB['welcome_message']}",
-            "good_afternoon": f"शुभ दुपार! {KB['welcome_message']}",
-            "good_evening": f"शुभ संध्याकाळ! {KB['welcome_message']}",
-            "good_night": f"शुभ रात्री! {KB['welcome_message']}",
-            "hello": KB["welcome_message"],
-        }
-    }
-    return replies.get(language, {}).get(key, replies["en"]["hello"])
-
-def detect_yes_no_response(text: str, language: str) -> str:
-    """Detect yes/no responses in both languages."""
-    text = text.strip().lower()
-    yes_patterns_en = [r'\byes\b', r'\by\b', r'\byeah\b', r'\byep\b']
-    no_patterns_en = [r'\bno\b', r'\bn\b', r'\bnope\b']
-    yes_patterns_mr = [r'\bहोय\b', r'\bहो\b']
-    no_patterns_mr = [r'\bनाही\b', r'\bना\b']
-    for pattern in yes_patterns_en + yes_patterns_mr:
-        if re.search(pattern, text):
-            return "yes"
-    for pattern in no_patterns_en + no_patterns_mr:
-        if re.search(pattern, text):
-            return "no"
-    return "unknown"
-
-def format_simple_grievance_status(grievance_data: dict, language: str) -> str:
-    """Format grievance status data into a readable message."""
-    if not grievance_data:
-        return "Grievance not found" if language == "en" else "तक्रार आढळली नाही"
+    return RESPONSES.table.greeting(language, key)
 
-    submitted_date = (
-        grievance_data["grievance_logged_date"].strftime("%d-%b-%Y")
-        if grievance_data.get("grievance_logged_date")
-        else "Not available"
-    )
-    resolved_date = (
-        grievance_data["resolved_date"].strftime("%d-%b-%Y")
-        if grievance_data.get("resolved_date")
-        else None
-    )
+def database_error_reply(language: str) -> str:
+    """Localized 'try again later' reply for lookups that failed fast."""
+    return RESPONSES.table.text(language if language in SUPPORTED_LANGUAGES else "en", "database_error")
 
-    if language == "en":
-        status_message = f"""The current status of your Grievance is as follows:
-Grievance ID: {grievance_data['grievance_unique_number']}
-Status: {grievance_data['grievance_status']}
-Submitted: {submitted_date}
-Category: {grievance_data.get('sub_grievance_name')}"""
-        if grievance_data.get('district_name'):
-            status_message += f"\nDistrict: {grievance_data['district_name']}"
-        if grievance_data.get('block_name'):
-            status_message += f"\nBlock: {grievance_data['block_name']}"
-        if grievance_data.get('grampanchayat_name'):
-            status_message += f"\nGram Panchayat: {grievance_data['grampanchayat_name']}"
-        if resolved_date:
-            status_message += f"\nResolved on: {resolved_date}"
-        if grievance_data.get('resolved_user_name'):
-            status_message += f"\nResolved by: {grievance_data['resolved_user_name']}"
+def status_not_found_message(identifier: str, identifier_type: str, language: str) -> str:
+    """Localized 'no grievance found' message for a status lookup."""
+    if identifier_type == "mobile_number":
+        error_msg = {
+            'en': f"Sorry, no grievance found for mobile number {identifier}. Please check your registered mobile number and try again.",
+            'mr': f"माफ करा, {identifier} या मोबाइल नंबरसाठी कोणतीही तक्रार आढळली नाही. कृपया आपला नोंदणीकृत मोबाइल नंबर तपासा आणि पुन्हा प्रयत्न करा."
+        }
     else:
-        status_message = f"""आपल्या तक्रारीची सद्यस्थिती खालीलप्रमाणे आहे:
-तक्रार क्रमांक: {grievance_data['grievance_unique_number']}
-स्थिती: {grievance_data['grievance_status']}
-दाखल दिनांक: {submitted_date}
-श्रेणी: {grievance_data.get('sub_grievance_name', 'निर्दिष्ट नाही')}"""
-        if grievance_data.get('district_name'):
-            status_message += f"\nजिल्हा: {grievance_data['district_name']}"
-        if grievance_data.get('block_name'):
-            status_message += f"\nतालुका: {grievance_data['block_name']}"
-        if grievance_data.get('grampanchayat_name'):
-            status_message += f"\nग्रामपंचायत: {grievance_data['grampanchayat_name']}"
-        if resolved_date:
-            status_message += f"\nनिराकरण दिनांक: {resolved_date}"
-        if grievance_data.get('resolved_user_name'):
-            status_message += f"\nनिराकरण करणारे: {grievance_data['resolved_user_name']}"
-
-    return status_message
+        error_msg = {
+            'en': "Sorry, no grievance found with the provided ID. Please check your Grievance ID and try again.",
+            'mr': "माफ करा, दिलेल्या क्रमांकासह कोणतीही तक्रार आढळली नाही. कृपया आपला तक्रार क्रमांक तपासा आणि पुन्हा प्रयत्न करा."
+        }
+    return error_msg.get(language, error_msg['en'])
+
+def format_simple_grievance_status(grievance: GrievanceStatus, language: str) -> str:
+    """Format grievance status data into a readable message."""
+    return RESPONSES.table.grievance_status(grievance, language)
 
 def get_initial_response_with_status_option(language: str) -> str:
     """Get enhanced initial response with status check option."""
-    kb = MAHA_JAL_KNOWLEDGE_BASE[language]
-    if language == "mr":
-        return f"""{kb['welcome_message']}
-प्रश्न क्र. १: {kb['initial_question']}
-उत्तर १ - "{kb['options']['yes']}"
-उत्तर २ - "{kb['options']['no']}"
-प्रश्न क्र. २: {kb['status_check_question']}
-उत्तर - "स्थिती तपासा" किंवा आपला तक्रार क्रमांक टाइप करा
-उदाहरण: G-12safeg7678"""
-    else:
-        return f"""{kb['welcome_message']}
-Question 1: {kb['initial_question']}
-Answer 1: "{kb['options']['yes']}"
-Answer 2: "{kb['options']['no']}"
-Question 2: {kb['status_check_question']}
-Answer: Type "Check Status" or enter your Grievance ID
-Example: G-12safeg7678"""
+    return RESPONSES.table.reply(language, "initial_options")
 
 def get_feedback_question(language: str) -> str:
     """Get the feedback question."""
-    kb = MAHA_JAL_KNOWLEDGE_BASE[language]
-    if language == "mr":
-        return f"""प्रश्न क्र. २.२: {kb['feedback_question']}
-उत्तर १ - "{kb['options']['yes']}"
-उत्तर २ - "{kb['options']['no']}\""""
-    else:
-        return f"""Question 2.2: {kb['feedback_question']}
-Answer 1: "{kb['options']['yes']}"
-Answer 2: "{kb['options']['no']}\""""
+    return RESPONSES.table.reply(language, "feedback_question")
 
 def get_rating_request(language: str) -> str:
     """Get the rating request message."""
-    kb = MAHA_JAL_KNOWLEDGE_BASE[language]
-    if language == "mr":
-        return f"""{kb['rating_question']}
-{kb['rating_request']}
-१ - {RATING_LABELS['mr'][1]}
-२ - {RATING_LABELS['mr'][2]}
-३ - {RATING_LABELS['mr'][3]}
-४ - {RATING_LABELS['mr'][4]}
-५ - {RATING_LABELS['mr'][5]}"""
-    else:
-        return f"""{kb['rating_question']}
-{kb['rating_request']}
-1 - {RATING_LABELS['en'][1]}
-2 - {RATING_LABELS['en'][2]}
-3 - {RATING_LABELS['en'][3]}
-4 - {RATING_LABELS['en'][4]}
-5 - {RATING_LABELS['en'][5]}"""
-
-async def process_maha_jal_query(input_text: str, session_id: str, language: str) -> str:
-    """Process user queries for the Maha-Jal system."""
-    logger.info(f"Processing query: {input_text} for session: {session_id} in language: {language}")
+    return RESPONSES.table.reply(language, "rating_request")
+
+# === CONVERSATION STATE MACHINE ===
+ANY = "*"
+CONVERSATION_TIMINGS: Dict[str, Dict[str, float]] = {}
+CONVERSATION_TURNS = METRICS.counter(
+    "chatbot_conversation_turns_total", "Conversation turns by stage, intent event and resulting stage",
+    ("stage", "event", "next_stage")
+)
+CONVERSATION_TURN_SECONDS = METRICS.histogram(
+    "chatbot_conversation_turn_duration_seconds", "Time spent in a conversation handler", ("handler",)
+)
+
+class ConversationTurn:
+    """One user message together with the session it advances."""
+
+    __slots__ = ("text", "session", "language", "intent", "responses")
+
+    def __init__(self, text: str, session: SessionRecord, language: str, intent: Intent):
+        self.text = text
+        self.session = session
+        self.language = language
+        self.intent = intent
+        # Pinned for the whole turn so a knowledge base reload can't mix versions
+        self.responses = RESPONSES.table
+
+    def reply(self, key: str) -> str:
+        return self.responses.reply(self.language, key)
+
+    def text_for(self, key: str) -> str:
+        return self.responses.text(self.language, key)
+
+def turn_event(intent: Intent) -> str:
+    """Reduce a classified message to the event used for the transition lookup."""
+    if intent.identifier:
+        return "identifier"
+    if intent.status_question:
+        return "status_question"
+    if intent.feedback:
+        return "feedback"
+    return intent.yes_no
+
+def turn_stage(session: SessionRecord, intent: Intent) -> str:
+    """Stage used for the transition lookup; grievance keywords restart the main flow."""
+    if intent.mentions_grievance and session.stage not in ("waiting_for_grievance_id", "feedback_question"):
+        return "initial"
+    return session.stage
+
+async def show_grievance_status(turn: ConversationTurn) -> str:
+    """Look up the grievance ID or mobile number in the message (the only DB call of a turn)."""
+    identifier, identifier_type = turn.intent.identifier, turn.intent.identifier_type
+    logger.debug(f"Detected {identifier_type}: {identifier}")
+    try:
+        grievance = await get_grievance_status(identifier)
+    except Exception as e:
+        logger.error(f"Error fetching grievance status: {e}")
+        return turn.text_for("database_error")
+
+    if not grievance:
+        if identifier_type == 'mobile_number':
+            return turn.responses.mobile_not_found(turn.language, identifier)
+        return turn.text_for("grievance_not_found")
+
+    logger.debug(f"Found grievance {grievance.grievance_unique_number} by {identifier_type}")
+    turn.session.stage = "status_shown"
+    # Track how status was checked for rating attribution
+    turn.session.remember_identifier(identifier_type, identifier)
+    status_response = turn.responses.grievance_status(grievance, turn.language)
+    if identifier_type == 'mobile_number':
+        status_response += turn.responses.found_by_mobile(turn.language, identifier)
+    return status_response + turn.reply("track_grievance_note")
+
+async def ask_for_identifier(turn: ConversationTurn) -> str:
+    turn.session.stage = "waiting_for_grievance_id"
+    return turn.reply("identifier_prompt")
+
+async def reprompt_identifier(turn: ConversationTurn) -> str:
+    return turn.reply("identifier_reprompt")
+
+async def ask_feedback(turn: ConversationTurn) -> str:
+    turn.session.stage = "feedback_question"
+    return turn.reply("feedback_question")
+
+async def request_rating(turn: ConversationTurn) -> str:
+    turn.session.stage = "rating_request"
+    return turn.reply("rating_request")
+
+async def close_conversation(turn: ConversationTurn) -> str:
+    turn.session.stage = "completed"
+    return turn.text_for("no_response")
+
+async def feedback_help(turn: ConversationTurn) -> str:
+    return turn.text_for("help_text")
+
+async def registration_info(turn: ConversationTurn) -> str:
+    turn.session.stage = "registration_info"
+    return turn.reply("registration_info")
+
+async def offer_options(turn: ConversationTurn) -> str:
+    turn.session.stage = "awaiting_response"
+    return turn.reply("initial_options")
+
+async def offer_help(turn: ConversationTurn) -> str:
+    return turn.reply("initial_options")
+
+# Looked up as (stage, event), then (ANY, event), then (stage, ANY); anything else gets offer_help
+CONVERSATION_TRANSITIONS: Dict[tuple, Callable[[ConversationTurn], Awaitable[str]]] = {
+    # Status check flow
+    (ANY, "identifier"): show_grievance_status,
+    (ANY, "status_question"): ask_for_identifier,
+    ("waiting_for_grievance_id", "feedback"): reprompt_identifier,
+    ("waiting_for_grievance_id", ANY): reprompt_identifier,
+    # Feedback flow
+    (ANY, "feedback"): ask_feedback,
+    ("feedback_question", "yes"): request_rating,
+    ("feedback_question", "no"): close_conversation,
+    ("feedback_question", ANY): feedback_help,
+    # Main flow
+    ("initial", "yes"): registration_info,
+    ("initial", "no"): ask_feedback,
+    ("initial", ANY): offer_options,
+}
 
-    # Try to detect either grievance ID or mobile number
-    identifier, identifier_type = detect_grievance_id_or_mobile(input_text)
-    
-    if identifier and identifier_type:
-        logger.info(f"Detected {identifier_type}: {identifier}")
+def resolve_transition(stage: str, event: str) -> Callable[[ConversationTurn], Awaitable[str]]:
+    transitions = CONVERSATION_TRANSITIONS
+    return (
+        transitions.get((stage, event))
+        or transitions.get((ANY, event))
+        or transitions.get((stage, ANY))
+        or offer_help
+    )
+
+def record_turn_timing(handler_name: str, elapsed_ms: float):
+    timing = CONVERSATION_TIMINGS.get(handler_name)
+    if timing is None:
+        timing = CONVERSATION_TIMINGS[handler_name] = {"count": 0, "total_ms": 0.0, "max_ms": 0.0}
+    timing["count"] += 1
+    timing["total_ms"] += elapsed_ms
+    timing["max_ms"] = max(timing["max_ms"], elapsed_ms)
+
+def get_conversation_timings() -> Dict[str, Dict[str, float]]:
+    return {
+        name: {
+            "count": timing["count"],
+            "avg_ms": round(timing["total_ms"] / timing["count"], 3),
+            "max_ms": round(timing["max_ms"], 3),
+        }
+        for name, timing in CONVERSATION_TIMINGS.items()
+    }
+
+async def process_maha_jal_query(
+    input_text: str,
+    session_state: SessionRecord,
+    language: str,
+    intent: Optional[Intent] = None
+) -> str:
+    """Process user queries for the Maha-Jal system."""
+    log_payload("/query/", "Processing query", input_text=input_text,
+                session_id=session_state.session_id, language=language)
+    if intent is None:
+        intent = classify_intent(input_text, language)
+
+    stage = turn_stage(session_state, intent)
+    event = turn_event(intent)
+    handler = resolve_transition(stage, event)
+    started = time.perf_counter()
+    try:
+        return await handler(ConversationTurn(input_text, session_state, language, intent))
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        record_turn_timing(handler.__name__, elapsed_ms)
+        CONVERSATION_TURNS.inc(stage, event, session_state.stage)
+        CONVERSATION_TURN_SECONDS.observe(elapsed_ms / 1000, handler.__name__)
+        logger.debug(f"Turn {stage}/{event} -> {handler.__name__} ({elapsed_ms:.2f} ms)")
+
+async def publish_metrics():
+    """Write this worker's metrics snapshot for the other workers' /metrics scrapes."""
+    while True:
         try:
-            grievance_data = await db_manager.get_grievance_status(identifier)
-            if grievance_data:
-                logger.info(f"Found grievance data for {identifier_type}: {grievance_data}")
-                # Track how status was checked for rating attribution
-                USER_SESSION_STATE.setdefault(session_id, {})
-                USER_SESSION_STATE[session_id]["last_identifier_type"] = identifier_type
-                USER_SESSION_STATE[session_id]["last_identifier_value"] = identifier
-                USER_SESSION_STATE[session_id]["last_identifier_at"] = time.time()
-                status_response = format_simple_grievance_status(grievance_data, language)
-                
-                # Add appropriate tracking message based on identifier type
-                if identifier_type == 'mobile_number':
-                    if language == "mr":
-                        status_response += f"\n\n📱 मोबाइल नंबरद्वारे शोधले गेले: {identifier}"
-                    else:
-                        status_response += f"\n\n📱 Found using mobile number: {identifier}"
-                
-                status_response += f"\n\n🔗 {MAHA_JAL_KNOWLEDGE_BASE[language]['track_grievance_help']}"
-                return status_response
-            else:
-                if identifier_type == 'mobile_number':
-                    if language == "mr":
-                        return f"माफ करा, {identifier} या मोबाइल नंबरसाठी कोणतीही तक्रार आढळली नाही. कृपया आपला तक्रार क्रमांक किंवा नोंदणीकृत मोबाइल नंबर तपासा."
-                    else:
-                        return f"Sorry, no grievance found for mobile number {identifier}. Please check your grievance ID or registered mobile number."
-                else:
-                    return MAHA_JAL_KNOWLEDGE_BASE[language]["grievance_not_found"]
-        except Exception as e:
-            logger.error(f"Error fetching grievance status: {e}")
-            return MAHA_JAL_KNOWLEDGE_BASE[language]["database_error"]
-
-    # Initialize user session state if not present
-    if session_id not in USER_SESSION_STATE:
-        USER_SESSION_STATE[session_id] = {"stage": "initial", "language": language}
-    session_state = USER_SESSION_STATE[session_id]
-
-    response_type = detect_yes_no_response(input_text, language)
-
-    # **Step 1: Status Check Flow**
-    if detect_exact_status_question(input_text, language):
-        identifier, identifier_type = detect_grievance_id_or_mobile(input_text)
-        
-        if identifier and (validate_grievance_id_format(identifier) or validate_mobile_number_format(identifier)):
-            try:
-                grievance_data = await get_grievance_status(identifier)
-                if grievance_data:
-                    session_state["stage"] = "status_shown"
-                    # Track how status was checked for rating attribution
-                    USER_SESSION_STATE.setdefault(session_id, {})
-                    USER_SESSION_STATE[session_id]["last_identifier_type"] = identifier_type
-                    USER_SESSION_STATE[session_id]["last_identifier_value"] = identifier
-                    USER_SESSION_STATE[session_id]["last_identifier_at"] = time.time()
-                    status_response = format_simple_grievance_status(grievance_data, language)
-                    
-                    # Add identifier type info
-                    if identifier_type == 'mobile_number':
-                        if language == "mr":
-                            status_response += f"\n\n📱 मोबाइल नंबरद्वारे शोधले गेले: {identifier}"
-                        else:
-                            status_response += f"\n\n📱 Found using mobile number: {identifier}"
-                    
-                    status_response += f"\n\n🔗 {MAHA_JAL_KNOWLEDGE_BASE[language]['track_grievance_help']}"
-                    return status_response
-                else:
-                    if identifier_type == 'mobile_number':
-                        if language == "mr":
-                            return f"माफ करा, {identifier} या मोबाइल नंबरसाठी कोणतीही तक्रार आढळली नाही."
-                        else:
-                            return f"Sorry, no grievance found for mobile number {identifier}."
-                    else:
-                        return MAHA_JAL_KNOWLEDGE_BASE[language]["grievance_not_found"]
-            except Exception as e:
-                logger.error(f"Error fetching grievance status: {e}")
-                return MAHA_JAL_KNOWLEDGE_BASE[language]["database_error"]
+            METRICS.write_snapshot()
+        except OSError as e:
+            logger.warning(f"Could not write metrics snapshot: {e}")
+        await asyncio.sleep(METRICS_FLUSH_SECONDS)
+
+async def rebuild_rating_stats():
+    """Recompute the rating aggregates from stored ratings."""
+    try:
+        if RATINGS_STATS_SOURCE == "db" and SYSTEM_STATUS["database_connected"]:
+            entries = await load_stored_ratings()
         else:
-            session_state["stage"] = "waiting_for_grievance_id"
-            if language == "mr":
-                return f"""{MAHA_JAL_KNOWLEDGE_BASE[language]["grievance_id_prompt"]}
-किंवा आपला नोंदणीकृत मोबाइल नंबर प्रविष्ट करा (उदाहरणार्थ: 9876543210)"""
-            else:
-                return f"""{MAHA_JAL_KNOWLEDGE_BASE[language]["grievance_id_prompt"]}
-Or enter your registered mobile number (Example: 9876543210)"""
-
-    # **Step 2: If waiting for ID or mobile, try again**
-    if session_state.get("stage") == "waiting_for_grievance_id":
-        identifier, identifier_type = detect_grievance_id_or_mobile(input_text)
-        
-        if identifier and (validate_grievance_id_format(identifier) or validate_mobile_number_format(identifier)):
+            entries = await asyncio.to_thread(read_rating_csv_files, RATINGS_SINK.directory)
+        total = RATING_STATS.rebuild(entries)
+        RATINGS_DATA.clear()
+        for entry in entries:
             try:
-                grievance_data = await get_grievance_status(identifier)
-                if grievance_data:
-                    session_state["stage"] = "status_shown"
-                    # Track how status was checked for rating attribution
-                    USER_SESSION_STATE.setdefault(session_id, {})
-                    USER_SESSION_STATE[session_id]["last_identifier_type"] = identifier_type
-                    USER_SESSION_STATE[session_id]["last_identifier_value"] = identifier
-                    USER_SESSION_STATE[session_id]["last_identifier_at"] = time.time()
-                    status_response = format_simple_grievance_status(grievance_data, language)
-                    
-                    # Add identifier type info
-                    if identifier_type == 'mobile_number':
-                        if language == "mr":
-                            status_response += f"\n\n📱 मोबाइल नंबरद्वारे शोधले गेले: {identifier}"
-                        else:
-                            status_response += f"\n\n📱 Found using mobile number: {identifier}"
-                    
-                    status_response += f"\n\n🔗 {MAHA_JAL_KNOWLEDGE_BASE[language]['track_grievance_help']}"
-                    return status_response
-                else:
-                    if identifier_type == 'mobile_number':
-                        if language == "mr":
-                            return f"माफ करा, {identifier} या मोबाइल नंबरसाठी कोणतीही तक्रार आढळली नाही."
-                        else:
-                            return f"Sorry, no grievance found for mobile number {identifier}."
-                    else:
-                        return MAHA_JAL_KNOWLEDGE_BASE[language]["grievance_not_found"]
-            except Exception as e:
-                logger.error(f"Error fetching grievance status: {e}")
-                return MAHA_JAL_KNOWLEDGE_BASE[language]["database_error"]
-        else:
-            if language == "mr":
-                return "कृपया योग्य तक्रार क्रमांक किंवा 10-अंकी मोबाइल नंबर प्रदान करा."
-            else:
-                return "Please provide a valid Grievance ID or 10-digit mobile number."
-
-    # **Rest of the function remains the same...**
-    # **Step 3: Feedback Question Flow**
-    if "feedback" in input_text.lower() or "अभिप्राय" in input_text.lower():
-        session_state["stage"] = "feedback_question"
-        return get_feedback_question(language)
-
-    if session_state.get("stage") == "feedback_question":
-        if response_type == "yes":
-            session_state["stage"] = "rating_request"
-            return get_rating_request(language)
-        elif response_type == "no":
-            session_state["stage"] = "completed"
-            return MAHA_JAL_KNOWLEDGE_BASE[language]["no_response"]
-        else:
-            return MAHA_JAL_KNOWLEDGE_BASE[language]["help_text"]
-
-    # **Step 4: Main Conversation Flow**
-    if (
-        session_state["stage"] == "initial"
-        or any(
-            kw in input_text.lower()
-            for kw in ["register", "grievance", "complaint", "तक्रार", "नोंदवू", "शिकायत"]
-        )
-    ):
-        if response_type == "yes":
-            session_state["stage"] = "registration_info"
-            kb = MAHA_JAL_KNOWLEDGE_BASE[language]
-            return (
-                kb["yes_response"]["intro"]
-                + f"\n\n"
-                + kb["yes_response"]["method1"]["title"]
-                + f"\n"
-                + kb["yes_response"]["method1"]["description"]
-                + f"\n"
-                + kb["yes_response"]["method1"]["link"]
-                + f"\n\n"
-                + kb["yes_response"]["method2"]["title"]
-                + f"\n"
-                + kb["yes_response"]["method2"]["description"]
-                + f"\n"
-                + kb["yes_response"]["method2"]["link"]
-            )
-        elif response_type == "no":
-            session_state["stage"] = "feedback_question"
-            return get_feedback_question(language)
-        else:
-            session_state["stage"] = "awaiting_response"
-            return get_initial_response_with_status_option(language)
-
-    # **Default: Offer Help**
-    return get_initial_response_with_status_option(language)
+                RATINGS_DATA.append_entry(entry)
+            except (KeyError, TypeError, ValueError):
+                continue
+        logger.info(f"Rating statistics rebuilt from {len(entries)} stored ratings ({total} valid)")
+    except Exception as e:
+        logger.error(f"Could not rebuild rating statistics: {e}")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -751,6 +532,11 @@ async def lifespan(app: FastAPI):
     print("💡 Mode: Q&A with PostgreSQL Database Integration")
     print("⭐ Features: SIMPLE Status, 5-star rating system")
     print("=" * 70)
+    if RATE_LIMITER.enabled and not TRUSTED_PROXIES:
+        logger.warning(
+            "Rate limiting is on but TRUSTED_PROXIES is empty: all clients behind a proxy or the "
+            "PHP frontend share one IP budget. Set TRUSTED_PROXIES to the proxy addresses"
+        )
     try:
         await init_database()
         connection_test = await test_db_connection()
@@ -762,11 +548,21 @@ async def lifespan(app: FastAPI):
                 print(f"📊 Database: {db_info.get('database_name', 'N/A')}")
                 print(f"👤 User: {db_info.get('user', 'N/A')}")
                 print(f"🔢 Pool size: {db_info.get('pool_current_size', '?')}")
+            start_statistics_refresher()
+            if CHECK_INDEXES_ON_STARTUP:
+                flagged = await check_db_indexes()
+                print(f"🔎 Index check: {len(flagged)} queries without an index" if flagged else "🔎 Index check: OK")
         else:
             print("❌ Database connection: FAILED")
     except Exception as e:
         print(f"❌ Database initialization error: {e}")
         SYSTEM_STATUS["database_connected"] = False
+    await start_ratings_writer()
+    await rebuild_rating_stats()
+    await SESSIONS.start()
+    RESPONSES.start_watcher()
+    RATINGS_SINK.start()
+    metrics_publisher = asyncio.create_task(publish_metrics()) if METRICS.multiprocess_dir else None
     print("=" * 70)
     print("🎯 Backend ready! Access the API at:")
     print(" • Docs: http://localhost:8000/docs")
@@ -775,6 +571,14 @@ async def lifespan(app: FastAPI):
     print("=" * 70)
     yield
     print("🔥 Shutting down...")
+    if metrics_publisher:
+        metrics_publisher.cancel()
+        METRICS.write_snapshot(final=True)
+    await RESPONSES.stop_watcher()
+    await RATINGS_SINK.stop()
+    await SESSIONS.stop()
+    await stop_statistics_refresher()
+    await stop_ratings_writer()
     await close_database()
     print("👋 Goodbye!")
 
@@ -796,6 +600,47 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+@app.middleware("http")
+async def rate_limit_requests(request: Request, call_next):
+    """Reject clients that exceed their token-bucket budget with 429."""
+    path = request.url.path
+    if request.method != "POST" or not RATE_LIMITER.applies_to(path):
+        return await call_next(request)
+    session_id = None
+    language = "en"
+    try:
+        payload = json.loads(await request.body() or b"{}")
+        if isinstance(payload, dict):
+            session_id = payload.get("session_id") or None
+            language = payload.get("language") if payload.get("language") in SUPPORTED_LANGUAGES else "en"
+    except ValueError:
+        pass
+    client_ip = request_client_ip(request)
+    try:
+        retry_after = await RATE_LIMITER.check(path, session_id, client_ip)
+    except Exception as e:
+        # Fail open: a broken limiter store must not take the chatbot down
+        logger.error(f"Rate limiter error: {e}")
+        retry_after = 0
+    if retry_after > 0:
+        retry_seconds = RATE_LIMITER.retry_after_header(retry_after)
+        error_msg = {
+            'en': f"Too many requests. Please wait {retry_seconds} seconds and try again.",
+            'mr': f"खूप जास्त विनंत्या. कृपया {retry_seconds} सेकंद थांबा आणि पुन्हा प्रयत्न करा."
+        }
+        logger.warning(f"Rate limited {path} for session {session_id} from {client_ip}")
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": retry_seconds},
+            content={
+                "success": False,
+                "reply": error_msg[language],
+                "message": error_msg[language],
+                "retry_after": int(retry_seconds)
+            }
+        )
+    return await call_next(request)
+
 @app.middleware("http")
 async def add_cors_header(request: Request, call_next):
     """Additional CORS handling."""
@@ -805,6 +650,20 @@ async def add_cors_header(request: Request, call_next):
     response.headers["Access-Control-Allow-Headers"] = "*"
     return response
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count and time every request by route template (outermost, so 429s are included)."""
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        HTTP_REQUESTS.inc(route, request.method, status)
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route, request.method, status)
+
 @app.options("/{full_path:path}")
 async def preflight_handler(request: Request, full_path: str):
     """Handle preflight OPTIONS requests."""
@@ -817,6 +676,11 @@ async def preflight_handler(request: Request, full_path: str):
         }
     )
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text format; merged across workers when METRICS_MULTIPROC_DIR is set."""
+    return PlainTextResponse(METRICS.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/status")
 async def status():
     try:
@@ -828,7 +692,7 @@ async def status():
             "version": "3.4.0",
             "uptime_seconds": round(uptime, 2),
             "system_status": {
-                "active_sessions": len(CHAT_HISTORY),
+                "active_sessions": await SESSIONS.count(),
                 "total_queries": SYSTEM_STATUS["total_queries"],
                 "total_ratings": len(RATINGS_DATA),
                 "supported_languages": SYSTEM_STATUS["supported_languages"],
@@ -866,13 +730,17 @@ async def process_query(request: QueryRequest):
             content={"reply": f"Language '{language}' not supported. Use: {', '.join(SUPPORTED_LANGUAGES)}"}
         )
     session_id = request.session_id or generate_session_id()
+    session = await SESSIONS.load_or_create(session_id, language)
+
+    # **Intent classification (single pass, reused by the conversation flow)**
+    intent = classify_intent(input_text, language)
 
     # **Greeting detection**
-    is_greet, greet_key = detect_greeting(input_text)
-    if is_greet:
+    if intent.is_greeting:
         SYSTEM_STATUS["successful_queries"] += 1
-        reply_text = greeting_reply(language, greet_key)
-        add_to_chat_history(session_id, input_text, reply_text, language)
+        reply_text = greeting_reply(language, intent.greeting)
+        add_to_chat_history(session, input_text, reply_text, language)
+        await SESSIONS.save(session)
         return {
             "reply": reply_text,
             "language": language,
@@ -882,9 +750,10 @@ async def process_query(request: QueryRequest):
 
     # **Process Maha-Jal specific query**
     try:
-        assistant_reply = await process_maha_jal_query(input_text, session_id, language)
+        assistant_reply = await process_maha_jal_query(input_text, session, language, intent)
         SYSTEM_STATUS["successful_queries"] += 1
-        add_to_chat_history(session_id, input_text, assistant_reply, language)
+        add_to_chat_history(session, input_text, assistant_reply, language)
+        await SESSIONS.save(session)
         return {
             "reply": assistant_reply,
             "language": language,
@@ -906,31 +775,29 @@ async def process_query(request: QueryRequest):
 
 @app.post("/grievance/status/")
 async def get_grievance_status_endpoint(request: GrievanceStatusRequest):
-    logger.info(f"Received grievance status request for ID: {request.grievance_id}, Language: {request.language}")
+    log_payload("/grievance/status/", "Received grievance status request",
+                grievance_id=request.grievance_id, language=request.language)
     try:
         if not db_manager.pool:
             logger.info("Initializing database connection...")
             await db_manager.init_pool()
 
         # Use the updated get_grievance_status method that handles both ID types
-        grievance_data = await db_manager.get_grievance_status(request.grievance_id)
-        logger.info(f"Retrieved grievance data: {grievance_data}")
+        grievance = await get_grievance_status(request.grievance_id)
 
-        if grievance_data:
+        if grievance:
             # Determine what type of identifier was used
             identifier_type = "mobile_number" if validate_mobile_number_format(request.grievance_id) else "grievance_id"
             
-            formatted_status = format_simple_grievance_status(grievance_data, request.language)
-            logger.info(f"Formatted status message: {formatted_status}")
+            formatted_status = format_simple_grievance_status(grievance, request.language)
+            logger.debug(f"Retrieved grievance {grievance.grievance_unique_number} by {identifier_type}")
             
             return JSONResponse(
                 content={
                     "success": True,
                     "found": True,
                     "message": formatted_status,
-                    "grievance_id": grievance_data.get("grievance_unique_number"),
-                    "status": grievance_data.get("grievance_status"),
-                    "submitted_date": grievance_data.get("grievance_logged_date").strftime("%d-%b-%Y") if grievance_data.get("grievance_logged_date") else None,
+                    **grievance.summary(),
                     "language": request.language,
                     "search_method": identifier_type,
                     "search_value": request.grievance_id
@@ -940,28 +807,28 @@ async def get_grievance_status_endpoint(request: GrievanceStatusRequest):
             # Determine error message based on identifier type
             identifier_type = "mobile_number" if validate_mobile_number_format(request.grievance_id) else "grievance_id"
             
-            if identifier_type == "mobile_number":
-                error_msg = {
-                    'en': f"Sorry, no grievance found for mobile number {request.grievance_id}. Please check your registered mobile number and try again.",
-                    'mr': f"माफ करा, {request.grievance_id} या मोबाइल नंबरसाठी कोणतीही तक्रार आढळली नाही. कृपया आपला नोंदणीकृत मोबाइल नंबर तपासा आणि पुन्हा प्रयत्न करा."
-                }
-            else:
-                error_msg = {
-                    'en': "Sorry, no grievance found with the provided ID. Please check your Grievance ID and try again.",
-                    'mr': "माफ करा, दिलेल्या क्रमांकासह कोणतीही तक्रार आढळली नाही. कृपया आपला तक्रार क्रमांक तपासा आणि पुन्हा प्रयत्न करा."
-                }
-            
-            logger.warning(f"No grievance found with {identifier_type}: {request.grievance_id}")
+            logger.info(f"No grievance found with {identifier_type}: {request.grievance_id}")
             return JSONResponse(
                 status_code=404,
                 content={
                     "success": False,
                     "found": False,
-                    "message": error_msg.get(request.language, error_msg['en']),
+                    "message": status_not_found_message(request.grievance_id, identifier_type, request.language),
                     "search_method": identifier_type,
                     "search_value": request.grievance_id
                 }
             )
+    except DatabaseUnavailableError as e:
+        # Breaker open or database too slow: fail fast instead of queuing behind it
+        logger.warning(f"Grievance status lookup failed fast: {e}")
+        return JSONResponse(
+            status_code=503,
+            content={
+                "success": False,
+                "message": database_error_reply(request.language)
+            },
+            headers={"Retry-After": "5"}
+        )
     except Exception as e:
         logger.error(f"Error processing grievance status request: {str(e)}")
         error_msg = {
@@ -977,30 +844,189 @@ async def get_grievance_status_endpoint(request: GrievanceStatusRequest):
             }
         )
 
+@app.post("/grievance/status/batch")
+async def get_grievance_status_batch(request: GrievanceStatusBatchRequest):
+    """
+    Status for up to GRIEVANCE_BATCH_MAX_ITEMS grievance IDs and mobile numbers.
+    Valid identifiers are resolved together (one query per identifier type);
+    results come back in input order with the same messages as /grievance/status/.
+    """
+    language = request.language if request.language in SUPPORTED_LANGUAGES else "en"
+    identifier_types = {}
+    for identifier in request.identifiers:
+        if validate_mobile_number_format(identifier):
+            identifier_types[identifier] = "mobile_number"
+        elif validate_grievance_id_format(identifier):
+            identifier_types[identifier] = "grievance_id"
+    try:
+        grievances = await get_grievance_statuses(list(identifier_types)) if identifier_types else {}
+    except DatabaseUnavailableError as e:
+        logger.warning(f"Batch grievance status lookup failed fast: {e}")
+        return JSONResponse(
+            status_code=503,
+            content={"success": False, "message": database_error_reply(language)},
+            headers={"Retry-After": "5"}
+        )
+    except Exception as e:
+        logger.error(f"Error processing batch grievance status request: {e}")
+        error_msg = {
+            'en': "An error occurred while fetching the grievance status. Please try again later.",
+            'mr': "तक्रार स्थिती मिळवताना त्रुटी आली. कृपया नंतर पुन्हा प्रयत्न करा."
+        }
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "message": error_msg[language], "error": str(e)}
+        )
+
+    invalid_msg = {
+        'en': "Invalid grievance ID or mobile number format.",
+        'mr': "अवैध तक्रार क्रमांक किंवा मोबाइल नंबर स्वरूप."
+    }
+    results = []
+    for identifier in request.identifiers:
+        identifier_type = identifier_types.get(identifier)
+        grievance = grievances.get(identifier)
+        if grievance:
+            item = {
+                "found": True,
+                "message": format_simple_grievance_status(grievance, language),
+                **grievance.summary(),
+            }
+        elif identifier_type:
+            item = {"found": False, "message": status_not_found_message(identifier, identifier_type, language)}
+        else:
+            item = {"found": False, "error": "invalid_identifier", "message": invalid_msg[language]}
+        results.append({"search_value": identifier, "search_method": identifier_type, **item})
+
+    return {
+        "success": True,
+        "language": language,
+        "count": len(results),
+        "found_count": sum(item["found"] for item in results),
+        "results": results
+    }
+
+@app.post("/grievance/cache/invalidate")
+async def invalidate_grievance_cache(request: CacheInvalidationRequest, raw_request: Request):
+    """
+    Drop cached status for one identifier, or the whole cache if none is given.
+    Needs ADMIN_TOKEN. Only the worker serving the call is cleared; the others
+    catch up within STATUS_CACHE_TTL_SECONDS.
+    """
+    rejection = admin_rejection(raw_request)
+    if rejection is not None:
+        return rejection
+    removed = invalidate_grievance_status(request.identifier)
+    logger.info(f"Invalidated {removed} cached grievance status entries in worker {os.getpid()}")
+    return {
+        "success": True,
+        "removed": removed,
+        "scope": "worker",
+        "pid": os.getpid(),
+        "cache": get_status_cache_stats()
+    }
+
+@app.post("/knowledge-base/reload")
+async def reload_knowledge_base(raw_request: Request):
+    """
+    Re-read the knowledge base file and swap in freshly rendered replies.
+    Needs ADMIN_TOKEN. Only the worker serving the call reloads; set
+    KNOWLEDGE_BASE_WATCH_SECONDS so every worker picks up file changes.
+    """
+    rejection = admin_rejection(raw_request)
+    if rejection is not None:
+        return rejection
+    if not RESPONSES.try_reload():
+        return JSONResponse(
+            status_code=500,
+            content={
+                "success": False,
+                "message": "Knowledge base reload failed; the previous version is still in use. See the server log.",
+                "version": RESPONSES.table.version
+            }
+        )
+    return {
+        "success": True,
+        "version": RESPONSES.table.version,
+        "scope": "worker",
+        "pid": os.getpid(),
+        "knowledge_base": RESPONSES.get_stats()
+    }
+
+def ndjson_lines(first: Dict[str, Any], rest) -> Any:
+    """Encode search results as one JSON object per line"""
+    def encode(item):
+        return json.dumps(jsonable_encoder(item), ensure_ascii=False) + "\n"
+
+    async def lines():
+        yield encode(first)
+        async for item in rest:
+            yield encode(item)
+    return lines()
+
 @app.post("/user/search/")
 async def search_user_grievances_endpoint(request: UserSearchRequest):
-    """Search grievances by user identifier (email, phone, name)."""
+    """
+    Search grievances by user identifier (email, phone, name), newest first.
+    Returns one page with a next_cursor, or every match as NDJSON when stream is set.
+    """
+    not_found_msg = {
+        'en': "No grievances found for the provided user information.",
+        'mr': "दिलेल्या वापरकर्ता माहितीसाठी कोणत्याही तक्रारी आढळल्या नाहीत."
+    }
     try:
-        grievances = await search_user_grievances(request.user_identifier)
+        if request.stream:
+            results = stream_user_grievances(request.user_identifier, request.page_size)
+            first = await anext(results, None)
+            if first is None:
+                return JSONResponse(
+                    status_code=404,
+                    content={"found": False, "message": not_found_msg.get(request.language, not_found_msg['en'])}
+                )
+            return StreamingResponse(ndjson_lines(first, results), media_type="application/x-ndjson")
+
+        page = await search_user_grievances(request.user_identifier, request.page_size, request.cursor)
+        grievances = page["grievances"]
         if grievances:
             return {
                 "found": True,
                 "count": len(grievances),
                 "grievances": grievances,
+                "search_type": page["search_type"],
+                "next_cursor": page["next_cursor"],
                 "language": request.language
             }
         else:
-            error_msg = {
-                'en': "No grievances found for the provided user information.",
-                'mr': "दिलेल्या वापरकर्ता माहितीसाठी कोणत्याही तक्रारी आढळल्या नाहीत."
-            }
             return JSONResponse(
                 status_code=404,
                 content={
                     "found": False,
-                    "message": error_msg.get(request.language, error_msg['en'])
+                    "message": not_found_msg.get(request.language, not_found_msg['en'])
                 }
             )
+    except DatabaseUnavailableError as e:
+        logger.warning(f"User search failed fast: {e}")
+        return JSONResponse(
+            status_code=503,
+            content={
+                "found": False,
+                "message": database_error_reply(request.language)
+            },
+            headers={"Retry-After": "5"}
+        )
+    except ValueError as ve:
+        error_msg = {
+            'en': "Invalid search request.",
+            'mr': "अवैध शोध विनंती."
+        }
+        return JSONResponse(
+            status_code=400,
+            content={
+                "found": False,
+                "message": error_msg.get(request.language, error_msg['en']),
+                "errors": str(ve)
+            }
+        )
     except Exception as e:
         logger.error(f"Error searching user grievances: {e}")
         return JSONResponse(
@@ -1056,18 +1082,18 @@ async def get_database_stats():
         )
 
 @app.post("/rating/")
-async def submit_rating(request: RatingRequest):
+async def submit_rating(request: RatingRequest, raw_request: Request):
     """Submit user rating for service quality."""
-    logger.info(f"Received rating request: {request.dict()}")
+    log_payload("/rating/", "Received rating request", **request.model_dump())
     try:
         session_id = request.session_id or generate_session_id()
-        rating_label = RATING_LABELS[request.language][request.rating]
+        rating_label = RESPONSES.table.rating_label(request.language, request.rating)
 
         # Determine identifier used in this session
-        session_state = USER_SESSION_STATE.get(session_id, {})
-        last_type = session_state.get("last_identifier_type")
-        last_value = session_state.get("last_identifier_value")
-        last_at = session_state.get("last_identifier_at")
+        session_state = await SESSIONS.load(session_id)
+        last_type = session_state.last_identifier_type if session_state else None
+        last_value = session_state.last_identifier_value if session_state else None
+        last_at = session_state.last_identifier_at if session_state else None
 
         # Prefer explicit grievance_id from request if valid
         gid = None
@@ -1085,7 +1111,7 @@ async def submit_rating(request: RatingRequest):
 
         # Require that status was shown recently in this session
         IDENTIFIER_TTL_SECONDS = 30 * 60
-        is_recent = bool(last_at and (time.time() - last_at) <= IDENTIFIER_TTL_SECONDS and session_state.get("stage") == "status_shown")
+        is_recent = bool(last_at and (time.time() - last_at) <= IDENTIFIER_TTL_SECONDS and session_state.stage == "status_shown")
         if not request.grievance_id and not is_recent:
             gid = None
             phone = None
@@ -1109,21 +1135,24 @@ async def submit_rating(request: RatingRequest):
             language=request.language,
             grievance_id=gid,
             feedback_text=request.feedback_text,
-            phone_number=phone
+            phone_number=phone,
+            ip_address=request_client_ip(raw_request)
         )
         if success:
-            thank_you_msg = MAHA_JAL_KNOWLEDGE_BASE[request.language]['rating_thank_you']
+            thank_you_msg = RESPONSES.table.text(request.language, 'rating_thank_you')
             response_msg = {
                 'en': f"Thank you for your {request.rating}-star rating! ({rating_label})",
                 'mr': f"आपल्या {request.rating}-स्टार रेटिंगसाठी धन्यवाद! ({rating_label})"
             }
             logger.info(f"Successfully saved rating: {request.rating} stars for session {session_id}")
+            session = session_state or await SESSIONS.load_or_create(session_id, request.language)
             add_to_chat_history(
-                session_id,
+                session,
                 f"Rating: {request.rating}/5",
                 f"{thank_you_msg}\n\n{response_msg.get(request.language, response_msg['en'])}",
                 request.language
             )
+            await SESSIONS.save(session)
             return JSONResponse(
                 status_code=200,
                 content={
@@ -1177,44 +1206,83 @@ async def submit_rating(request: RatingRequest):
             }
         )
 
+def parse_rating_filter(
+    start_date: Optional[str],
+    end_date: Optional[str],
+    language: Optional[str],
+    rating: Optional[int],
+    min_rating: Optional[int],
+    max_rating: Optional[int]
+) -> RatingFilter:
+    """Build a RatingFilter from query parameters; raises ValueError with a client-facing message."""
+    try:
+        start = date.fromisoformat(start_date) if start_date else None
+        end = date.fromisoformat(end_date) if end_date else None
+    except ValueError:
+        raise ValueError("Dates must be in YYYY-MM-DD format")
+    language = language.lower() if language else None
+    if language and language not in SUPPORTED_LANGUAGES:
+        raise ValueError(f"Language '{language}' not supported. Use: {', '.join(SUPPORTED_LANGUAGES)}")
+    return RatingFilter(
+        start_date=start,
+        end_date=end,
+        language=language,
+        min_rating=rating if rating is not None else min_rating,
+        max_rating=rating if rating is not None else max_rating
+    )
+
 @app.get("/ratings/export")
-async def export_ratings():
-    """Export ratings data as CSV with UTF-8 (Excel, Unicode) support."""
+async def export_ratings(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    language: Optional[str] = None,
+    rating: Optional[int] = None,
+    min_rating: Optional[int] = None,
+    max_rating: Optional[int] = None,
+    source: str = "csv",
+    compress: bool = False
+):
+    """Stream ratings as UTF-8 CSV (Excel, Unicode), filtered and optionally gzipped."""
     try:
-        if not RATINGS_DATA:
+        try:
+            filters = parse_rating_filter(start_date, end_date, language, rating, min_rating, max_rating)
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+
+        if source == "db":
+            if not SYSTEM_STATUS["database_connected"]:
+                return JSONResponse(
+                    status_code=503,
+                    content={"error": "Database is not connected; export from csv instead"}
+                )
+            chunks = export_csv_chunks_async(stream_stored_ratings(**filters._asdict()), compress)
+        elif source == "csv":
+            if not rating_csv_paths(RATINGS_SINK.directory, filters):
+                return JSONResponse(
+                    status_code=404,
+                    content={"error": "No ratings data available for export"}
+                )
+            # A sync generator: Starlette iterates it in a worker thread, off the event loop
+            chunks = export_csv_chunks(iter_rating_csv_files(RATINGS_SINK.directory, filters), compress)
+        elif source == "memory":
+            chunks = export_csv_chunks(
+                RATINGS_DATA.iter_entries(filters, RESPONSES.table.rating_label), compress
+            )
+        else:
             return JSONResponse(
-                status_code=404,
-                content={"error": "No ratings data available for export"}
+                status_code=400,
+                content={"error": "source must be 'csv', 'db' or 'memory'"}
             )
-        output = io.StringIO()
-        fieldnames = ["timestamp", "session_id", "rating", "feedback", "language", "grievance_id", "phone_number"]
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader()
-        for rating_data in RATINGS_DATA:
-            modified_row = {
-                "timestamp": rating_data["timestamp"],
-                "session_id": rating_data["session_id"],
-                "rating": rating_data["rating"],
-                "feedback": rating_data["rating_label"],
-                "language": rating_data["language"],
-                "grievance_id": rating_data["grievance_id"],
-                "phone_number": rating_data.get("phone_number", "N/A")
-            
-            }
-            writer.writerow(modified_row)
-        csv_content = output.getvalue()
-        output.close()
-        # Add UTF-8 BOM for Excel/Unicode compatibility
-        utf8_bom = '\ufeff'
-        csv_content_with_bom = utf8_bom + csv_content
+
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"maha_jal_ratings_{timestamp}.csv"
+        filename = f"maha_jal_ratings_{timestamp}.csv" + (".gz" if compress else "")
+        media_type = "application/gzip" if compress else "text/csv; charset=utf-8"
         return StreamingResponse(
-            io.BytesIO(csv_content_with_bom.encode('utf-8')),
-            media_type="text/csv; charset=utf-8",
+            chunks,
+            media_type=media_type,
             headers={
                 "Content-Disposition": f"attachment; filename={filename}",
-                "Content-Type": "text/csv; charset=utf-8"
+                "Content-Type": media_type
             }
         )
     except Exception as e:
@@ -1225,33 +1293,24 @@ async def export_ratings():
         )
 
 @app.get("/ratings/stats")
-async def get_rating_stats():
-    """Get rating statistics."""
+async def get_rating_stats(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    language: Optional[str] = None,
+    rating: Optional[int] = None,
+    min_rating: Optional[int] = None,
+    max_rating: Optional[int] = None
+):
+    """Get rating statistics, optionally for a filtered subset."""
     try:
-        if not RATINGS_DATA:
-            return {
-                "total_ratings": 0,
-                "average_rating": 0,
-                "rating_distribution": {},
-                "language_distribution": {}
-            }
-        total_ratings = len(RATINGS_DATA)
-        ratings = [entry["rating"] for entry in RATINGS_DATA]
-        average_rating = sum(ratings) / total_ratings if ratings else 0
-        rating_distribution = {}
-        for i in range(1, 6):
-            rating_distribution[str(i)] = ratings.count(i)
-        languages = [entry["language"] for entry in RATINGS_DATA]
-        language_distribution = {}
-        for lang in set(languages):
-            language_distribution[lang] = languages.count(lang)
-        return {
-            "total_ratings": total_ratings,
-            "average_rating": round(average_rating, 2),
-            "rating_distribution": rating_distribution,
-            "language_distribution": language_distribution,
-            "latest_ratings": RATINGS_DATA[-10:] if len(RATINGS_DATA) >= 10 else RATINGS_DATA
-        }
+        try:
+            filters = parse_rating_filter(start_date, end_date, language, rating, min_rating, max_rating)
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+        if filters == RatingFilter():
+            # Unfiltered totals are kept up to date incrementally
+            return RATING_STATS.snapshot()
+        return RATINGS_DATA.aggregate(filters, label_for=RESPONSES.table.rating_label)
     except Exception as e:
         logger.error(f"Rating stats error: {e}")
         return JSONResponse(
@@ -1266,19 +1325,28 @@ async def health_check():
         uptime = time.time() - SYSTEM_STATUS["startup_time"]
         db_status = await test_db_connection() if SYSTEM_STATUS["database_connected"] else False
         SYSTEM_STATUS["database_connected"] = db_status
+        routing = get_db_routing_stats()
         return {
-            "status": "healthy" if db_status else "degraded",
+            "status": "healthy" if db_status and routing["primary"]["breaker"]["state"] == "closed" else "degraded",
             "timestamp": time.time(),
             "uptime_seconds": round(uptime, 2),
             "system_info": {
-                "active_sessions": len(CHAT_HISTORY),
+                "active_sessions": await SESSIONS.count(),
                 "total_queries": SYSTEM_STATUS["total_queries"],
                 "successful_queries": SYSTEM_STATUS["successful_queries"],
                 "failed_queries": SYSTEM_STATUS["failed_queries"],
                 "total_ratings": len(RATINGS_DATA),
                 "supported_languages": SYSTEM_STATUS["supported_languages"],
                 "database_connected": db_status
-            }
+            },
+            "sessions": await SESSIONS.get_stats(),
+            "rate_limit": RATE_LIMITER.get_stats(),
+            "grievance_cache": get_status_cache_stats(),
+            "knowledge_base": RESPONSES.get_stats(),
+            "ratings_writer": RATINGS_SINK.get_stats(),
+            "ratings_database": get_ratings_writer_stats(),
+            "ratings_memory": RATINGS_DATA.get_stats(),
+            "database_routing": routing
         }
     except Exception as e:
         logger.error(f"Health check error: {e}")
@@ -1332,11 +1400,18 @@ async def get_supported_languages():
 async def debug_sessions():
     """Debug endpoint to check current session states."""
     return {
-        "total_sessions": len(USER_SESSION_STATE),
-        "sessions": USER_SESSION_STATE,
+        "total_sessions": await SESSIONS.count(),
+        "sessions": await SESSIONS.snapshot(),
+        "store": await SESSIONS.get_stats(),
+        "conversation_timings": get_conversation_timings(),
         "timestamp": datetime.now().isoformat()
     }
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    workers = int(os.getenv("UVICORN_WORKERS", "1"))
+    if workers > 1 and SESSIONS.name == "memory":
+        logger.warning("Running several workers with in-memory sessions; set SESSION_BACKEND=sqlite to share state")
+    # Snapshots of the previous run would otherwise be summed into this one's counters
+    METRICS.clear_multiprocess_dir()
+    uvicorn.run("fastapp:app", host="0.0.0.0", port=8000, log_level="info", workers=workers)
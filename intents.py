@@ -0,0 +1,192 @@
+import re
+from typing import Optional, Tuple
+
+# === PATTERNS (compiled once at import) ===
+GREETING_STRIP_PATTERN = re.compile(r"[!.,🙂🙏✨⭐️]+")
+
+# Greeting keys in priority order; when several greetings appear the earliest key wins
+GREETING_KEYS = ("good_morning", "good_afternoon", "good_evening", "hello", "good_night")
+GREETING_PATTERN = re.compile(
+    r"(?P<good_morning>\bgood\s*morning\b|\bशुभ\s*सकाळ\b)"
+    r"|(?P<good_afternoon>\bgood\s*afternoon\b|\bशुभ\s*दुपार\b)"
+    r"|(?P<good_evening>\bgood\s*evening\b|\bशुभ\s*संध्याकाळ\b)"
+    r"|(?P<hello>\bhello\b|\bhey+\b|\bhii+\b|\bhi\b|\bनमस्ते\b|\bनमस्कार\b|\bहॅलो\b|\bहेलो\b|\bहाय\b)"
+    r"|(?P<good_night>\bgood\s*night\b|\bशुभ\s*रात्री\b)"
+)
+
+YES_NO_PATTERN = re.compile(
+    r"(?P<yes>\byes\b|\by\b|\byeah\b|\byep\b|\bहोय\b|\bहो\b)"
+    r"|(?P<no>\bno\b|\bn\b|\bnope\b|\bनाही\b|\bना\b)"
+)
+
+# Tried in order; the first pattern with a match anywhere in the text wins
+GRIEVANCE_ID_PATTERNS = (
+    re.compile(r'\b([GgRr]-[a-zA-Z0-9]+)\b'),
+    re.compile(r'\b([GgRr][0-9a-zA-Z]+)\b'),
+    re.compile(r'\b(MJS-[0-9a-zA-Z]+)\b'),
+    re.compile(r'\b([0-9]{6,})\b'),
+)
+# Accepted grievance ID shapes (also used to redact IDs from logs)
+GRIEVANCE_ID_FORMATS = (r'[GgRr]-[a-zA-Z0-9]{6,}', r'[GgRr][0-9a-zA-Z]{6,}', r'MJS-[0-9a-zA-Z]{6,}', r'[0-9]{6,}')
+GRIEVANCE_ID_FORMAT = re.compile(r'^(?:' + '|'.join(GRIEVANCE_ID_FORMATS) + r')$')
+
+MOBILE_CLEAN_PATTERN = re.compile(r'[^\d+\s]')
+MOBILE_WITH_COUNTRY_CODE = re.compile(r'\b(\+91[\s-]?)?([6-9]\d{9})\b')
+MOBILE_TEN_DIGITS = re.compile(r'\b([6-9]\d{9})\b')
+MOBILE_WITH_TRUNK_PREFIX = re.compile(r'\b(0\d{10})\b')
+NON_DIGIT_PATTERN = re.compile(r'\D')
+
+STATUS_QUESTION_EN = "would you like to check the status of your grievance"
+STATUS_QUESTION_MR = (
+    "आपण महा-जल समाधान सार्वजनिक तक्रार निवारण प्रणालीमध्ये नोंदवलेल्या तक्रारीची स्थिती तपासू इच्छिता का",
+    "तक्रारीची स्थिती तपासू इच्छिता का",
+    "स्थिती तपासू इच्छिता का",
+    "तक्रारीची स्थिती"
+)
+FEEDBACK_KEYWORDS = ("feedback", "अभिप्राय")
+GRIEVANCE_KEYWORDS = ("register", "grievance", "complaint", "तक्रार", "नोंदवू", "शिकायत")
+
+# === SINGLE DETECTORS ===
+def detect_greeting(text: str) -> Tuple[bool, str]:
+    """Detect greeting intent and return a normalized key."""
+    return _greeting_key(GREETING_STRIP_PATTERN.sub("", text.strip().lower()))
+
+def _greeting_key(normalized: str) -> Tuple[bool, str]:
+    best = None
+    for match in GREETING_PATTERN.finditer(normalized):
+        rank = GREETING_KEYS.index(match.lastgroup)
+        if best is None or rank < best:
+            best = rank
+            if rank == 0:
+                break
+    if best is None:
+        return False, ""
+    return True, GREETING_KEYS[best]
+
+def detect_yes_no_response(text: str, language: str = "en") -> str:
+    """Detect yes/no responses in both languages."""
+    return _yes_no(text.strip().lower())
+
+def _yes_no(lowered: str) -> str:
+    answer = "unknown"
+    for match in YES_NO_PATTERN.finditer(lowered):
+        if match.lastgroup == "yes":
+            return "yes"
+        answer = "no"
+    return answer
+
+def detect_grievance_id(text: str) -> Optional[str]:
+    """Detect potential grievance ID in text."""
+    for pattern in GRIEVANCE_ID_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return match.group(1)
+    return None
+
+def validate_grievance_id_format(grievance_id: str) -> bool:
+    """Validate if the grievance ID matches expected Maha-Jal Samadhan format."""
+    return GRIEVANCE_ID_FORMAT.match(grievance_id.strip()) is not None
+
+def detect_mobile_number(text: str) -> Optional[str]:
+    """Detect Indian mobile number patterns in text, returned as 10 digits."""
+    clean_text = MOBILE_CLEAN_PATTERN.sub('', text)
+    # +91 followed by 10-digit number starting with 6-9
+    for match in MOBILE_WITH_COUNTRY_CODE.finditer(clean_text):
+        if match.group(1):
+            return match.group(2)
+    # 10-digit number starting with 6-9
+    match = MOBILE_TEN_DIGITS.search(clean_text)
+    if match:
+        return match.group(1)
+    # 11-digit number starting with 0
+    for match in MOBILE_WITH_TRUNK_PREFIX.finditer(clean_text):
+        mobile = match.group(1)[1:]
+        if mobile[0] in '6789':
+            return mobile
+    return None
+
+def validate_mobile_number_format(mobile_number: str) -> bool:
+    """Validate if the mobile number matches Indian format."""
+    digits_only = NON_DIGIT_PATTERN.sub('', mobile_number)
+    # Exactly 10 digits starting with 6, 7, 8, or 9
+    if len(digits_only) == 10:
+        return digits_only[0] in '6789'
+    # +91 prefix
+    if len(digits_only) == 12:
+        return digits_only.startswith('91') and digits_only[2] in '6789'
+    # 0 prefix (11 digits)
+    if len(digits_only) == 11:
+        return digits_only.startswith('0') and digits_only[1] in '6789'
+    return False
+
+def detect_grievance_id_or_mobile(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Detect either grievance ID or mobile number and return the type
+    Returns: (identifier, type) where type is 'grievance_id', 'mobile_number', or None
+    """
+    grievance_id = detect_grievance_id(text)
+    if grievance_id and validate_grievance_id_format(grievance_id):
+        return grievance_id, 'grievance_id'
+    mobile_number = detect_mobile_number(text)
+    if mobile_number and validate_mobile_number_format(mobile_number):
+        return mobile_number, 'mobile_number'
+    return None, None
+
+def detect_exact_status_question(text: str, language: str) -> bool:
+    """Detect the exact status check question."""
+    if language == "en":
+        return STATUS_QUESTION_EN in text.lower()
+    return any(pattern in text for pattern in STATUS_QUESTION_MR)
+
+# === COMBINED CLASSIFIER ===
+class Intent:
+    """Everything the request handlers need to know about one message."""
+
+    __slots__ = (
+        "greeting",
+        "yes_no",
+        "identifier",
+        "identifier_type",
+        "status_question",
+        "feedback",
+        "mentions_grievance",
+    )
+
+    def __init__(self, greeting, yes_no, identifier, identifier_type, status_question, feedback, mentions_grievance):
+        self.greeting = greeting
+        self.yes_no = yes_no
+        self.identifier = identifier
+        self.identifier_type = identifier_type
+        self.status_question = status_question
+        self.feedback = feedback
+        self.mentions_grievance = mentions_grievance
+
+    @property
+    def is_greeting(self) -> bool:
+        return bool(self.greeting)
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+def classify(text: str, language: str = "en") -> Intent:
+    """
+    Classify a message once: normalize it a single time and run every detector
+    against the shared normalized forms.
+    """
+    stripped = text.strip()
+    lowered = stripped.lower()
+    _, greeting = _greeting_key(GREETING_STRIP_PATTERN.sub("", lowered))
+    identifier, identifier_type = detect_grievance_id_or_mobile(text)
+    if language == "en":
+        status_question = STATUS_QUESTION_EN in lowered
+    else:
+        status_question = any(pattern in text for pattern in STATUS_QUESTION_MR)
+    return Intent(
+        greeting=greeting,
+        yes_no=_yes_no(lowered),
+        identifier=identifier,
+        identifier_type=identifier_type,
+        status_question=status_question,
+        feedback=any(keyword in lowered for keyword in FEEDBACK_KEYWORDS),
+        mentions_grievance=any(keyword in lowered for keyword in GRIEVANCE_KEYWORDS),
+    )
@@ -0,0 +1,17 @@
+"""
+End-to-end load test for the chatbot backend.
+
+1. Fill a scratch database with synthetic grievances (same columns database.py reads):
+
+    createdb chatbot_synthetic
+    DATABASE_URL=postgresql://.../chatbot_synthetic python -m loadtest generate --rows 2000000
+
+2. Start the backend against it, without the per-client rate limit:
+
+    DATABASE_URL=postgresql://.../chatbot_synthetic RATE_LIMIT_ENABLED=false uvicorn fastapp:app --workers 4
+
+3. Replay bilingual conversations at rising concurrency and print the report:
+
+    DATABASE_URL=postgresql://.../chatbot_synthetic python -m loadtest run \\
+        --base-url http://localhost:8000 --concurrency 10,50,100,200 --duration 30 --json report.json
+"""
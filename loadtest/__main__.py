@@ -0,0 +1,58 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+
+from loadtest.data import generate, load_identifiers
+from loadtest.driver import run_levels
+from loadtest.report import format_report
+from loadtest.scenarios import check_messages
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description="Chatbot load test")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    gen = commands.add_parser("generate", help="load synthetic grievances into DATABASE_URL")
+    gen.add_argument("--rows", type=int, default=1000000)
+    gen.add_argument("--citizens", type=int, default=200000, help="distinct mobile numbers")
+    gen.add_argument("--batch-size", type=int, default=20000)
+    gen.add_argument("--seed", type=int, default=42)
+
+    run = commands.add_parser("run", help="replay conversations at rising concurrency")
+    run.add_argument("--base-url", default="http://localhost:8000")
+    run.add_argument("--concurrency", default="10,50,100,200", help="comma-separated virtual user counts")
+    run.add_argument("--duration", type=float, default=30, help="seconds per concurrency level")
+    run.add_argument("--think-time", type=float, default=0.0, help="mean pause between requests, seconds")
+    run.add_argument("--timeout", type=float, default=10.0, help="per-request timeout, seconds")
+    run.add_argument("--dsn", default=os.getenv("DATABASE_URL"),
+                     help="database to sample identifiers from (default DATABASE_URL)")
+    run.add_argument("--rows", type=int, default=1000000, help="generated rows, when no --dsn is given")
+    run.add_argument("--citizens", type=int, default=200000, help="generated citizens, when no --dsn is given")
+    run.add_argument("--seed", type=int, default=42)
+    run.add_argument("--json", help="also write the results to this file")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    # httpx logs every request at INFO, which would slow the driver down
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.command == "generate":
+        asyncio.run(generate(args.rows, args.citizens, args.batch_size, args.seed))
+        return
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    check_messages()
+
+    async def run_all():
+        identifiers = await load_identifiers(args.dsn, args.rows, args.citizens)
+        return await run_levels(args.base_url, levels, args.duration, identifiers,
+                                args.think_time, args.timeout, args.seed)
+
+    results = asyncio.run(run_all())
+    print(format_report(results))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+import logging
+import os
+import random
+import sys
+from typing import Dict, List, Optional
+
+import asyncpg
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logger = logging.getLogger(__name__)
+
+# benchmarks/synthetic_grievances.py numbers citizens' mobiles from here
+FIRST_SYNTHETIC_MOBILE = 7000000000
+
+async def generate(rows: int, citizens: int, batch_size: int, seed: int):
+    """Bulk-load synthetic grievances with COPY (see benchmarks/synthetic_grievances.py)"""
+    from benchmarks.synthetic_grievances import load
+    await load(rows, citizens, batch_size, seed)
+
+async def sample_identifiers(dsn: str, limit: int = 5000) -> Dict[str, List[str]]:
+    """Real grievance IDs and mobile numbers to look up, picked at random from the database"""
+    conn = await asyncpg.connect(dsn)
+    try:
+        rows = await conn.fetch(
+            "SELECT grievance_unique_number, mobile_number FROM public.grievances ORDER BY random() LIMIT $1",
+            limit
+        )
+    finally:
+        await conn.close()
+    return {
+        "grievance_ids": [row['grievance_unique_number'] for row in rows if row['grievance_unique_number']],
+        "mobile_numbers": [row['mobile_number'] for row in rows if row['mobile_number']],
+    }
+
+def synthetic_identifiers(rows: int, citizens: int, limit: int = 5000, seed: int = 42) -> Dict[str, List[str]]:
+    """The identifiers the generator produces, for when the driver cannot reach the database"""
+    rng = random.Random(seed)
+    return {
+        "grievance_ids": [f"G-{rng.randint(1, rows):010x}" for _ in range(limit)],
+        "mobile_numbers": [str(FIRST_SYNTHETIC_MOBILE + rng.randrange(citizens)) for _ in range(limit)],
+    }
+
+async def load_identifiers(dsn: Optional[str], rows: int, citizens: int) -> Dict[str, List[str]]:
+    if dsn:
+        identifiers = await sample_identifiers(dsn)
+        if identifiers["grievance_ids"]:
+            return identifiers
+        logger.warning("No grievances in the database; falling back to synthetic identifiers")
+    return synthetic_identifiers(rows, citizens)
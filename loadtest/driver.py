@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from loadtest.report import summarize
+from loadtest.scenarios import pick_scenario
+
+logger = logging.getLogger(__name__)
+
+class VirtualUser:
+    """
+    One simulated citizen: replays scenarios back to back on a shared client,
+    keeping the session ID the backend hands out, and records every request
+    as (endpoint, latency seconds, error or None).
+    """
+
+    def __init__(self, client: httpx.AsyncClient, identifiers: Dict[str, List[str]],
+                 samples: List[tuple], rng: random.Random, think_time: float = 0.0):
+        self.client = client
+        self.identifiers = identifiers
+        self.samples = samples
+        self.rng = rng
+        self.think_time = think_time
+        self.session_id: Optional[str] = None
+
+    def pick(self, key: str) -> str:
+        return self.rng.choice(self.identifiers[key])
+
+    async def _post(self, endpoint: str, payload: Dict[str, Any], expected=(200,)) -> Optional[Dict[str, Any]]:
+        started = time.perf_counter()
+        error = None
+        body = None
+        try:
+            response = await self.client.post(endpoint, json=payload)
+            if response.status_code in expected:
+                body = response.json()
+            else:
+                error = f"HTTP {response.status_code}"
+        except httpx.HTTPError as e:
+            error = type(e).__name__
+        self.samples.append((endpoint, time.perf_counter() - started, error))
+        if self.think_time:
+            await asyncio.sleep(self.rng.expovariate(1 / self.think_time))
+        return body
+
+    async def query(self, text: str, language: str):
+        body = await self._post("/query/", {"input_text": text, "language": language, "session_id": self.session_id})
+        if body and body.get("session_id"):
+            self.session_id = body["session_id"]
+
+    async def status(self, identifier: str, language: str):
+        # 404 is the normal answer for an unknown grievance
+        await self._post("/grievance/status/", {"grievance_id": identifier, "language": language}, expected=(200, 404))
+
+    async def rate(self, rating: int, language: str, **fields):
+        await self._post("/rating/", {"rating": rating, "language": language, "session_id": self.session_id, **fields})
+
+async def run_level(base_url: str, concurrency: int, duration: float, identifiers: Dict[str, List[str]],
+                    think_time: float = 0.0, timeout: float = 10.0, seed: int = 42) -> Dict[str, Any]:
+    """Closed loop: `concurrency` users replay conversations for `duration` seconds"""
+    samples: List[tuple] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        deadline = time.perf_counter() + duration
+
+        async def user_loop(index: int):
+            user = VirtualUser(client, identifiers, samples, random.Random(seed + index), think_time)
+            while time.perf_counter() < deadline:
+                user.session_id = None
+                await pick_scenario(user.rng)(user)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user_loop(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return summarize(concurrency, samples, elapsed)
+
+async def run_levels(base_url: str, levels: List[int], duration: float, identifiers: Dict[str, List[str]],
+                     think_time: float = 0.0, timeout: float = 10.0, seed: int = 42) -> List[Dict[str, Any]]:
+    results = []
+    for concurrency in levels:
+        logger.info(f"Running {concurrency} virtual users for {duration:.0f}s against {base_url}")
+        result = await run_level(base_url, concurrency, duration, identifiers, think_time, timeout, seed)
+        logger.info(
+            f"{concurrency} users: {result['throughput_rps']:.1f} req/s, "
+            f"p95 {result['p95_ms']:.1f} ms, errors {result['error_rate']:.2%}"
+        )
+        results.append(result)
+    return results
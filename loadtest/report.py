@@ -0,0 +1,56 @@
+import math
+from collections import Counter
+from typing import Any, Dict, List
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def latency_summary(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "error_rate": errors / len(latencies) if latencies else 0.0,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+    }
+
+def summarize(concurrency: int, samples: List[tuple], elapsed: float) -> Dict[str, Any]:
+    """One concurrency level: overall and per-endpoint figures from (endpoint, seconds, error) samples"""
+    by_endpoint: Dict[str, List[tuple]] = {}
+    for sample in samples:
+        by_endpoint.setdefault(sample[0], []).append(sample)
+    result = {
+        "concurrency": concurrency,
+        "duration_seconds": elapsed,
+        **latency_summary([s[1] for s in samples], sum(1 for s in samples if s[2]), elapsed),
+        "endpoints": {
+            endpoint: latency_summary([s[1] for s in group], sum(1 for s in group if s[2]), elapsed)
+            for endpoint, group in sorted(by_endpoint.items())
+        },
+        "error_kinds": dict(Counter(s[2] for s in samples if s[2])),
+    }
+    return result
+
+def format_report(results: List[Dict[str, Any]]) -> str:
+    header = f"{'users':>6} {'endpoint':<20} {'requests':>9} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}"
+    lines = [header, "-" * len(header)]
+    for result in results:
+        rows = [("all", result)] + list(result["endpoints"].items())
+        for name, row in rows:
+            lines.append(
+                f"{result['concurrency']:>6} {name:<20} {row['requests']:>9} {row['throughput_rps']:>9.1f} "
+                f"{row['p50_ms']:>9.1f} {row['p95_ms']:>9.1f} {row['p99_ms']:>9.1f} {row['error_rate']:>8.2%}"
+            )
+        if result["error_kinds"]:
+            kinds = ", ".join(f"{kind} x{count}" for kind, count in sorted(result["error_kinds"].items()))
+            lines.append(f"{'':>6} errors: {kinds}")
+        lines.append("")
+    return "\n".join(lines)
@@ -0,0 +1,101 @@
+import random
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from intents import classify
+
+# Conversations a virtual user replays, with their share of the traffic.
+# Each one is a few turns on one session, the way the web chat drives /query/.
+#
+# Every message is listed in MESSAGES with the event fastapp.turn_event derives
+# from it, and check_messages() confirms them with intents.classify before a run,
+# so the reported mix is the traffic that was actually sent. Two phrasings are
+# deliberate: the English status question contains "grievance", which the ID
+# detector accepts as a grievance ID, so English users give their ID straight
+# away; and a bare 10-digit number is taken for a numeric grievance ID, so
+# mobile numbers are written as 98765-43210.
+
+MESSAGES: Dict[str, Tuple[str, str, str]] = {
+    "greet_en": ("hello", "en", "unknown"),
+    "greet_mr": ("नमस्कार", "mr", "unknown"),
+    "status_question_mr": ("तक्रारीची स्थिती", "mr", "status_question"),
+    "grievance_id_en": ("My grievance ID is {grievance_id}", "en", "identifier:grievance_id"),
+    "mobile_mr": ("माझा मोबाईल नंबर {mobile} आहे", "mr", "identifier:mobile_number"),
+    "unknown_id_en": ("status of {grievance_id}", "en", "identifier:grievance_id"),
+    "feedback_en": ("feedback", "en", "feedback"),
+    "yes_en": ("yes", "en", "yes"),
+    # Mentioning a complaint restarts the main flow, where "yes" asks how to register
+    "register_en": ("yes, I want to file a complaint", "en", "yes"),
+    "register_mr": ("होय, मला तक्रार नोंदवायची आहे", "mr", "yes"),
+}
+
+def spoken_mobile(mobile: str) -> str:
+    """A stored mobile number the way the chat recognizes it, e.g. 98765-43210"""
+    digits = "".join(ch for ch in mobile if ch.isdigit())[-10:]
+    return f"{digits[:5]}-{digits[5:]}"
+
+def message(key: str, **values) -> Tuple[str, str]:
+    text, language, _ = MESSAGES[key]
+    return text.format(**values), language
+
+def message_event(text: str, language: str) -> str:
+    """The event fastapp.turn_event picks for this text, with the identifier type"""
+    intent = classify(text, language)
+    if intent.identifier:
+        return f"identifier:{intent.identifier_type}"
+    if intent.status_question:
+        return "status_question"
+    if intent.feedback:
+        return "feedback"
+    return intent.yes_no
+
+def check_messages():
+    """Raise ValueError if a scenario message no longer produces the event it is meant to"""
+    samples = {"grievance_id": "G-zz0a1b2c3d", "mobile": spoken_mobile("9876543210")}
+    wrong = []
+    for key, (text, language, expected) in MESSAGES.items():
+        event = message_event(text.format(**samples), language)
+        if event != expected:
+            wrong.append(f"{key}: expected {expected}, got {event}")
+    if wrong:
+        raise ValueError("Load test messages classify differently: " + "; ".join(wrong))
+
+async def status_by_grievance_id(user):
+    """English: greet, give a grievance ID, ask for feedback, then rate the answer"""
+    await user.query(*message("greet_en"))
+    grievance_id = user.pick("grievance_ids")
+    await user.query(*message("grievance_id_en", grievance_id=grievance_id))
+    await user.query(*message("feedback_en"))
+    await user.query(*message("yes_en"))
+    await user.rate(user.rng.randint(3, 5), "en", grievance_id=grievance_id)
+
+async def status_by_mobile(user):
+    """Marathi: greet, ask about a grievance, give the mobile number, then rate"""
+    await user.query(*message("greet_mr"))
+    await user.query(*message("status_question_mr"))
+    await user.query(*message("mobile_mr", mobile=spoken_mobile(user.pick("mobile_numbers"))))
+    await user.rate(user.rng.randint(1, 5), "mr", feedback_text="लवकर काम झाले")
+
+async def direct_status_lookup(user):
+    """The status form on the web page: one /grievance/status/ call"""
+    key = "grievance_ids" if user.rng.random() < 0.6 else "mobile_numbers"
+    await user.status(user.pick(key), user.rng.choice(("en", "mr")))
+
+async def unknown_grievance(user):
+    """A grievance ID that does not exist, so the lookup misses the database"""
+    await user.query(*message("unknown_id_en", grievance_id=f"G-zz{user.rng.randrange(16 ** 8):08x}"))
+    await user.status(f"G-zz{user.rng.randrange(16 ** 8):08x}", "en")
+
+async def registration_question(user):
+    """Asks how to register a complaint, in either language; no database call"""
+    await user.query(*message("register_en" if user.rng.random() < 0.5 else "register_mr"))
+
+SCENARIOS: List[Tuple[Callable[..., Awaitable[None]], int]] = [
+    (status_by_grievance_id, 35),
+    (status_by_mobile, 25),
+    (direct_status_lookup, 25),
+    (unknown_grievance, 5),
+    (registration_question, 10),
+]
+
+def pick_scenario(rng: random.Random) -> Callable[..., Awaitable[None]]:
+    return rng.choices([scenario for scenario, _ in SCENARIOS], weights=[w for _, w in SCENARIOS])[0]
@@ -0,0 +1,268 @@
+import glob
+import json
+import logging
+import math
+import os
+import secrets
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers cache hits (sub-millisecond) up to the 5s query timeout
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+class Metric:
+    """A named metric whose values are keyed by a tuple of label values."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[tuple, Any] = {}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": [[list(labels), value] for labels, value in self.values.items()],
+        }
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1.0):
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, *labels):
+        self.values[labels] = value
+
+class Histogram(Metric):
+    """Fixed-bucket histogram; each label set holds per-bucket counts, then sum and count."""
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels):
+        state = self.values.get(labels)
+        if state is None:
+            # One slot per bucket plus +Inf, then sum and count
+            state = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = super().snapshot()
+        snapshot["buckets"] = list(self.buckets)
+        return snapshot
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(names: List[str], values: List[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class MetricsRegistry:
+    """
+    Holds the process's metrics and renders them in the Prometheus text format.
+    Collectors are called at scrape time for values other modules already keep
+    (cache counters, pool sizes).
+
+    With a multiprocess directory every worker periodically writes its snapshot
+    to <dir>/metrics_<pid>_<boot id>.json and a scrape on any worker merges them
+    all: counters and histograms are summed, gauges get a `pid` label. Gauges of
+    workers that are no longer running are left out.
+    """
+
+    def __init__(self, multiprocess_dir: Optional[str] = None):
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Callable[[], Iterable[Metric]]] = []
+        self.multiprocess_dir = multiprocess_dir or None
+        self._boot: Tuple[int, str] = (0, "")
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric '{metric.name}' already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Metric]]):
+        self.collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """All metrics of this process, including collector values, as JSON-able data"""
+        snapshot = {name: metric.snapshot() for name, metric in self.metrics.items()}
+        for collector in self.collectors:
+            try:
+                for metric in collector():
+                    snapshot[metric.name] = metric.snapshot()
+            except Exception as e:
+                logger.warning(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+        return snapshot
+
+    @property
+    def boot_id(self) -> str:
+        """Random per process, so a worker that reuses a pid never overwrites an earlier worker's snapshot"""
+        if self._boot[0] != os.getpid():
+            self._boot = (os.getpid(), secrets.token_hex(4))
+        return self._boot[1]
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.multiprocess_dir, f"metrics_{os.getpid()}_{self.boot_id}.json")
+
+    def clear_multiprocess_dir(self) -> int:
+        """
+        Remove every snapshot from the multiprocess directory. Call it once in
+        the parent process before the workers start, or counters carry over
+        from the previous run.
+        """
+        if not self.multiprocess_dir:
+            return 0
+        removed = 0
+        for path in glob.glob(os.path.join(self.multiprocess_dir, "metrics_*.json*")):
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def write_snapshot(self, final: bool = False):
+        """
+        Publish this worker's snapshot for the other workers' scrapes (atomic
+        replace). The final snapshot of a stopping worker keeps its counters and
+        histograms, so totals never go backwards, but drops its gauges.
+        """
+        if not self.multiprocess_dir:
+            return
+        os.makedirs(self.multiprocess_dir, exist_ok=True)
+        snapshot = self.snapshot()
+        if final:
+            snapshot = {name: metric for name, metric in snapshot.items() if metric["type"] != "gauge"}
+        path = self.snapshot_path
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(path + ".tmp", path)
+
+    def _snapshots(self) -> List[Tuple[str, Dict[str, Any]]]:
+        snapshots = [(str(os.getpid()), self.snapshot())]
+        if not self.multiprocess_dir:
+            return snapshots
+        own = self.snapshot_path
+        for path in glob.glob(os.path.join(self.multiprocess_dir, "metrics_*.json")):
+            if path == own:
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping metrics snapshot {path}: {e}")
+                continue
+            pid = os.path.basename(path)[8:-5].split("_")[0]
+            if not pid.isdigit() or pid == str(os.getpid()) or not _process_alive(int(pid)):
+                # A worker that crashed never wrote a final snapshot; its gauges are stale.
+                # One with our pid but another boot id is an earlier process that had it.
+                snapshot = {name: metric for name, metric in snapshot.items() if metric["type"] != "gauge"}
+            snapshots.append((pid, snapshot))
+        return snapshots
+
+    def render(self) -> str:
+        """Prometheus text exposition of this process, merged with the other workers if enabled"""
+        snapshots = self._snapshots()
+        multiprocess = bool(self.multiprocess_dir)
+        merged: Dict[str, Dict[str, Any]] = {}
+        for pid, snapshot in snapshots:
+            for name, metric in snapshot.items():
+                entry = merged.setdefault(name, {**metric, "samples": {}})
+                labelnames = list(metric["labelnames"])
+                if metric["type"] == "gauge" and multiprocess:
+                    entry["labelnames"] = labelnames + ["pid"]
+                for labels, value in metric["samples"]:
+                    if metric["type"] == "gauge":
+                        key = tuple(labels) + ((pid,) if multiprocess else ())
+                        entry["samples"][key] = value
+                    elif metric["type"] == "histogram":
+                        current = entry["samples"].get(tuple(labels))
+                        entry["samples"][tuple(labels)] = (
+                            list(value) if current is None else [a + b for a, b in zip(current, value)]
+                        )
+                    else:
+                        key = tuple(labels)
+                        entry["samples"][key] = entry["samples"].get(key, 0.0) + value
+
+        lines = []
+        for name in sorted(merged):
+            metric = merged[name]
+            labelnames = metric["labelnames"]
+            lines.append(f"# HELP {name} {_escape(metric['help'])}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for labels, value in sorted(metric["samples"].items(), key=lambda item: [str(v) for v in item[0]]):
+                labels = list(labels)
+                if metric["type"] != "histogram":
+                    lines.append(f"{name}{_labels(labelnames, labels)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(metric["buckets"]) + [math.inf], value[:-2]):
+                    cumulative += count
+                    le = f'le="{_number(bound)}"'
+                    lines.append(f"{name}_bucket{_labels(labelnames, labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels(labelnames, labels)} {_number(value[-2])}")
+                lines.append(f"{name}_count{_labels(labelnames, labels)} {_number(value[-1])}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry(os.getenv("METRICS_MULTIPROC_DIR"))
+
+if __name__ == "__main__":
+    # Empty METRICS_MULTIPROC_DIR before starting `uvicorn --workers` directly
+    print(f"Removed {REGISTRY.clear_multiprocess_dir()} metrics snapshots")
@@ -0,0 +1,148 @@
+import ipaddress
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+class RouteBudget(NamedTuple):
+    """Token bucket budget: refill rate in requests per second and burst size."""
+    rate: float
+    burst: float
+
+def take_from_bucket(
+    tokens: float,
+    updated_at: float,
+    rate: float,
+    burst: float,
+    now: float
+) -> Tuple[float, float]:
+    """
+    Refill a bucket up to now and try to take one token.
+    Returns (tokens_left, retry_after); retry_after is 0 when the request is allowed.
+    """
+    tokens = min(burst, tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= 1.0:
+        return tokens - 1.0, 0.0
+    return tokens, (1.0 - tokens) / rate
+
+def parse_trusted_proxies(value: str) -> List[ipaddress._BaseNetwork]:
+    """Comma-separated proxy addresses or CIDR ranges (TRUSTED_PROXIES)"""
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in value.split(",") if item.strip()]
+
+def is_trusted_proxy(address: str, trusted: List[ipaddress._BaseNetwork]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted)
+
+def client_address(peer: Optional[str], forwarded_for: Optional[str], trusted: List[ipaddress._BaseNetwork]) -> Optional[str]:
+    """
+    The client's IP. X-Forwarded-For is only believed when the connection comes
+    from a trusted proxy; then the nearest hop that is not itself a trusted
+    proxy is the client (hops further left could have been made up by it).
+    """
+    if not peer or not forwarded_for or not is_trusted_proxy(peer, trusted):
+        return peer
+    hops = [hop.strip() for hop in forwarded_for.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        try:
+            ipaddress.ip_address(hop)
+        except ValueError:
+            # A malformed header: fall back to the proxy's own address
+            return peer
+        if not is_trusted_proxy(hop, trusted):
+            return hop
+    return hops[0] if hops else peer
+
+def bucket_expiry(tokens: float, rate: float, burst: float, now: float) -> float:
+    """Time at which an untouched bucket is full again and can be forgotten"""
+    return now + (burst - tokens) / rate
+
+class TokenBuckets:
+    """
+    In-process bucket table. Buckets are kept in last-used order: ones that have
+    refilled completely are dropped from the front, and the table never holds
+    more than max_buckets, so memory stays bounded and every call is O(1).
+    """
+
+    def __init__(self, max_buckets: int = 100000):
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def take(self, key: str, rate: float, burst: float, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            tokens, updated_at = burst, now
+        else:
+            tokens, updated_at, _ = bucket
+        tokens, retry_after = take_from_bucket(tokens, updated_at, rate, burst, now)
+        self._buckets[key] = [tokens, now, bucket_expiry(tokens, rate, burst, now)]
+
+        # Forget a couple of refilled buckets per call, then enforce the hard cap
+        for _ in range(2):
+            oldest_key, oldest = next(iter(self._buckets.items()))
+            if oldest_key == key or oldest[2] > now:
+                break
+            del self._buckets[oldest_key]
+        while len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+            self.evicted += 1
+        return retry_after
+
+class RateLimiter:
+    """
+    Per-route token-bucket limits keyed by both session_id and client IP. Bucket
+    state lives in the session backend, so workers sharing a backend share limits.
+    The session is checked first, so a session that is already throttled does not
+    keep draining the IP bucket it shares with everyone behind the same proxy.
+    """
+
+    def __init__(self, backend, budgets: Dict[str, RouteBudget], ip_multiplier: float = 20.0, enabled: bool = True):
+        self.backend = backend
+        self.budgets = budgets
+        self.ip_multiplier = ip_multiplier
+        self.enabled = enabled
+        self.allowed = 0
+        self.rejected: Dict[str, int] = {}
+        self.rejected_by_key = {"session": 0, "ip": 0}
+
+    def applies_to(self, path: str) -> bool:
+        return self.enabled and path in self.budgets
+
+    async def check(self, path: str, session_id: Optional[str], client_ip: Optional[str]) -> float:
+        """Return 0 if the request may proceed, otherwise seconds until it may be retried"""
+        budget = self.budgets[path]
+        checks = []
+        if session_id:
+            checks.append(("session", session_id, budget.rate, budget.burst))
+        if client_ip:
+            # One IP can front many citizens (e.g. the PHP frontend), so its budget is larger
+            checks.append(("ip", client_ip, budget.rate * self.ip_multiplier, budget.burst * self.ip_multiplier))
+        for kind, value, rate, burst in checks:
+            retry_after = await self.backend.take_token(f"{path}|{kind}:{value}", rate, burst)
+            if retry_after > 0:
+                self.rejected[path] = self.rejected.get(path, 0) + 1
+                self.rejected_by_key[kind] += 1
+                return retry_after
+        self.allowed += 1
+        return 0.0
+
+    @staticmethod
+    def retry_after_header(retry_after: float) -> str:
+        return str(max(1, math.ceil(retry_after)))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "budgets": {path: budget._asdict() for path, budget in self.budgets.items()},
+            "allowed": self.allowed,
+            "rejected": sum(self.rejected.values()),
+            "rejected_by_route": dict(self.rejected),
+            "rejected_by_key": dict(self.rejected_by_key),
+        }
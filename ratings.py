@@ -0,0 +1,688 @@
+import asyncio
+import bisect
+import csv
+import glob
+import io
+import os
+import re
+import tempfile
+import time
+import zlib
+import sys
+import logging
+from array import array
+from collections import Counter, OrderedDict, deque
+from datetime import date, datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, NamedTuple, Optional, TextIO
+
+logger = logging.getLogger(__name__)
+
+RATING_CSV_FIELDS = ["timestamp", "session_id", "rating", "Feedback", "language", "grievance_id", "phone_number"]
+# How long shutdown waits for room on a full ratings queue before giving up on the writer
+STOP_TIMEOUT_SECONDS = 5.0
+
+def default_ratings_dir() -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "ratings_data")
+
+class RatingsCsvSink:
+    """
+    Daily ratings CSV files written by one background task. Submissions go on
+    a bounded queue; the writer drains it in batches off the event loop, keeps
+    the current day's file open, rolls over to a new file at midnight and
+    fsyncs at most every fsync_interval seconds.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        batch_size: int = 100,
+        fsync_interval: float = 1.0,
+        max_queue: int = 10000
+    ):
+        self.directory = directory
+        self.batch_size = max(1, batch_size)
+        self.fsync_interval = fsync_interval
+        self.max_queue = max_queue
+        self._queue: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._file: Optional[TextIO] = None
+        self._file_day: Optional[str] = None
+        self._file_path: Optional[str] = None
+        self._dirty = False
+        self._last_fsync = time.monotonic()
+        self.written = 0
+        self.batches = 0
+        self.fsyncs = 0
+        self.errors = 0
+        self.dropped = 0
+
+    # === FILE HANDLING (writer thread only) ===
+    def _resolve_path(self, day: str) -> str:
+        try:
+            os.makedirs(self.directory, mode=0o755, exist_ok=True)
+            directory = self.directory
+        except PermissionError:
+            directory = os.path.dirname(os.path.abspath(__file__))
+            logger.warning("Could not create ratings_data directory, using current directory")
+        csv_path = os.path.join(directory, f"ratings_log_{day}.csv")
+        # Files written before phone_number existed get a v2 sibling to avoid mixed headers
+        if os.path.exists(csv_path):
+            try:
+                with open(csv_path, "r", encoding="utf-8-sig") as rf:
+                    header_line = rf.readline()
+                if header_line and "phone_number" not in header_line:
+                    csv_path = os.path.join(directory, f"ratings_log_{day}_v2.csv")
+            except Exception:
+                pass
+        return csv_path
+
+    def _open(self, path: str) -> TextIO:
+        f = open(path, mode="a", newline="", encoding="utf-8-sig")
+        if f.tell() == 0:
+            csv.DictWriter(f, fieldnames=RATING_CSV_FIELDS).writeheader()
+        return f
+
+    def _close(self):
+        if self._file is not None:
+            try:
+                self._fsync()
+                self._file.close()
+            finally:
+                self._file = None
+                self._file_day = None
+                self._file_path = None
+
+    def _fsync(self):
+        if self._file is not None and self._dirty:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._dirty = False
+            self._last_fsync = time.monotonic()
+            self.fsyncs += 1
+
+    def _file_for(self, day: str) -> TextIO:
+        if self._file_day != day:
+            self._close()
+            path = self._resolve_path(day)
+            try:
+                self._file = self._open(path)
+            except (PermissionError, OSError):
+                path = os.path.join(tempfile.gettempdir(), f"maha_jal_ratings_{day}.csv")
+                self._file = self._open(path)
+                logger.info(f"Ratings are being saved to alternative location: {path}")
+            self._file_day = day
+            self._file_path = path
+        return self._file
+
+    def _write_batch(self, rows: List[Dict[str, Any]]):
+        """Append rows to their day's file; the timestamp decides the day"""
+        for row in rows:
+            day = row["timestamp"][:10].replace("-", "")
+            writer = csv.DictWriter(self._file_for(day), fieldnames=RATING_CSV_FIELDS, extrasaction="ignore")
+            writer.writerow(row)
+            # Set per row: a batch that crosses midnight closes (and fsyncs) the previous day's file
+            self._dirty = True
+        self._file.flush()
+        if time.monotonic() - self._last_fsync >= self.fsync_interval:
+            self._fsync()
+
+    # === QUEUE ===
+    @property
+    def running(self) -> bool:
+        return self._writer is not None and not self._writer.done()
+
+    def submit(self, row: Dict[str, Any]):
+        """
+        Queue a row for the writer. Files are only ever touched by the writer, so
+        when it isn't running or the queue is full the row is dropped and counted
+        (the ratings table still gets it when RATINGS_DB_ENABLED is on).
+        """
+        if self.running:
+            try:
+                self._queue.put_nowait(row)
+                return
+            except asyncio.QueueFull:
+                logger.error("Ratings CSV queue is full, dropping rating from the CSV log")
+        else:
+            logger.error("Ratings CSV writer is not running, dropping rating from the CSV log")
+        self.dropped += 1
+
+    async def _write_forever(self):
+        stopping = False
+        while not stopping:
+            timeout = self.fsync_interval if self._dirty else None
+            try:
+                row = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                try:
+                    await asyncio.to_thread(self._fsync)
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"Error syncing ratings CSV: {e}")
+                continue
+            rows = []
+            while row is not None:
+                rows.append(row)
+                if len(rows) >= self.batch_size or self._queue.empty():
+                    break
+                row = self._queue.get_nowait()
+            if row is None:
+                # Shutdown sentinel: everything queued before it is in rows
+                stopping = True
+            if rows:
+                try:
+                    await asyncio.to_thread(self._write_batch, rows)
+                    self.written += len(rows)
+                    self.batches += 1
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"Error saving {len(rows)} ratings to CSV: {e}")
+        await asyncio.to_thread(self._close)
+
+    def start(self):
+        if self._writer is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._writer = asyncio.create_task(self._write_forever())
+
+    async def stop(self):
+        """Write everything still queued, fsync and close the file"""
+        if self._writer is None:
+            self._close()
+            return
+        try:
+            if self.running:
+                try:
+                    await asyncio.wait_for(self._queue.put(None), STOP_TIMEOUT_SECONDS)
+                except asyncio.TimeoutError:
+                    logger.error("Ratings CSV writer did not drain its queue, stopping it")
+                    self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            except Exception as e:
+                logger.error(f"Ratings CSV writer had stopped with an error: {e}")
+        finally:
+            self._writer = None
+            self._queue = None
+            try:
+                await asyncio.to_thread(self._close)
+            except Exception as e:
+                logger.error(f"Error closing ratings CSV: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "batches": self.batches,
+            "fsyncs": self.fsyncs,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "current_file": self._file_path,
+        }
+
+MISSING_VALUES = ("", "N/A", "NA", None)
+
+def rating_identifier_type(entry: Dict[str, Any]) -> str:
+    """How a rating was linked to a grievance: grievance_id, phone or none"""
+    if entry.get("phone_number") not in MISSING_VALUES:
+        return "phone"
+    if entry.get("grievance_id") not in MISSING_VALUES:
+        return "grievance_id"
+    return "none"
+
+class RatingStats:
+    """
+    Running rating aggregates, updated once per rating so that reading them
+    costs the same no matter how many ratings have been collected.
+    """
+
+    def __init__(self, latest_size: int = 10, max_days: int = 366):
+        self.max_days = max_days
+        self.total = 0
+        self.rating_sum = 0
+        self.by_star = [0] * 6
+        self.by_language: Dict[str, int] = {}
+        self.by_identifier = {"grievance_id": 0, "phone": 0, "none": 0}
+        self.by_day: "OrderedDict[str, int]" = OrderedDict()
+        self.latest: deque = deque(maxlen=latest_size)
+
+    def add(self, entry: Dict[str, Any]):
+        rating = int(entry["rating"])
+        if not 1 <= rating <= 5:
+            return
+        self.total += 1
+        self.rating_sum += rating
+        self.by_star[rating] += 1
+        language = entry.get("language") or "unknown"
+        self.by_language[language] = self.by_language.get(language, 0) + 1
+        self.by_identifier[rating_identifier_type(entry)] += 1
+        day = str(entry.get("timestamp", ""))[:10]
+        if day:
+            if day in self.by_day:
+                self.by_day[day] += 1
+            else:
+                self.by_day[day] = 1
+                # Ratings arrive in time order, so the oldest day is at the front
+                while len(self.by_day) > self.max_days:
+                    self.by_day.popitem(last=False)
+        self.latest.append(entry)
+
+    def rebuild(self, entries: Iterable[Dict[str, Any]]) -> int:
+        """Replace the aggregates with ones computed from stored ratings"""
+        self.__init__(self.latest.maxlen, self.max_days)
+        for entry in entries:
+            try:
+                self.add(entry)
+            except (KeyError, TypeError, ValueError):
+                continue
+        return self.total
+
+    def snapshot(self) -> Dict[str, Any]:
+        if not self.total:
+            return {
+                "total_ratings": 0,
+                "average_rating": 0,
+                "rating_distribution": {},
+                "language_distribution": {}
+            }
+        return {
+            "total_ratings": self.total,
+            "average_rating": round(self.rating_sum / self.total, 2),
+            "rating_distribution": {str(star): self.by_star[star] for star in range(1, 6)},
+            "language_distribution": dict(self.by_language),
+            "identifier_distribution": dict(self.by_identifier),
+            "daily_counts": dict(self.by_day),
+            "latest_ratings": list(self.latest)
+        }
+
+RATING_FILE_DAY = re.compile(r"ratings_log_(\d{8})")
+
+class RatingFilter(NamedTuple):
+    """Export filters; None means no restriction. Dates are inclusive."""
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    language: Optional[str] = None
+    min_rating: Optional[int] = None
+    max_rating: Optional[int] = None
+
+    def includes_file(self, path: str) -> bool:
+        """False only for daily files that lie entirely outside the date range"""
+        match = RATING_FILE_DAY.search(os.path.basename(path))
+        if not match:
+            return True
+        day = match.group(1)
+        if self.start_date and day < self.start_date.strftime("%Y%m%d"):
+            return False
+        if self.end_date and day > self.end_date.strftime("%Y%m%d"):
+            return False
+        return True
+
+    def matches(self, entry: Dict[str, Any]) -> bool:
+        day = (entry.get("timestamp") or "")[:10]
+        if self.start_date and day < self.start_date.isoformat():
+            return False
+        if self.end_date and day > self.end_date.isoformat():
+            return False
+        if self.language and entry.get("language") != self.language:
+            return False
+        if self.min_rating is not None and entry["rating"] < self.min_rating:
+            return False
+        if self.max_rating is not None and entry["rating"] > self.max_rating:
+            return False
+        return True
+
+def rating_csv_paths(directory: str, filters: Optional[RatingFilter] = None) -> List[str]:
+    """Daily ratings files in directory (oldest first), skipping days outside the filter"""
+    paths = sorted(glob.glob(os.path.join(directory, "ratings_log*.csv")))
+    if filters is not None:
+        paths = [path for path in paths if filters.includes_file(path)]
+    return paths
+
+def iter_rating_csv_file(path: str) -> Iterator[Dict[str, Any]]:
+    """Rows of one ratings CSV, normalized to RATING_CSV_FIELDS with an int rating"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            # Older files call the label column rating_label
+            if "Feedback" not in row and "rating_label" in row:
+                row["Feedback"] = row.pop("rating_label")
+            entry = {field: row.get(field) for field in RATING_CSV_FIELDS}
+            try:
+                entry["rating"] = int(entry["rating"])
+            except (TypeError, ValueError):
+                continue
+            yield entry
+
+def iter_rating_csv_files(directory: str, filters: Optional[RatingFilter] = None) -> Iterator[Dict[str, Any]]:
+    """Stream matching rows from the daily files one at a time"""
+    for path in rating_csv_paths(directory, filters):
+        try:
+            for entry in iter_rating_csv_file(path):
+                if filters is None or filters.matches(entry):
+                    yield entry
+        except OSError as e:
+            logger.warning(f"Could not read ratings file {path}: {e}")
+
+def read_rating_csv_files(directory: str) -> List[Dict[str, Any]]:
+    """Rows from every ratings_log CSV in directory, sorted by timestamp"""
+    entries = list(iter_rating_csv_files(directory))
+    entries.sort(key=lambda entry: entry["timestamp"] or "")
+    return entries
+
+# === COLUMNAR STORE ===
+IDENTIFIER_TYPES = ("none", "grievance_id", "phone")
+
+def parse_rating_timestamp(value: str) -> float:
+    """Epoch seconds for a 'YYYY-MM-DD HH:MM:SS' local timestamp"""
+    return datetime.strptime(value[:19], "%Y-%m-%d %H:%M:%S").timestamp()
+
+class StringTable:
+    """Dictionary encoding: each distinct string is stored once and referenced by index."""
+
+    __slots__ = ("_codes", "values")
+
+    def __init__(self):
+        self._codes: Dict[str, int] = {}
+        # Code 0 stands for "no value"
+        self.values: List[Optional[str]] = [None]
+
+    def encode(self, value: Optional[str]) -> int:
+        if value in MISSING_VALUES:
+            return 0
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(sys.intern(value))
+        return code
+
+    def decode(self, code: int) -> Optional[str]:
+        return self.values[code]
+
+    def code_of(self, value: str) -> Optional[int]:
+        return self._codes.get(value)
+
+    def __len__(self) -> int:
+        return len(self.values) - 1
+
+class RatingColumns:
+    """
+    Compact in-memory ratings: one typed array per field instead of one dict
+    per rating. Strings are dictionary-encoded and labels are not stored at
+    all; they are looked up from language and rating when rows are exported.
+    Counts per (day, language, rating, identifier type) are kept as rows are
+    appended, so filtered statistics never walk the rows.
+    """
+
+    def __init__(self):
+        self.epoch = array("d")
+        # True while rows are in timestamp order, so date ranges can be found by bisection
+        self.in_order = True
+        self.counts: Dict[tuple, int] = {}
+        self.rating = array("b")
+        self.language = array("B")
+        self.identifier_type = array("B")
+        self.session = array("l")
+        self.identifier = array("l")
+        self.languages = StringTable()
+        self.sessions = StringTable()
+        self.identifiers = StringTable()
+
+    def __len__(self) -> int:
+        return len(self.rating)
+
+    def append(
+        self,
+        timestamp: float,
+        rating: int,
+        language: str,
+        session_id: Optional[str],
+        grievance_id: Optional[str] = None,
+        phone_number: Optional[str] = None
+    ):
+        if phone_number not in MISSING_VALUES:
+            identifier_type, identifier = 2, phone_number
+        elif grievance_id not in MISSING_VALUES:
+            identifier_type, identifier = 1, grievance_id
+        else:
+            identifier_type, identifier = 0, None
+        if self.epoch and timestamp < self.epoch[-1]:
+            self.in_order = False
+        language_code = self.languages.encode(language)
+        key = (date.fromtimestamp(timestamp).toordinal(), language_code, rating, identifier_type)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        self.epoch.append(timestamp)
+        self.rating.append(rating)
+        self.language.append(language_code)
+        self.identifier_type.append(identifier_type)
+        self.session.append(self.sessions.encode(session_id))
+        self.identifier.append(self.identifiers.encode(identifier))
+
+    def append_entry(self, entry: Dict[str, Any]):
+        """Append a ratings CSV-shaped row"""
+        self.append(
+            parse_rating_timestamp(entry["timestamp"]),
+            int(entry["rating"]),
+            entry.get("language"),
+            entry.get("session_id"),
+            entry.get("grievance_id"),
+            entry.get("phone_number"),
+        )
+
+    def clear(self):
+        self.__init__()
+
+    # === SELECTION ===
+    def _bounds(self, filters: RatingFilter) -> tuple:
+        """Epoch range of the filter's dates, and the row range holding it when rows are in order"""
+        start = end = None
+        if filters.start_date:
+            start = datetime.combine(filters.start_date, datetime.min.time()).timestamp()
+        if filters.end_date:
+            end = datetime.combine(filters.end_date + timedelta(days=1), datetime.min.time()).timestamp()
+        low, high = 0, len(self)
+        if self.in_order:
+            if start is not None:
+                low = bisect.bisect_left(self.epoch, start)
+            if end is not None:
+                high = bisect.bisect_left(self.epoch, end)
+            start = end = None
+        return start, end, low, high
+
+    def _row_matches(self, filters: RatingFilter, language_code: Optional[int], start, end):
+        """Row predicate for the filters not already covered by the row range"""
+        epoch, rating, language = self.epoch, self.rating, self.language
+        min_rating = 1 if filters.min_rating is None else filters.min_rating
+        max_rating = 5 if filters.max_rating is None else filters.max_rating
+        start = float("-inf") if start is None else start
+        end = float("inf") if end is None else end
+        return lambda i: (
+            (language_code is None or language[i] == language_code)
+            and min_rating <= rating[i] <= max_rating
+            and start <= epoch[i] < end
+        )
+
+    def _language_code(self, filters: RatingFilter) -> tuple:
+        """(matches anything, code): the code is None when any language matches"""
+        if not filters.language:
+            return True, None
+        code = self.languages.code_of(filters.language)
+        return code is not None, code
+
+    def select(self, filters: Optional[RatingFilter] = None) -> Optional[List[int]]:
+        """Row indices matching filters, or None for every row"""
+        if filters is None or filters == RatingFilter():
+            return None
+        found, language_code = self._language_code(filters)
+        if not found:
+            return []
+        start, end, low, high = self._bounds(filters)
+        if (language_code is None and start is None and end is None
+                and filters.min_rating is None and filters.max_rating is None):
+            return list(range(low, high))
+        return list(filter(self._row_matches(filters, language_code, start, end), range(low, high)))
+
+    def _latest(self, filters: Optional[RatingFilter], count: int) -> List[int]:
+        """Indices of the last `count` matching rows, oldest first, scanning back from the end"""
+        if filters is None or filters == RatingFilter():
+            return list(range(max(0, len(self) - count), len(self)))
+        _, language_code = self._language_code(filters)
+        start, end, low, high = self._bounds(filters)
+        matches = self._row_matches(filters, language_code, start, end)
+        latest = []
+        for i in range(high - 1, low - 1, -1):
+            if len(latest) == count:
+                break
+            if matches(i):
+                latest.append(i)
+        return latest[::-1]
+
+    def _column(self, column: array, indices: Optional[List[int]]) -> Iterable:
+        return column if indices is None else map(column.__getitem__, indices)
+
+    # === AGGREGATION ===
+    def aggregate(self, filters: Optional[RatingFilter] = None, latest: int = 10, label_for=None) -> Dict[str, Any]:
+        """Totals and distributions over the matching rows, same shape as RatingStats.snapshot"""
+        filters = filters or RatingFilter()
+        found, language_code = self._language_code(filters)
+        first_day = filters.start_date.toordinal() if filters.start_date else 0
+        last_day = filters.end_date.toordinal() if filters.end_date else date.max.toordinal()
+        min_rating = 1 if filters.min_rating is None else filters.min_rating
+        max_rating = 5 if filters.max_rating is None else filters.max_rating
+        total = rating_sum = 0
+        stars, languages, identifier_types, days = Counter(), Counter(), Counter(), Counter()
+        # One pass over the precomputed counts, whose size depends on days and languages, not rows
+        for (day, language, rating, identifier_type), count in (self.counts.items() if found else ()):
+            if (first_day <= day <= last_day and min_rating <= rating <= max_rating
+                    and (language_code is None or language == language_code)):
+                total += count
+                rating_sum += rating * count
+                stars[rating] += count
+                languages[language] += count
+                identifier_types[identifier_type] += count
+                days[day] += count
+        if not total:
+            return {
+                "total_ratings": 0,
+                "average_rating": 0,
+                "rating_distribution": {},
+                "language_distribution": {}
+            }
+        return {
+            "total_ratings": total,
+            "average_rating": round(rating_sum / total, 2),
+            "rating_distribution": {str(star): stars.get(star, 0) for star in range(1, 6)},
+            "language_distribution": {self.languages.decode(code) or "unknown": count for code, count in languages.items()},
+            "identifier_distribution": {IDENTIFIER_TYPES[code]: identifier_types.get(code, 0) for code in range(3)},
+            "daily_counts": {date.fromordinal(day).isoformat(): days[day] for day in sorted(days)},
+            "latest_ratings": [self.entry(i, label_for) for i in self._latest(filters, latest)]
+        }
+
+    # === EXPORT ===
+    def entry(self, index: int, label_for=None) -> Dict[str, Any]:
+        """Materialize one row as a ratings CSV-shaped dict"""
+        language = self.languages.decode(self.language[index])
+        rating = self.rating[index]
+        identifier_type = self.identifier_type[index]
+        identifier = self.identifiers.decode(self.identifier[index])
+        return {
+            "timestamp": datetime.fromtimestamp(self.epoch[index]).strftime("%Y-%m-%d %H:%M:%S"),
+            "session_id": self.sessions.decode(self.session[index]),
+            "rating": rating,
+            "Feedback": label_for(language, rating) if label_for else None,
+            "language": language,
+            "grievance_id": identifier if identifier_type == 1 else "N/A",
+            "phone_number": identifier if identifier_type == 2 else "N/A",
+        }
+
+    def iter_entries(self, filters: Optional[RatingFilter] = None, label_for=None) -> Iterator[Dict[str, Any]]:
+        indices = self.select(filters)
+        for index in (range(len(self)) if indices is None else indices):
+            yield self.entry(index, label_for)
+
+    def get_stats(self) -> Dict[str, Any]:
+        column_bytes = sum(
+            column.buffer_info()[1] * column.itemsize
+            for column in (self.epoch, self.rating, self.language, self.identifier_type, self.session, self.identifier)
+        )
+        return {
+            "rows": len(self),
+            "column_bytes": column_bytes,
+            "distinct_sessions": len(self.sessions),
+            "distinct_identifiers": len(self.identifiers),
+            "count_cells": len(self.counts),
+            "in_order": self.in_order,
+        }
+
+# === EXPORT ===
+EXPORT_FIELDS = ["timestamp", "session_id", "rating", "feedback", "language", "grievance_id", "phone_number"]
+
+class CsvExportEncoder:
+    """
+    Turns rating rows into UTF-8-BOM CSV bytes a chunk at a time, optionally
+    gzipped, so an export never holds more than one chunk in memory.
+    """
+
+    def __init__(self, compress: bool = False, chunk_size: int = 64 * 1024):
+        self.chunk_size = chunk_size
+        self.rows = 0
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+        self._compressor = zlib.compressobj(wbits=31) if compress else None
+        # BOM for Excel/Unicode compatibility
+        self._buffer.write("\ufeff")
+        self._writer.writerow(EXPORT_FIELDS)
+
+    def _drain(self, final: bool = False) -> bytes:
+        data = self._buffer.getvalue().encode("utf-8")
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+            if final:
+                data += self._compressor.flush()
+        return data
+
+    def add(self, entry: Dict[str, Any]) -> bytes:
+        """Encode one row; returns a chunk once enough has accumulated, else b''"""
+        self._writer.writerow((
+            entry.get("timestamp"),
+            entry.get("session_id"),
+            entry.get("rating"),
+            entry.get("Feedback"),
+            entry.get("language"),
+            entry.get("grievance_id") or "N/A",
+            entry.get("phone_number") or "N/A",
+        ))
+        self.rows += 1
+        if self._buffer.tell() >= self.chunk_size:
+            return self._drain()
+        return b""
+
+    def finish(self) -> bytes:
+        return self._drain(final=True)
+
+def export_csv_chunks(entries: Iterable[Dict[str, Any]], compress: bool = False) -> Iterator[bytes]:
+    encoder = CsvExportEncoder(compress)
+    for entry in entries:
+        chunk = encoder.add(entry)
+        if chunk:
+            yield chunk
+    yield encoder.finish()
+
+async def export_csv_chunks_async(entries: AsyncIterator[Dict[str, Any]], compress: bool = False) -> AsyncIterator[bytes]:
+    encoder = CsvExportEncoder(compress)
+    async for entry in entries:
+        chunk = encoder.add(entry)
+        if chunk:
+            yield chunk
+    yield encoder.finish()
+
+def create_ratings_sink() -> RatingsCsvSink:
+    """Build the ratings CSV sink from RATINGS_* environment settings"""
+    return RatingsCsvSink(
+        directory=os.getenv("RATINGS_DIR", default_ratings_dir()),
+        batch_size=int(os.getenv("RATINGS_BATCH_SIZE", "100")),
+        fsync_interval=float(os.getenv("RATINGS_FSYNC_INTERVAL_SECONDS", "1")),
+        max_queue=int(os.getenv("RATINGS_QUEUE_SIZE", "10000")),
+    )
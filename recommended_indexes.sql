@@ -0,0 +1,18 @@
+-- Indexes for the chatbot's grievance lookups, generated by `python database.py --write-ddl`.
+-- Safe to re-run. CONCURRENTLY avoids blocking writes, so run with psql outside a transaction:
+--   psql "$DATABASE_URL" -f recommended_indexes.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS grievances_unique_number_idx ON public.grievances (grievance_unique_number);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS grievances_mobile_number_idx ON public.grievances (mobile_number);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS grievances_email_lower_idx ON public.grievances (lower(email));
+CREATE INDEX CONCURRENTLY IF NOT EXISTS grievance_detail2_grievance_id_idx ON public.grievance_detail2 (grievance_id);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS grievance_detail2_mobile_logged_idx ON public.grievance_detail2 (mobile_number, grievance_logged_date DESC);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ratings_timestamp_idx ON public.ratings (timestamp);
+
+-- Name search (/user/search/) needs the pg_trgm extension
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX CONCURRENTLY IF NOT EXISTS grievances_citizen_name_trgm_idx ON public.grievances USING gin (citizen_name gin_trgm_ops);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS grievance_detail2_citizen_name_trgm_idx ON public.grievance_detail2 USING gin (citizen_name gin_trgm_ops);
+
+ANALYZE public.grievances;
+ANALYZE public.grievance_detail2;
@@ -0,0 +1,318 @@
+import asyncio
+import json
+import os
+import sys
+import logging
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+try:
+    import yaml
+except ImportError:  # YAML knowledge bases are optional
+    yaml = None
+
+logger = logging.getLogger(__name__)
+
+GREETING_PREFIXES = {
+    "en": {
+        "good_morning": "Good Morning! ",
+        "good_afternoon": "Good Afternoon! ",
+        "good_evening": "Good Evening! ",
+        "good_night": "Good Night! ",
+        "hello": "Hello! ",
+    },
+    "mr": {
+        "good_morning": "शुभ सकाळ! ",
+        "good_afternoon": "शुभ दुपार! ",
+        "good_evening": "शुभ संध्याकाळ! ",
+        "good_night": "शुभ रात्री! ",
+        "hello": "",
+    }
+}
+
+# Status message layout: header with format fields, then optional (field, label) lines
+STATUS_TEMPLATES = {
+    "en": {
+        "header": (
+            "The current status of your Grievance is as follows:\n"
+            "Grievance ID: {grievance_unique_number}\n"
+            "Status: {grievance_status}\n"
+            "Submitted: {submitted}\n"
+            "Category: {category}"
+        ),
+        "category_default": None,
+        "lines": (
+            ("district_name", "District"),
+            ("block_name", "Block"),
+            ("grampanchayat_name", "Gram Panchayat"),
+            ("resolved", "Resolved on"),
+            ("resolved_user_name", "Resolved by"),
+        ),
+        "not_found": "Grievance not found",
+        "found_by_mobile": "\n\n📱 Found using mobile number: {identifier}",
+        "mobile_not_found": "Sorry, no grievance found for mobile number {identifier}. Please check your grievance ID or registered mobile number.",
+    },
+    "mr": {
+        "header": (
+            "आपल्या तक्रारीची सद्यस्थिती खालीलप्रमाणे आहे:\n"
+            "तक्रार क्रमांक: {grievance_unique_number}\n"
+            "स्थिती: {grievance_status}\n"
+            "दाखल दिनांक: {submitted}\n"
+            "श्रेणी: {category}"
+        ),
+        "category_default": "निर्दिष्ट नाही",
+        "lines": (
+            ("district_name", "जिल्हा"),
+            ("block_name", "तालुका"),
+            ("grampanchayat_name", "ग्रामपंचायत"),
+            ("resolved", "निराकरण दिनांक"),
+            ("resolved_user_name", "निराकरण करणारे"),
+        ),
+        "not_found": "तक्रार आढळली नाही",
+        "found_by_mobile": "\n\n📱 मोबाइल नंबरद्वारे शोधले गेले: {identifier}",
+        "mobile_not_found": "माफ करा, {identifier} या मोबाइल नंबरसाठी कोणतीही तक्रार आढळली नाही. कृपया आपला तक्रार क्रमांक किंवा नोंदणीकृत मोबाइल नंबर तपासा.",
+    }
+}
+
+def _freeze(value: Any) -> Any:
+    """Read-only, interned copy of a parsed knowledge base value"""
+    if isinstance(value, dict):
+        return MappingProxyType({_freeze(k): _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+def _render_static(language: str, kb: Mapping[str, Any], labels: Mapping[int, str]) -> Dict[str, str]:
+    """Render every reply that only depends on the knowledge base"""
+    options = kb["options"]
+    yes_response = kb["yes_response"]
+    replies = {
+        f"greeting:{key}": prefix + kb["welcome_message"]
+        for key, prefix in GREETING_PREFIXES[language].items()
+    }
+    replies["registration_info"] = (
+        yes_response["intro"] + "\n\n"
+        + yes_response["method1"]["title"] + "\n"
+        + yes_response["method1"]["description"] + "\n"
+        + yes_response["method1"]["link"] + "\n\n"
+        + yes_response["method2"]["title"] + "\n"
+        + yes_response["method2"]["description"] + "\n"
+        + yes_response["method2"]["link"]
+    )
+    if language == "mr":
+        replies["initial_options"] = f"""{kb['welcome_message']}
+प्रश्न क्र. १: {kb['initial_question']}
+उत्तर १ - "{options['yes']}"
+उत्तर २ - "{options['no']}"
+प्रश्न क्र. २: {kb['status_check_question']}
+उत्तर - "स्थिती तपासा" किंवा आपला तक्रार क्रमांक टाइप करा
+उदाहरण: G-12safeg7678"""
+        replies["feedback_question"] = f"""प्रश्न क्र. २.२: {kb['feedback_question']}
+उत्तर १ - "{options['yes']}"
+उत्तर २ - "{options['no']}\""""
+        replies["rating_request"] = f"""{kb['rating_question']}
+{kb['rating_request']}
+१ - {labels[1]}
+२ - {labels[2]}
+३ - {labels[3]}
+४ - {labels[4]}
+५ - {labels[5]}"""
+        replies["identifier_prompt"] = f"""{kb["grievance_id_prompt"]}
+किंवा आपला नोंदणीकृत मोबाइल नंबर प्रविष्ट करा (उदाहरणार्थ: 9876543210)"""
+        replies["identifier_reprompt"] = "कृपया योग्य तक्रार क्रमांक किंवा 10-अंकी मोबाइल नंबर प्रदान करा."
+    else:
+        replies["initial_options"] = f"""{kb['welcome_message']}
+Question 1: {kb['initial_question']}
+Answer 1: "{options['yes']}"
+Answer 2: "{options['no']}"
+Question 2: {kb['status_check_question']}
+Answer: Type "Check Status" or enter your Grievance ID
+Example: G-12safeg7678"""
+        replies["feedback_question"] = f"""Question 2.2: {kb['feedback_question']}
+Answer 1: "{options['yes']}"
+Answer 2: "{options['no']}\""""
+        replies["rating_request"] = f"""{kb['rating_question']}
+{kb['rating_request']}
+1 - {labels[1]}
+2 - {labels[2]}
+3 - {labels[3]}
+4 - {labels[4]}
+5 - {labels[5]}"""
+        replies["identifier_prompt"] = f"""{kb["grievance_id_prompt"]}
+Or enter your registered mobile number (Example: 9876543210)"""
+        replies["identifier_reprompt"] = "Please provide a valid Grievance ID or 10-digit mobile number."
+    replies["track_grievance_note"] = f"\n\n🔗 {kb['track_grievance_help']}"
+    return replies
+
+class ResponseTable:
+    """
+    Immutable snapshot of every reply for one knowledge base version. Static
+    replies are rendered once; status messages use templates compiled here.
+    """
+
+    __slots__ = ("version", "source", "knowledge_base", "rating_labels", "replies", "status_templates")
+
+    def __init__(self, knowledge_base: Dict[str, Any], rating_labels: Dict[str, Dict[Any, str]], version: int = 1, source: Optional[str] = None):
+        self.version = version
+        self.source = source
+        labels = {
+            language: {int(rating): label for rating, label in per_language.items()}
+            for language, per_language in rating_labels.items()
+        }
+        self.knowledge_base = _freeze(knowledge_base)
+        self.rating_labels = _freeze(labels)
+        self.replies = MappingProxyType({
+            language: MappingProxyType({
+                sys.intern(key): sys.intern(text)
+                for key, text in _render_static(language, self.knowledge_base[language], self.rating_labels[language]).items()
+            })
+            for language in GREETING_PREFIXES
+        })
+        self.status_templates = MappingProxyType({
+            language: MappingProxyType(dict(template))
+            for language, template in STATUS_TEMPLATES.items()
+        })
+
+    def text(self, language: str, key: str) -> str:
+        """Raw knowledge base string, e.g. database_error"""
+        return self.knowledge_base[language][key]
+
+    def reply(self, language: str, key: str) -> str:
+        """Pre-rendered static reply, e.g. feedback_question"""
+        return self.replies[language][key]
+
+    def rating_label(self, language: str, rating: int) -> str:
+        return self.rating_labels[language][rating]
+
+    def greeting(self, language: str, key: str) -> str:
+        replies = self.replies.get(language, {})
+        return replies.get(f"greeting:{key}") or self.replies["en"]["greeting:hello"]
+
+    def grievance_status(self, grievance: Optional[Any], language: str) -> str:
+        """Fill the compiled status template for one GrievanceStatus record."""
+        template = self.status_templates[language]
+        if not grievance:
+            return template["not_found"]
+        values = {
+            "grievance_unique_number": grievance.grievance_unique_number,
+            "grievance_status": grievance.grievance_status,
+            "submitted": grievance.submitted_date or "Not available",
+            "category": grievance.sub_grievance_name or template["category_default"],
+            "resolved": grievance.resolved_on,
+        }
+        parts = [template["header"].format_map(values)]
+        for field, label in template["lines"]:
+            value = values[field] if field in values else getattr(grievance, field)
+            if value:
+                parts.append(f"\n{label}: {value}")
+        return "".join(parts)
+
+    def found_by_mobile(self, language: str, identifier: str) -> str:
+        return self.status_templates[language]["found_by_mobile"].format(identifier=identifier)
+
+    def mobile_not_found(self, language: str, identifier: str) -> str:
+        return self.status_templates[language]["mobile_not_found"].format(identifier=identifier)
+
+def load_knowledge_base_file(path: str) -> Dict[str, Any]:
+    """Parse a JSON or YAML knowledge base file"""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            if yaml is None:
+                raise RuntimeError("PyYAML is required to load a YAML knowledge base")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    if not isinstance(data, dict) or "knowledge_base" not in data or "rating_labels" not in data:
+        raise ValueError(f"{path} must define 'knowledge_base' and 'rating_labels'")
+    return data
+
+class ResponseCatalog:
+    """
+    Holds the current ResponseTable and swaps in a new one when the knowledge
+    base file changes. Callers read `table` once per reply, so a reload never
+    mixes two versions in one message.
+    """
+
+    def __init__(self, path: str, watch_interval: float = 0.0):
+        self.path = path
+        self.watch_interval = watch_interval
+        self.table: Optional[ResponseTable] = None
+        self.checked_mtime: Optional[float] = None
+        self.reloads = 0
+        self.reload_errors = 0
+        self._watcher: Optional[asyncio.Task] = None
+        self.reload()
+
+    def reload(self) -> ResponseTable:
+        """Load and render the knowledge base; the current table is kept if this fails"""
+        mtime = os.path.getmtime(self.path)
+        data = load_knowledge_base_file(self.path)
+        version = self.table.version + 1 if self.table else 1
+        table = ResponseTable(data["knowledge_base"], data["rating_labels"], version=version, source=self.path)
+        self.table = table
+        self.checked_mtime = mtime
+        if version > 1:
+            self.reloads += 1
+            logger.info(f"Knowledge base reloaded from {self.path} (version {version})")
+        return table
+
+    def try_reload(self) -> bool:
+        """Reload, counting and logging a failure instead of raising; False if the old table is kept"""
+        try:
+            self.reload()
+            return True
+        except Exception as e:
+            self.reload_errors += 1
+            logger.error(f"Failed to reload knowledge base from {self.path}: {e}")
+            return False
+
+    def reload_if_changed(self) -> bool:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError as e:
+            self.reload_errors += 1
+            logger.error(f"Failed to reload knowledge base from {self.path}: {e}")
+            return False
+        if mtime == self.checked_mtime:
+            return False
+        # Remember the attempt so a broken file is reported once, not on every tick
+        self.checked_mtime = mtime
+        return self.try_reload()
+
+    async def _watch_forever(self):
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            self.reload_if_changed()
+
+    def start_watcher(self):
+        if self._watcher is None and self.watch_interval > 0:
+            self._watcher = asyncio.create_task(self._watch_forever())
+
+    async def stop_watcher(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "version": self.table.version if self.table else None,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "watch_interval_seconds": self.watch_interval,
+        }
+
+def create_response_catalog() -> ResponseCatalog:
+    """Build the catalog from KNOWLEDGE_BASE_PATH, watching it every KNOWLEDGE_BASE_WATCH_SECONDS"""
+    path = os.getenv(
+        "KNOWLEDGE_BASE_PATH",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_base.json")
+    )
+    watch_interval = float(os.getenv("KNOWLEDGE_BASE_WATCH_SECONDS", "0"))
+    return ResponseCatalog(path, watch_interval)
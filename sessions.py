@@ -0,0 +1,635 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from ratelimit import TokenBuckets, bucket_expiry, take_from_bucket
+
+logger = logging.getLogger(__name__)
+
+class ChatEntry:
+    """One user/assistant exchange."""
+
+    __slots__ = ("user", "assistant", "language", "created_at", "monotonic")
+
+    def __init__(self, user: str, assistant: str, language: str, created_at: Optional[float] = None):
+        self.user = user
+        self.assistant = assistant
+        self.language = language
+        if created_at is None:
+            self.created_at = time.time()
+            self.monotonic = time.monotonic()
+        else:
+            # Restored from a shared backend: place it on this process's monotonic clock
+            self.created_at = created_at
+            self.monotonic = time.monotonic() - max(0.0, time.time() - created_at)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "user": self.user,
+            "assistant": self.assistant,
+            "language": self.language,
+            "timestamp": time.strftime("%H:%M:%S", time.localtime(self.created_at)),
+            "created_at": self.created_at,
+        }
+
+class ChatHistory:
+    """
+    Fixed-capacity message history. Appending is O(1) and drops the oldest
+    entry once full; readers iterate newest-first without copying.
+    """
+
+    __slots__ = ("_entries", "appended")
+
+    def __init__(self, capacity: int = 50):
+        self._entries = deque(maxlen=capacity)
+        # Entries ever appended, so a backend can tell which ones it has not stored yet
+        self.appended = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def append(self, user: str, assistant: str, language: str) -> ChatEntry:
+        entry = ChatEntry(user, assistant, language)
+        self._entries.append(entry)
+        self.appended += 1
+        return entry
+
+    def restore(self, user: str, assistant: str, language: str, created_at: float):
+        self._entries.append(ChatEntry(user, assistant, language, created_at))
+        self.appended += 1
+
+    def newest(self, n: Optional[int] = None) -> Iterator[ChatEntry]:
+        """Iterate over the newest n entries (all when n is None), newest first"""
+        return islice(reversed(self._entries), n)
+
+    def clear(self):
+        self._entries.clear()
+
+class SessionRecord:
+    """Conversation state for one chat session."""
+
+    __slots__ = (
+        "session_id",
+        "stage",
+        "language",
+        "last_identifier_type",
+        "last_identifier_value",
+        "last_identifier_at",
+        "history",
+        "created_at",
+        "last_seen",
+        "saved_messages",
+    )
+
+    def __init__(self, session_id: str, language: str = "en", history_size: int = 50):
+        now = time.time()
+        self.session_id = session_id
+        self.stage = "initial"
+        self.language = language
+        self.last_identifier_type: Optional[str] = None
+        self.last_identifier_value: Optional[str] = None
+        self.last_identifier_at: Optional[float] = None
+        self.history = ChatHistory(history_size)
+        self.created_at = now
+        self.last_seen = now
+        self.saved_messages = 0
+
+    def remember_identifier(self, identifier_type: str, identifier: str):
+        """Track how status was checked, for rating attribution"""
+        self.last_identifier_type = identifier_type
+        self.last_identifier_value = identifier
+        self.last_identifier_at = time.time()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stage": self.stage,
+            "language": self.language,
+            "last_identifier_type": self.last_identifier_type,
+            "last_identifier_value": self.last_identifier_value,
+            "last_identifier_at": self.last_identifier_at,
+            "messages": len(self.history),
+            "created_at": self.created_at,
+            "last_seen": self.last_seen,
+        }
+
+    def to_state(self) -> Dict[str, Any]:
+        """Serializable session fields for shared backends; history is stored separately"""
+        return {
+            "stage": self.stage,
+            "language": self.language,
+            "last_identifier_type": self.last_identifier_type,
+            "last_identifier_value": self.last_identifier_value,
+            "last_identifier_at": self.last_identifier_at,
+            "created_at": self.created_at,
+        }
+
+    def unsaved_entries(self) -> List[Tuple[int, ChatEntry]]:
+        """History entries appended since the last save, oldest first, with their sequence numbers"""
+        count = min(self.history.appended - self.saved_messages, len(self.history))
+        entries = reversed(list(self.history.newest(count)))
+        return [(self.history.appended - count + i + 1, entry) for i, entry in enumerate(entries)]
+
+    @classmethod
+    def from_state(cls, session_id: str, state: Dict[str, Any], last_seen: float, history_size: int = 50) -> "SessionRecord":
+        record = cls(session_id, state.get("language", "en"), history_size)
+        record.stage = state.get("stage", "initial")
+        record.last_identifier_type = state.get("last_identifier_type")
+        record.last_identifier_value = state.get("last_identifier_value")
+        record.last_identifier_at = state.get("last_identifier_at")
+        record.created_at = state.get("created_at", last_seen)
+        record.last_seen = last_seen
+        # States written before history had its own table carry it inline
+        for user, assistant, language, created_at in state.get("history", []):
+            record.history.restore(user, assistant, language, created_at)
+        return record
+
+class SessionStore:
+    """
+    In-memory session store bounded by an idle TTL and a maximum session count.
+    Sessions are kept in least-recently-used order, so both the sweeper and the
+    size cap only ever look at the oldest entries.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10000,
+        idle_ttl: float = 3600.0,
+        sweep_interval: float = 60.0,
+        history_size: int = 50
+    ):
+        self.max_sessions = max_sessions
+        self.history_size = history_size
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self._sessions: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        self._sweeper: Optional[asyncio.Task] = None
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __iter__(self) -> Iterator[SessionRecord]:
+        return iter(list(self._sessions.values()))
+
+    def _is_expired(self, record: SessionRecord, now: float) -> bool:
+        return self.idle_ttl > 0 and now - record.last_seen > self.idle_ttl
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        """Return a live session and mark it as recently used"""
+        record = self._sessions.get(session_id)
+        if record is None:
+            return None
+        now = time.time()
+        if self._is_expired(record, now):
+            del self._sessions[session_id]
+            self.expired += 1
+            return None
+        record.last_seen = now
+        self._sessions.move_to_end(session_id)
+        return record
+
+    def get_or_create(self, session_id: str, language: str = "en") -> SessionRecord:
+        record = self.get(session_id)
+        if record is None:
+            record = SessionRecord(session_id, language, self.history_size)
+            self._sessions[session_id] = record
+            self.created += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+        return record
+
+    def delete(self, session_id: str) -> bool:
+        return self._sessions.pop(session_id, None) is not None
+
+    def sweep(self) -> int:
+        """Drop sessions idle for longer than the TTL; returns how many were removed"""
+        if self.idle_ttl <= 0:
+            return 0
+        now = time.time()
+        removed = 0
+        while self._sessions:
+            session_id, record = next(iter(self._sessions.items()))
+            if not self._is_expired(record, now):
+                break
+            del self._sessions[session_id]
+            removed += 1
+        self.expired += removed
+        return removed
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                removed = self.sweep()
+                if removed:
+                    logger.info(f"Session sweeper removed {removed} idle sessions ({len(self)} active)")
+            except Exception as e:
+                logger.error(f"Session sweep failed: {e}")
+
+    def start_sweeper(self):
+        if self._sweeper is None and self.sweep_interval > 0:
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def stop_sweeper(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "active_sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "idle_ttl_seconds": self.idle_ttl,
+            "created": self.created,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+class SessionBackend(ABC):
+    """
+    Session storage used by the request handlers. Handlers load a record, work
+    on it, then save it, so state can live outside the worker process.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def load(self, session_id: str) -> Optional[SessionRecord]:
+        ...
+
+    @abstractmethod
+    async def load_or_create(self, session_id: str, language: str = "en") -> SessionRecord:
+        ...
+
+    @abstractmethod
+    async def save(self, record: SessionRecord):
+        ...
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def count(self) -> int:
+        ...
+
+    @abstractmethod
+    async def snapshot(self, limit: int = 100) -> Dict[str, Dict[str, Any]]:
+        """Most recently used sessions, for debugging"""
+        ...
+
+    @abstractmethod
+    async def take_token(self, key: str, rate: float, burst: float) -> float:
+        """Take one rate-limit token from a bucket; returns 0 or the seconds until retry"""
+        ...
+
+    @abstractmethod
+    async def get_stats(self) -> Dict[str, Any]:
+        ...
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+class MemorySessionBackend(SessionBackend):
+    """Per-process backend; records are live objects, so save() has nothing to do."""
+
+    name = "memory"
+
+    def __init__(self, store: SessionStore, max_buckets: int = 100000):
+        self.store = store
+        self.buckets = TokenBuckets(max_buckets)
+
+    async def load(self, session_id: str) -> Optional[SessionRecord]:
+        return self.store.get(session_id)
+
+    async def load_or_create(self, session_id: str, language: str = "en") -> SessionRecord:
+        return self.store.get_or_create(session_id, language)
+
+    async def save(self, record: SessionRecord):
+        pass
+
+    async def delete(self, session_id: str) -> bool:
+        return self.store.delete(session_id)
+
+    async def count(self) -> int:
+        return len(self.store)
+
+    async def snapshot(self, limit: int = 100) -> Dict[str, Dict[str, Any]]:
+        records = list(islice(reversed(list(self.store)), limit))
+        return {record.session_id: record.to_dict() for record in records}
+
+    async def take_token(self, key: str, rate: float, burst: float) -> float:
+        return self.buckets.take(key, rate, burst)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            **self.store.get_stats(),
+            "rate_limit_buckets": len(self.buckets),
+            "rate_limit_buckets_evicted": self.buckets.evicted,
+        }
+
+    async def start(self):
+        self.store.start_sweeper()
+
+    async def stop(self):
+        await self.store.stop_sweeper()
+
+class SqliteSessionBackend(SessionBackend):
+    """
+    Backend on a local SQLite file shared by every uvicorn worker on the host.
+    Calls run on a single dedicated thread so the event loop never blocks on disk.
+    """
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        path: str,
+        max_sessions: int = 10000,
+        idle_ttl: float = 3600.0,
+        sweep_interval: float = 60.0,
+        history_size: int = 50,
+        max_buckets: int = 100000
+    ):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.max_buckets = max_buckets
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self.history_size = history_size
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-db")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._sweeper: Optional[asyncio.Task] = None
+        self.expired = 0
+        self.evicted = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # Deleting or sweeping a session takes its history rows with it
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                "session_id TEXT PRIMARY KEY, state TEXT NOT NULL, last_seen REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_seen ON chat_sessions (last_seen)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS chat_history ("
+                "session_id TEXT NOT NULL REFERENCES chat_sessions (session_id) ON DELETE CASCADE, "
+                "seq INTEGER NOT NULL, user TEXT NOT NULL, assistant TEXT NOT NULL, "
+                "language TEXT NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (session_id, seq)) WITHOUT ROWID"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_buckets_expires_at ON rate_buckets (expires_at)")
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _load(self, session_id: str) -> Optional[SessionRecord]:
+        row = self._db().execute(
+            "SELECT state, last_seen FROM chat_sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        state, last_seen = row
+        if self.idle_ttl > 0 and time.time() - last_seen > self.idle_ttl:
+            # Remove it now rather than at the next sweep, so a session reusing the ID
+            # never picks up its history; unless another worker has just refreshed it
+            self._db().execute(
+                "DELETE FROM chat_sessions WHERE session_id = ? AND last_seen = ?", (session_id, last_seen)
+            )
+            return None
+        record = SessionRecord.from_state(session_id, json.loads(state), last_seen, self.history_size)
+        rows = self._db().execute(
+            "SELECT seq, user, assistant, language, created_at FROM chat_history "
+            "WHERE session_id = ? ORDER BY seq DESC LIMIT ?", (session_id, self.history_size)
+        ).fetchall()
+        for _, user, assistant, language, created_at in reversed(rows):
+            record.history.restore(user, assistant, language, created_at)
+        if rows:
+            record.history.appended = record.saved_messages = rows[0][0]
+        return record
+
+    def _save(self, session_id: str, state: str, last_seen: float, entries: List[Tuple[int, ChatEntry]]):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute(
+                "INSERT INTO chat_sessions (session_id, state, last_seen) VALUES (?, ?, ?) "
+                "ON CONFLICT (session_id) DO UPDATE SET state = excluded.state, last_seen = excluded.last_seen",
+                (session_id, state, last_seen)
+            )
+            if entries and entries[0][0] == 1:
+                # A new conversation: drop any rows left by an earlier one with this ID
+                db.execute("DELETE FROM chat_history WHERE session_id = ?", (session_id,))
+            if entries:
+                db.executemany(
+                    "INSERT OR REPLACE INTO chat_history (session_id, seq, user, assistant, language, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (session_id, seq, entry.user, entry.assistant, entry.language, entry.created_at)
+                        for seq, entry in entries
+                    ]
+                )
+                # Keep the table to the history size, as the in-memory deque does
+                db.execute(
+                    "DELETE FROM chat_history WHERE session_id = ? AND seq <= ?",
+                    (session_id, entries[-1][0] - self.history_size)
+                )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+
+    def _delete(self, session_id: str) -> bool:
+        return self._db().execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def _count(self) -> int:
+        return self._db().execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+
+    def _snapshot(self, limit: int) -> Dict[str, Dict[str, Any]]:
+        rows = self._db().execute(
+            "SELECT s.session_id, s.state, s.last_seen, "
+            "(SELECT COUNT(*) FROM chat_history h WHERE h.session_id = s.session_id) "
+            "FROM chat_sessions s ORDER BY s.last_seen DESC LIMIT ?", (limit,)
+        ).fetchall()
+        sessions = {}
+        for session_id, state, last_seen, messages in rows:
+            record = SessionRecord.from_state(session_id, json.loads(state), last_seen, self.history_size)
+            sessions[session_id] = record.to_dict()
+            if messages:
+                sessions[session_id]["messages"] = messages
+        return sessions
+
+    def _take_token(self, key: str, rate: float, burst: float) -> float:
+        db = self._db()
+        now = time.time()
+        # IMMEDIATE takes the write lock up front so workers can't interleave read and update
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated_at = row if row else (burst, now)
+            tokens, retry_after = take_from_bucket(tokens, updated_at, rate, burst, now)
+            db.execute(
+                "INSERT INTO rate_buckets (key, tokens, updated_at, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, "
+                "updated_at = excluded.updated_at, expires_at = excluded.expires_at",
+                (key, tokens, now, bucket_expiry(tokens, rate, burst, now))
+            )
+            db.execute("COMMIT")
+        except Exception:
+            db.execute("ROLLBACK")
+            raise
+        return retry_after
+
+    def _sweep(self) -> tuple:
+        db = self._db()
+        # Buckets that have refilled completely carry no state worth keeping
+        db.execute("DELETE FROM rate_buckets WHERE expires_at < ?", (time.time(),))
+        overflow = db.execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0] - self.max_buckets
+        if overflow > 0:
+            db.execute(
+                "DELETE FROM rate_buckets WHERE key IN "
+                "(SELECT key FROM rate_buckets ORDER BY updated_at LIMIT ?)", (overflow,)
+            )
+        expired = 0
+        if self.idle_ttl > 0:
+            expired = db.execute(
+                "DELETE FROM chat_sessions WHERE last_seen < ?", (time.time() - self.idle_ttl,)
+            ).rowcount
+        evicted = 0
+        overflow = self._count() - self.max_sessions
+        if overflow > 0:
+            evicted = db.execute(
+                "DELETE FROM chat_sessions WHERE session_id IN "
+                "(SELECT session_id FROM chat_sessions ORDER BY last_seen LIMIT ?)", (overflow,)
+            ).rowcount
+        return expired, evicted
+
+    async def load(self, session_id: str) -> Optional[SessionRecord]:
+        return await self._run(self._load, session_id)
+
+    async def load_or_create(self, session_id: str, language: str = "en") -> SessionRecord:
+        record = await self.load(session_id)
+        if record is None:
+            record = SessionRecord(session_id, language, self.history_size)
+        return record
+
+    async def save(self, record: SessionRecord):
+        """Write the session fields and append only the history entries added since the last save"""
+        record.last_seen = time.time()
+        appended = record.history.appended
+        await self._run(
+            self._save, record.session_id, json.dumps(record.to_state()), record.last_seen, record.unsaved_entries()
+        )
+        record.saved_messages = appended
+
+    async def delete(self, session_id: str) -> bool:
+        return await self._run(self._delete, session_id)
+
+    async def count(self) -> int:
+        return await self._run(self._count)
+
+    async def snapshot(self, limit: int = 100) -> Dict[str, Dict[str, Any]]:
+        return await self._run(self._snapshot, limit)
+
+    async def take_token(self, key: str, rate: float, burst: float) -> float:
+        return await self._run(self._take_token, key, rate, burst)
+
+    async def sweep(self) -> int:
+        expired, evicted = await self._run(self._sweep)
+        self.expired += expired
+        self.evicted += evicted
+        return expired + evicted
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                removed = await self.sweep()
+                if removed:
+                    logger.info(f"Session sweeper removed {removed} sessions from {self.path}")
+            except Exception as e:
+                logger.error(f"Session sweep failed: {e}")
+
+    async def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "path": self.path,
+            "active_sessions": await self.count(),
+            "rate_limit_buckets": await self._run(
+                lambda: self._db().execute("SELECT COUNT(*) FROM rate_buckets").fetchone()[0]
+            ),
+            "max_sessions": self.max_sessions,
+            "idle_ttl_seconds": self.idle_ttl,
+            # Removal counts are per worker; every worker runs its own sweeper
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+    async def start(self):
+        await self._run(self._db)
+        if self._sweeper is None and self.sweep_interval > 0:
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    async def stop(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+        if self._conn is not None:
+            await self._run(self._conn.close)
+            self._conn = None
+
+def create_session_backend() -> SessionBackend:
+    """Build the session backend selected by SESSION_BACKEND (memory or sqlite)"""
+    max_sessions = int(os.getenv("SESSION_MAX_COUNT", "10000"))
+    idle_ttl = float(os.getenv("SESSION_IDLE_TTL_SECONDS", "3600"))
+    sweep_interval = float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "60"))
+    history_size = int(os.getenv("CHAT_HISTORY_SIZE", "50"))
+    max_buckets = int(os.getenv("RATE_LIMIT_MAX_BUCKETS", "100000"))
+    backend = os.getenv("SESSION_BACKEND", "memory").strip().lower()
+    if backend == "sqlite":
+        path = os.getenv(
+            "SESSION_SQLITE_PATH",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "session_data", "sessions.sqlite3")
+        )
+        return SqliteSessionBackend(path, max_sessions, idle_ttl, sweep_interval, history_size, max_buckets)
+    if backend != "memory":
+        logger.warning(f"Unknown SESSION_BACKEND '{backend}', using in-memory sessions")
+    return MemorySessionBackend(SessionStore(max_sessions, idle_ttl, sweep_interval, history_size), max_buckets)
@@ -0,0 +1,176 @@
+import atexit
+import hashlib
+import hmac
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import secrets
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from intents import GRIEVANCE_ID_FORMATS
+
+logger = logging.getLogger(__name__)
+
+# Indian mobile numbers with an optional +91 / 91 / 0 prefix, and grievance IDs in
+# any format intents accepts, including plain 6+ digit numbers. Letter-prefixed IDs
+# need at least one digit so words like "Grievance" or "Rating" are left alone.
+# One pass with mobile first, so a mobile number is never also taken for a numeric ID.
+MOBILE_PATTERN = r'(?<![\d+])(?:\+?91[\s-]?|0)?(?P<mobile>[6-9]\d{4}[\s-]?\d{5})(?!\d)'
+GRIEVANCE_ID_PATTERN = r'(?P<grievance>\b(?=[\w-]*\d)(?:' + '|'.join(GRIEVANCE_ID_FORMATS) + r')\b)'
+IDENTIFIER_PATTERN = re.compile(MOBILE_PATTERN + '|' + GRIEVANCE_ID_PATTERN)
+NON_DIGIT_PATTERN = re.compile(r'\D')
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+STANDARD_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+class Redactor:
+    """
+    Replaces mobile numbers and grievance IDs with keyed hashes, so the same
+    value always gets the same token (lines can still be correlated) without
+    the value itself reaching the logs. Set LOG_REDACTION_KEY to keep tokens
+    stable across workers and restarts.
+    """
+
+    def __init__(self, key: Optional[bytes] = None):
+        self.key = key or secrets.token_bytes(32)
+
+    def token(self, kind: str, value: str) -> str:
+        digest = hmac.new(self.key, value.encode('utf-8'), hashlib.sha256).hexdigest()[:10]
+        return f"<{kind}:{digest}>"
+
+    def _replace(self, match: re.Match) -> str:
+        if match.group('mobile'):
+            return self.token('mobile', NON_DIGIT_PATTERN.sub('', match.group('mobile')))
+        return self.token('grievance', match.group('grievance').upper())
+
+    def redact(self, text: str) -> str:
+        return IDENTIFIER_PATTERN.sub(self._replace, text)
+
+    def redact_value(self, value: Any) -> Any:
+        if isinstance(value, str):
+            return self.redact(value)
+        if isinstance(value, dict):
+            return {k: self.redact_value(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self.redact_value(v) for v in value]
+        return value
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message and any `extra` fields."""
+
+    def __init__(self, redactor: Optional[Redactor] = None):
+        super().__init__()
+        self.redactor = redactor
+
+    def _clean(self, value: Any) -> Any:
+        return self.redactor.redact_value(value) if self.redactor else value
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": self._clean(record.getMessage()),
+        }
+        for name, value in record.__dict__.items():
+            if name not in STANDARD_RECORD_ATTRS and not name.startswith('_'):
+                entry[name] = self._clean(value)
+        if record.exc_info:
+            entry["exc"] = self._clean(self.formatException(record.exc_info))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class RedactingFormatter(logging.Formatter):
+    """The plain text format, with mobile numbers and grievance IDs redacted."""
+
+    def __init__(self, fmt: str, redactor: Optional[Redactor] = None):
+        super().__init__(fmt)
+        self.redactor = redactor
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        return self.redactor.redact(text) if self.redactor else text
+
+class PayloadSampler:
+    """
+    Decides which requests get their debug payload logged. Rates are per route,
+    e.g. LOG_PAYLOAD_SAMPLE_RATES="/query/=0.01,/rating/=0.1", with
+    LOG_PAYLOAD_SAMPLE_RATE as the default for other routes.
+    """
+
+    def __init__(self, default_rate: float = 0.0, rates: Optional[Dict[str, float]] = None):
+        self.default_rate = default_rate
+        self.rates = rates or {}
+
+    @classmethod
+    def from_env(cls) -> "PayloadSampler":
+        rates = {}
+        for item in os.getenv('LOG_PAYLOAD_SAMPLE_RATES', '').split(','):
+            route, _, rate = item.partition('=')
+            if route.strip() and rate.strip():
+                rates[route.strip()] = float(rate)
+        return cls(float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', '0')), rates)
+
+    @property
+    def enabled(self) -> bool:
+        return self.default_rate > 0 or any(rate > 0 for rate in self.rates.values())
+
+    def sampled(self, route: str) -> bool:
+        rate = self.rates.get(route, self.default_rate)
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+PAYLOAD_LOGGER = logging.getLogger('payload')
+PAYLOADS = PayloadSampler()
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def log_payload(route: str, message: str, **payload):
+    """Log a request's debug payload for the sampled fraction of calls to `route`"""
+    if PAYLOADS.sampled(route):
+        PAYLOAD_LOGGER.debug(message, extra={"route": route, "payload": payload})
+
+def configure_logging():
+    """
+    Route all logging through a queue to a background listener thread, so
+    formatting, redaction and writes happen off the event loop.
+    LOG_FORMAT is json (default) or text; LOG_REDACT=false turns redaction off.
+    """
+    global _listener, PAYLOADS
+    if _listener is not None:
+        return
+    redactor = None
+    if os.getenv('LOG_REDACT', 'true').strip().lower() in ('1', 'true', 'yes', 'on'):
+        key = os.getenv('LOG_REDACTION_KEY')
+        redactor = Redactor(key.encode('utf-8') if key else None)
+    if os.getenv('LOG_FORMAT', 'json').strip().lower() == 'text':
+        formatter = RedactingFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s', redactor)
+    else:
+        formatter = JsonFormatter(redactor)
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(formatter)
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(os.getenv('LOG_LEVEL', 'INFO').strip().upper())
+
+    PAYLOADS = PayloadSampler.from_env()
+    if PAYLOADS.enabled:
+        PAYLOAD_LOGGER.setLevel(logging.DEBUG)
+
+    _listener = logging.handlers.QueueListener(log_queue, output)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None